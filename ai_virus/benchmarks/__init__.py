@@ -0,0 +1,5 @@
+"""
+Benchmarks for the data structures in this package.
+
+Run them from the package directory, e.g. `python -m benchmarks.infinite_hash_table_memory`.
+"""
@@ -0,0 +1,38 @@
+"""
+This module generates realistic inputs for the benchmarks
+"""
+
+from __future__ import annotations
+import random
+
+__author__ = "Adrian Ong Zhe Yee, Teh Yee Hong"
+
+ENVIRONMENTS = ["prod", "staging", "dev"]
+CLUSTERS = ["cluster", "batch", "edge"]
+REGIONS = ["eu-west", "eu-central", "us-east", "us-west", "ap-south"]
+ROLES = ["web", "db", "cache", "worker", "gateway"]
+
+
+def hostnames(n: int, seed: int = 0) -> list[str]:
+    """
+    Returns n distinct hostnames shaped like `prod-cluster-eu-west-2b-web-0042`,
+    so that large groups of them share long prefixes.
+
+    param arg1: the number of hostnames
+    param arg2: the random seed
+
+    Complexity: O(n)
+    """
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < n:
+        names.add("{}-{}-{}-{}{}-{}-{:04d}".format(
+            rng.choice(ENVIRONMENTS),
+            rng.choice(CLUSTERS),
+            rng.choice(REGIONS),
+            rng.randint(1, 3),
+            rng.choice("abc"),
+            rng.choice(ROLES),
+            rng.randrange(10000),
+        ))
+    return sorted(names)
@@ -0,0 +1,65 @@
+"""
+Memory and throughput of DoubleKeyTable (a sub-table per top-level key) against
+FlatDoubleKeyTable (one array for every entry), from many small top-level keys to a few large ones.
+
+Usage: python -m benchmarks.double_key_table_layouts [entries]  (default 10,000)
+"""
+
+from __future__ import annotations
+import sys
+import time
+import tracemalloc
+
+from benchmarks.data import hostnames
+from double_key_table import DoubleKeyTable
+from flat_double_key_table import FlatDoubleKeyTable
+
+__author__ = "Adrian Ong Zhe Yee, Teh Yee Hong"
+
+
+def build(table_type: type, pairs: list[tuple[str, str]]):
+    """
+    Returns: a table_type holding every pair
+    """
+    table = table_type()
+    for i, pair in enumerate(pairs):
+        table[pair] = i
+    return table
+
+
+def measure(table_type: type, pairs: list[tuple[str, str]]) -> tuple[int, float, float, float]:
+    """
+    Build a table of the pairs while tracing memory, then time building it again, looking every
+    pair up and iterating the entries of every top-level key.
+
+    Returns: bytes allocated by the table, and the seconds taken by each of the three steps
+    """
+    tracemalloc.start()
+    table = build(table_type, pairs)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del table
+
+    start = time.perf_counter()
+    table = build(table_type, pairs)
+    inserted = time.perf_counter()
+    for pair in pairs:
+        table[pair]
+    looked_up = time.perf_counter()
+    for key1 in table.keys():
+        for _ in table.iter_items(key1):
+            pass
+    iterated = time.perf_counter()
+    return size, inserted - start, looked_up - inserted, iterated - looked_up
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    names = hostnames(n)
+    print(f"{n:,} entries")
+    print(f"{'per key1':>9} {'layout':>7} {'B/entry':>8} {'insert s':>9} {'lookup s':>9} {'iterate s':>10}")
+    for per_key1 in [1, 4, 32, 1000]:
+        pairs = [(f"group-{i // per_key1}", name) for i, name in enumerate(names)]
+        for label, table_type in [("nested", DoubleKeyTable), ("flat", FlatDoubleKeyTable)]:
+            size, insert, lookup, iterate = measure(table_type, pairs)
+            print(f"{per_key1:>9} {label:>7} {size / n:>8.0f} {insert:>9.2f} {lookup:>9.2f} {iterate:>10.2f}")
@@ -0,0 +1,72 @@
+"""
+The hash functions of data_structures.hash_functions against the tables' own polynomial hash,
+on computer names: hashing throughput, and how the keys cluster in a LinearProbeTable.
+
+Usage: python -m benchmarks.hash_functions [names]  (default 200,000)
+"""
+
+from __future__ import annotations
+import sys
+import time
+
+from benchmarks.data import hostnames
+from data_structures.hash_functions import BuiltinHash, FNV1aHash, KeyedHash
+from data_structures.hash_table import LinearProbeTable
+from table_stats import enable_stats
+
+__author__ = "Adrian Ong Zhe Yee, Teh Yee Hong"
+
+HASH_FUNCTIONS = {
+    "polynomial": None,
+    "builtin": BuiltinHash(),
+    "fnv1a": FNV1aHash(),
+    "keyed": KeyedHash(),
+}
+
+
+def throughput(hash_function, names: list[str]) -> float:
+    """
+    Hash every name into a table of the size the names end up in, as the table does.
+
+    Returns: millions of hashes per second
+    """
+    size = next(size for size in LinearProbeTable.TABLE_SIZES if len(names) <= size / 2)
+    table = LinearProbeTable([size], hash_function)
+    start = time.perf_counter()
+    for name in names:
+        table.hash(name)
+    return len(names) / (time.perf_counter() - start) / 1e6
+
+
+def clustering(hash_function, names: list[str]) -> tuple[float, int, int]:
+    """
+    Insert every name into a table, then look every name up.
+
+    Returns: the mean and the longest probe of the lookups, and the longest run of occupied slots
+    """
+    table = LinearProbeTable(hash_function=hash_function)
+    for name in names:
+        table[name] = None
+    stats = enable_stats(table)
+    for name in names:
+        table[name]
+    probes = list(stats.hit_probes)
+    mean = sum(length * count for length, count in enumerate(probes)) / len(names)
+    longest_probe = max(length for length, count in enumerate(probes) if count)
+
+    longest_run = run = 0
+    for item in list(table.array) * 2:  # twice, for the run wrapping around the end
+        run = run + 1 if item is not None else 0
+        longest_run = max(longest_run, run)
+    return mean, longest_probe, min(longest_run, table.table_size)
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    names = hostnames(n)
+    print(f"{n:,} names like {names[0]}")
+    print(f"{'hash':>10} {'Mhash/s':>8} {'mean probe':>11} {'max probe':>10} {'max cluster':>12}")
+    for label, hash_function in HASH_FUNCTIONS.items():
+        rate = throughput(hash_function, names)
+        mean, longest_probe, longest_run = clustering(hash_function, names)
+        print(f"{label:>10} {rate:>8.2f} {mean:>11.2f} {longest_probe:>10} {longest_run:>12}")
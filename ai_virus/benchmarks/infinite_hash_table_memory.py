@@ -0,0 +1,70 @@
+"""
+Memory and depth of InfiniteHashTable on hostname sets, with and without compression.
+"""
+
+from __future__ import annotations
+import time
+import tracemalloc
+
+from benchmarks.data import hostnames
+from infinite_hash_table import InfiniteHashTable
+
+__author__ = "Adrian Ong Zhe Yee, Teh Yee Hong"
+
+
+def count_tables(table: InfiniteHashTable) -> int:
+    """
+    Returns the number of tables in table, including itself.
+
+    Complexity: O(n), n is the number of tables
+    """
+    total = 1
+    for item in table.array:
+        if isinstance(item, InfiniteHashTable):
+            total += count_tables(item)
+    return total
+
+
+def measure(keys: list[str], compressed: bool) -> tuple[int, int, int, float]:
+    """
+    Build a table holding keys.
+
+    Returns: bytes allocated, number of tables, deepest location length and build time in seconds
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    table = InfiniteHashTable(compressed=compressed)
+    for i, key in enumerate(keys):
+        table[key] = i
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    depth = max(len(table.get_location(key)) for key in keys[::97])
+    return size, count_tables(table), depth, elapsed
+
+
+def measure_nodes(n: int) -> tuple[float, float]:
+    """
+    Create n empty tables.
+
+    Returns: bytes and microseconds per table
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    tables = [InfiniteHashTable(1) for _ in range(n)]
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size / len(tables), elapsed / n * 1e6
+
+
+if __name__ == "__main__":
+    size, elapsed = measure_nodes(100000)
+    print(f"empty table: {size:.0f} B, {elapsed:.2f} us")
+    print(f"{'keys':>8} {'mode':>10} {'KiB':>10} {'B/key':>8} {'tables':>8} {'depth':>6} {'build s':>8}")
+    for n in [1000, 10000, 50000]:
+        keys = hostnames(n)
+        for compressed in [False, True]:
+            size, tables, depth, elapsed = measure(keys, compressed)
+            mode = "compressed" if compressed else "plain"
+            print(f"{n:>8} {mode:>10} {size / 1024:>10.0f} {size / n:>8.0f} {tables:>8} {depth:>6} {elapsed:>8.2f}")
@@ -0,0 +1,53 @@
+"""
+Following a route written by route_format.dump with a TopVirus: loading all of it first against
+reading it lazily through a RouteFile. The top branch of every split is one computer and the
+bottom branch a thousand, so the virus goes through a small part of the route.
+
+Usage: python -m benchmarks.lazy_routes [computers]  (default 1,000,000)
+"""
+
+from __future__ import annotations
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.data import hostnames
+from computer import Computer
+from route_builder import RouteBuilder
+from route_format import RouteFile, dump, load
+from virus import TopVirus
+
+__author__ = "Adrian Ong Zhe Yee, Teh Yee Hong"
+
+BRANCH = 1000
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    computers = [Computer(name, 1, 1, 0.5) for name in hostnames(n)]
+    builder = RouteBuilder()
+    for start in range(0, n, BRANCH + 1):
+        builder.split().series(computers[start:start + 1]).bottom()
+        builder.series(computers[start + 1:start + BRANCH + 1]).end()
+    route = builder.freeze()
+    print(f"{n:,} computers")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "route.bin")
+        with open(path, "wb") as file:
+            dump(route, file)
+        start = time.perf_counter()
+        with open(path, "rb") as file:
+            virus = TopVirus()
+            load(file).follow_path(virus)
+        print(f"load all, then follow: {time.perf_counter() - start:.2f} s, {len(virus.computers):,} computers")
+
+        start = time.perf_counter()
+        with open(path, "rb") as file:
+            route_file = RouteFile(file)
+            opened = time.perf_counter()
+            virus = TopVirus()
+            route_file.root().follow_path(virus)
+            followed = time.perf_counter()
+        print(f"RouteFile: {opened - start:.2f} s reading the computer table, "
+              f"{followed - opened:.3f} s following, {len(virus.computers):,} computers")
@@ -0,0 +1,77 @@
+"""
+Microbenchmarks of ArrayR allocation, iteration and bulk operations.
+
+Each row compares the per-element way of doing something with the ArrayR
+operation that now replaces it.
+"""
+
+from __future__ import annotations
+import timeit
+from ctypes import py_object
+
+from data_structures.hash_table import LinearProbeTable
+from data_structures.referential_array import ArrayR
+
+__author__ = "Adrian Ong Zhe Yee, Teh Yee Hong"
+
+SIZES = [29, 3079, 196613, 1572869]
+
+
+def allocate_per_element(length: int) -> None:
+    """ The allocation ArrayR used to do, filling with a list comprehension. """
+    array = (length * py_object)()
+    array[:] = [None for _ in range(length)]
+
+
+def iterate_per_element(array: ArrayR) -> int:
+    """ Walk the array by index, one __getitem__ call per position. """
+    total = 0
+    for i in range(len(array)):
+        if array[i] is not None:
+            total += 1
+    return total
+
+
+def iterate_bulk(array: ArrayR) -> int:
+    """ Walk the array through ArrayR.__iter__. """
+    total = 0
+    for item in array:
+        if item is not None:
+            total += 1
+    return total
+
+
+def set_per_element(array: ArrayR, items: list) -> None:
+    """ Copy items into the array one __setitem__ call at a time. """
+    for i in range(len(items)):
+        array[i] = items[i]
+
+
+def best(statement, number: int) -> float:
+    """ Best time of 3 runs, in microseconds per call. """
+    return min(timeit.repeat(statement, number=number, repeat=3)) / number * 1e6
+
+
+if __name__ == "__main__":
+    print(f"{'length':>9} {'op':>10} {'before us':>12} {'after us':>12} {'speedup':>8}")
+    for length in SIZES:
+        number = max(1, 200000 // length)
+        array = ArrayR(length)
+        items = list(range(length))
+        rows = [
+            ("allocate", lambda: allocate_per_element(length), lambda: ArrayR(length)),
+            ("iterate", lambda: iterate_per_element(array), lambda: iterate_bulk(array)),
+            ("fill", lambda: set_per_element(array, [0] * length), lambda: array.fill(0)),
+            ("from_list", lambda: set_per_element(ArrayR(length), items), lambda: ArrayR.from_list(items)),
+            ("copy_from", lambda: set_per_element(array, items), lambda: array.copy_from(items)),
+        ]
+        for name, before, after in rows:
+            before_us = best(before, number)
+            after_us = best(after, number)
+            print(f"{length:>9} {name:>10} {before_us:>12.1f} {after_us:>12.1f} {before_us / after_us:>7.1f}x")
+
+    table = LinearProbeTable()
+    for i in range(100000):
+        table[str(i)] = i
+    print(f"LinearProbeTable keys() on {len(table)} entries: {best(table.keys, 5):.0f} us")
+    print(f"LinearProbeTable values() on {len(table)} entries: {best(table.values, 5):.0f} us")
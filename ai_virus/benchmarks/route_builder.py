@@ -0,0 +1,52 @@
+"""
+Building a long route with RouteBuilder against chaining Route.add_computer_before from the end,
+with a split every thousand computers.
+
+Usage: python -m benchmarks.route_builder [computers]  (default 1,000,000)
+"""
+
+from __future__ import annotations
+import sys
+import time
+
+from benchmarks.data import hostnames
+from computer import Computer
+from route import Route
+from route_builder import RouteBuilder
+
+__author__ = "Adrian Ong Zhe Yee, Teh Yee Hong"
+
+SPLIT_EVERY = 1000
+
+
+def chained(computers: list[Computer]) -> Route:
+    """
+    Returns: the route, built back to front with add_computer_before and add_empty_branch_before
+    """
+    route = Route(None)
+    for i in range(len(computers) - 1, -1, -1):
+        route = route.add_computer_before(computers[i])
+        if i % SPLIT_EVERY == 0:
+            route = route.add_empty_branch_before()
+    return route
+
+
+def built(computers: list[Computer]) -> Route:
+    """
+    Returns: the same route, built front to back with a RouteBuilder
+    """
+    builder = RouteBuilder()
+    for start in range(0, len(computers), SPLIT_EVERY):
+        builder.split().end().series(computers[start:start + SPLIT_EVERY])
+    return builder.freeze()
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    computers = [Computer(name, 1, 1, 0.5) for name in hostnames(n)]
+    print(f"{n:,} computers")
+    for label, build in [("chained", chained), ("builder", built)]:
+        start = time.perf_counter()
+        route = build(computers)
+        print(f"{label:>8} {time.perf_counter() - start:>6.2f} s")
+        del route
@@ -0,0 +1,38 @@
+"""
+Writing a route with route_format.dump to a file and reading it back with load: size and
+throughput, for a route of series and for one of runs, with a split every thousand computers.
+
+Usage: python -m benchmarks.route_format [computers]  (default 1,000,000)
+"""
+
+from __future__ import annotations
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.data import hostnames
+from benchmarks.route_runs import build
+from computer import Computer
+from route_format import dump, load
+
+__author__ = "Adrian Ong Zhe Yee, Teh Yee Hong"
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    computers = [Computer(name, 1, 1, 0.5) for name in hostnames(n)]
+    print(f"{n:,} computers")
+    print(f"{'nodes':>7} {'B/computer':>11} {'dump s':>7} {'load s':>7}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "route.bin")
+        for label, runs in [("series", False), ("runs", True)]:
+            route = build(computers, runs)
+            start = time.perf_counter()
+            with open(path, "wb") as file:
+                size = dump(route, file)
+            dumped = time.perf_counter()
+            with open(path, "rb") as file:
+                load(file)
+            loaded = time.perf_counter()
+            print(f"{label:>7} {size / n:>11.1f} {dumped - start:>7.2f} {loaded - dumped:>7.2f}")
@@ -0,0 +1,60 @@
+"""
+Memory and traversal time of a long backbone route (a split every thousand computers) built with a
+RouteSeries per computer against one RouteRun per stretch of computers.
+
+Usage: python -m benchmarks.route_runs [computers]  (default 1,000,000)
+"""
+
+from __future__ import annotations
+import sys
+import time
+import tracemalloc
+
+from benchmarks.data import hostnames
+from computer import Computer
+from route import Route
+from route_builder import RouteBuilder
+from virus import TopVirus
+
+__author__ = "Adrian Ong Zhe Yee, Teh Yee Hong"
+
+SPLIT_EVERY = 1000
+
+
+def build(computers: list[Computer], runs: bool) -> Route:
+    """
+    Returns: the backbone route, with or without runs
+    """
+    builder = RouteBuilder(runs)
+    for start in range(0, len(computers), SPLIT_EVERY):
+        builder.split().end().series(computers[start:start + SPLIT_EVERY])
+    return builder.freeze()
+
+
+def measure(computers: list[Computer], runs: bool) -> tuple[int, float, float]:
+    """
+    Build the route while tracing memory, then time add_all_computers and follow_path on it.
+
+    Returns: bytes allocated by the route, and the seconds taken by each traversal
+    """
+    tracemalloc.start()
+    route = build(computers, runs)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    route.add_all_computers()
+    listed = time.perf_counter()
+    route.follow_path(TopVirus())
+    followed = time.perf_counter()
+    return size, listed - start, followed - listed
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    computers = [Computer(name, 1, 1, 0.5) for name in hostnames(n)]
+    print(f"{n:,} computers")
+    print(f"{'nodes':>7} {'B/computer':>11} {'list s':>7} {'follow s':>9}")
+    for label, runs in [("series", False), ("runs", True)]:
+        size, listed, followed = measure(computers, runs)
+        print(f"{label:>7} {size / n:>11.0f} {listed:>7.2f} {followed:>9.2f}")
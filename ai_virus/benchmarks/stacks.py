@@ -0,0 +1,39 @@
+"""
+ArrayStack against LinkedStack on push/pop sequences.
+
+Usage: python -m benchmarks.stacks [operations]  (default 10,000,000)
+"""
+
+from __future__ import annotations
+import sys
+import time
+
+from data_structures.array_stack import ArrayStack
+from data_structures.linked_stack import LinkedStack
+
+__author__ = "Adrian Ong Zhe Yee, Teh Yee Hong"
+
+
+def run(stack, operations: int, depth: int) -> float:
+    """
+    Push depth items then pop them, repeatedly, until operations pushes and pops have been made.
+
+    Returns: the elapsed seconds
+    """
+    start = time.perf_counter()
+    for _ in range(operations // (2 * depth)):
+        for i in range(depth):
+            stack.push(i)
+        for _ in range(depth):
+            stack.pop()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    operations = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    print(f"{operations:,} operations")
+    print(f"{'depth':>9} {'LinkedStack s':>14} {'ArrayStack s':>13} {'speedup':>8}")
+    for depth in [16, 1000, 1_000_000]:
+        linked = run(LinkedStack(), operations, depth)
+        arrayed = run(ArrayStack(), operations, depth)
+        print(f"{depth:>9} {linked:>14.2f} {arrayed:>13.2f} {linked / arrayed:>7.2f}x")
@@ -3,35 +3,81 @@ This module stores ComputerManager class
 """
 
 from __future__ import annotations
+from typing import Iterator
+from algorithms.mergesort import mergesort
 from computer import Computer
+from data_structures.hash_functions import HashFunction
+from data_structures.hash_table import LinearProbeTable
+from data_structures.referential_array import ArrayR
 from double_key_table import DoubleKeyTable
 
 __author__ = "Adrian Ong Zhe Yee, Teh Yee Hong"
 
 class ComputerManager:
+    """
+    Stores computers by hacking difficulty, then by name.
 
-    def __init__(self) -> None:
-        self.all_computers = DoubleKeyTable()
+    Difficulties from 0 to DIRECT_DIFFICULTIES - 1 (the usual ones) index straight into an array
+    of tables keyed by name, so they need no string formatting or hashing of the difficulty.
+    Any other difficulty falls back to a DoubleKeyTable keyed by str(difficulty).
+
+    All the tables hash with hash_function when one is given (see data_structures.hash_functions).
+    """
+
+    DIRECT_DIFFICULTIES = 10
+
+    def __init__(self, hash_function: HashFunction | None = None) -> None:
+        self.hash_function = hash_function
+        self.by_difficulty: ArrayR[LinearProbeTable[str, Computer] | None] = ArrayR(self.DIRECT_DIFFICULTIES)
+        self.other_difficulties = DoubleKeyTable(hash_function=hash_function)
+
+    def _is_direct(self, difficulty: int) -> bool:
+        """
+        Whether a difficulty is stored in the direct array rather than the fallback table.
+        A bool is an int, but True and False are stored as the difficulties they are, not as 1 and 0.
+
+        Complexity: O(1)
+        """
+        return isinstance(difficulty, int) and not isinstance(difficulty, bool) and 0 <= difficulty < self.DIRECT_DIFFICULTIES
 
     def add_computer(self, computer: Computer) -> None:
         """
-        This function helps to store the computer into the DoubleKeyTable
+        This function helps to store the computer
 
         param arg1: the computer to be added
 
-        Complexity: The complexity of DoubleKeyTable's linear probe
+        Complexity: Best case occur when the difficulty is in the direct array, the complexity of LinearProbeTable's linear probe
+                    Worst case occur when the difficulty falls back, the complexity of DoubleKeyTable's linear probe
         """
-        self.all_computers[str(computer.hacking_difficulty), computer.name] = computer
+        difficulty = computer.hacking_difficulty
+        if self._is_direct(difficulty):
+            table = self.by_difficulty[difficulty]
+            if table is None:
+                table = LinearProbeTable(hash_function=self.hash_function)
+                self.by_difficulty[difficulty] = table
+            table[computer.name] = computer
+        else:
+            self.other_difficulties[str(difficulty), computer.name] = computer
 
     def remove_computer(self, computer: Computer) -> None:
         """
-        This function helps to delete the computer in the DoubleKeyTable
+        This function helps to delete the computer
 
         param arg1: the computer to be deleted
 
-        Complexity: The complexity of DoubleKeyTable's __delitem__
+        :raises KeyError: when the computer isn't stored
+
+        Complexity: Best case occur when the difficulty is in the direct array, the complexity of LinearProbeTable's __delitem__
+                    Worst case occur when the difficulty falls back, the complexity of DoubleKeyTable's __delitem__
         """
-        del self.all_computers[str(computer.hacking_difficulty), computer.name]
+        difficulty = computer.hacking_difficulty
+        if self._is_direct(difficulty):
+            table = self.by_difficulty[difficulty]
+            if table is None:
+                raise KeyError(computer.name)
+            del table[computer.name]
+        else:
+            del self.other_difficulties[str(difficulty), computer.name]
 
     def edit_computer(self, old: Computer, new: Computer) -> None:
         """
@@ -40,10 +86,29 @@ class ComputerManager:
         param arg1: the computer to be deleted
         param arg2: the computer to be added
 
-        Complexity: The complexity of DoubleKeyTable's linear probe + The complexity of DoubleKeyTable's __delitem__
+        Complexity: The complexity of remove_computer + The complexity of add_computer
         """
-        self.all_computers[str(new.hacking_difficulty), new.name] = new.hacking_difficulty
-        del self.all_computers[str(old.hacking_difficulty), old.name]
+        self.remove_computer(old)
+        self.add_computer(new)
+
+    def iter_computers_with_difficulty(self, diff: int, snapshot: bool = False) -> Iterator[Computer]:
+        """
+        This function yields the computers with the given hacking difficulty, straight from the table
+
+        param arg1: the hacking difficulty in integer
+        param arg2: whether to pin the table's array, so inserts during iteration are tolerated,
+                    see LinearProbeTable.iter_items
+
+        Complexity: O(n) time and O(1) memory, where n is the table size of the difficulty's table
+        """
+        if self._is_direct(diff):
+            table = self.by_difficulty[diff]
+            if table is not None:
+                for _, computer in table.iter_items(snapshot):
+                    yield computer
+        else:
+            for _, computer in self.other_difficulties.iter_items(str(diff), snapshot):
+                yield computer
 
     def computers_with_difficulty(self, diff: int) -> list[Computer]:
         """
@@ -51,27 +116,102 @@ class ComputerManager:
 
         param arg1: the hacking difficulty in integer
 
-        Complexity: Best case occur when there's nothing in iter_values, Complexity is O(n)
-                    Worst case occur when iter_values is full, Complexity is O(n)
+        Complexity: O(n), where n is the table size of the difficulty's table
+        """
+        return list(self.iter_computers_with_difficulty(diff))
+
+    @staticmethod
+    def _other_order(difficulty: str) -> tuple:
         """
-        lst = []
-        for c in self.all_computers.iter_values(str(diff)):
-            lst.append(c)
-        return lst
+        The sort key of a difficulty stored in the fallback table: difficulties that are numbers
+        come first, in order of value, then any other, such as a name, in order of its string.
+        Two keys always compare, as only keys of the same kind compare their second items.
+        Whole numbers are read as ints, so large ones keep every digit, and equal numbers (such as
+        "02" and "2.0") are in order of their strings.
+
+        Complexity: O(len(difficulty))
+        """
+        try:
+            return 0, int(difficulty), difficulty
+        except ValueError:
+            pass
+        try:
+            value = float(difficulty)
+        except ValueError:
+            return 1, difficulty
+        if value != value:
+            # NaN doesn't compare with any number, so it goes with the other difficulties.
+            return 1, difficulty
+        return 0, value, difficulty
+
+    def iter_group_by_difficulty(self, snapshot: bool = False) -> Iterator[tuple[int | str, Iterator[Computer]]]:
+        """
+        This function yields (difficulty, iterator of its computers) in increasing order of difficulty,
+        leaving out difficulties with no computers. Difficulties outside the direct array are given as
+        the strings they are stored under, merged by value with the direct ones (a fallback difficulty
+        equal to a direct one, such as "2.0", comes after it), and those that aren't numbers come last
+        (see _other_order).
+
+        param arg1: whether to pin the tables' arrays, see LinearProbeTable.iter_items
+
+        Complexity: O(n + m log m) time, where n is the total size of the tables and m is the number of
+                    difficulties outside the direct array (usually none), O(m) memory
+        """
+        others = mergesort(self.other_difficulties.keys(), key=self._other_order)
+        i = 0
+        for difficulty in range(self.DIRECT_DIFFICULTIES):
+            while i < len(others) and self._other_order(others[i]) < (0, difficulty):
+                yield others[i], self.iter_computers_with_difficulty(others[i], snapshot)
+                i += 1
+            table = self.by_difficulty[difficulty]
+            if table is not None and not table.is_empty():
+                yield difficulty, self.iter_computers_with_difficulty(difficulty, snapshot)
+        for difficulty in others[i:]:
+            yield difficulty, self.iter_computers_with_difficulty(difficulty, snapshot)
 
     def group_by_difficulty(self) -> list[list[Computer]]:
         """
-        This function returns a list of list separating their hacking difficulty
+        This function returns a list of list separating their hacking difficulty,
+        in increasing order of difficulty, leaving out difficulties with no computers.
+
+        Complexity: See iter_group_by_difficulty.
+        """
+        return [list(computers) for _, computers in self.iter_group_by_difficulty()]
+
+    def iter_items(self, snapshot: bool = False) -> Iterator[tuple[int | str, Computer]]:
+        """
+        This function yields (difficulty, computer) for every computer, in increasing order of difficulty
+
+        param arg1: whether to pin the tables' arrays, see LinearProbeTable.iter_items
+
+        Complexity: See iter_group_by_difficulty.
+        """
+        for difficulty, computers in self.iter_group_by_difficulty(snapshot):
+            for computer in computers:
+                yield difficulty, computer
+
+    def iter_batches(self, n: int, snapshot: bool = False) -> Iterator[list[Computer]]:
+        """
+        This function yields the computers in lists of n (the last one may be shorter),
+        in increasing order of difficulty, so only one batch is held in memory at a time
+
+        param arg1: the size of each batch
+        param arg2: whether to pin the tables' arrays, see LinearProbeTable.iter_items
+
+        :raises ValueError: when n is not positive
 
-        Complexity: Best case occur when all the lst_lst are empty, Complexity is O(n^2)
-                    Worst case occur when all lst_lst are full, Complexity is O(n^2)
+        Complexity: See iter_group_by_difficulty, O(n) memory
         """
-        lst = []
-        for x in range(0, 10):
-            lst_lst = self.computers_with_difficulty(x)
-            if len(lst_lst) != 0:
-                lst.append(lst_lst)
-        return lst
+        if n <= 0:
+            raise ValueError("Batch size should be larger than 0.")
+        batch = []
+        for _, computer in self.iter_items(snapshot):
+            batch.append(computer)
+            if len(batch) == n:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
 
 if __name__ == "__main__":
     pass
@@ -0,0 +1,145 @@
+""" Array of references with an adaptive layout, for arrays that are mostly empty.
+
+An AdaptiveArray behaves like an ArrayR of the given length whose empty
+positions hold None, but it only allocates the ArrayR once it holds more
+than NODE_SIZES[-1] items. Until then it keeps a pair of sorted tuples,
+one with the occupied positions and one with their items: positions are
+searched linearly while there are at most NODE_SIZES[0] of them and with
+binary search after that. This is the layout of the nodes of an adaptive
+radix tree.
+
+The ArrayR and the pair of tuples are kept together in one attribute,
+layout, which is replaced as a whole on every change (the ArrayR is filled
+before it is stored). A reader takes layout once and works on that, so it
+never sees a half-made change, nor the ArrayR and the tuples from two
+different changes.
+"""
+__author__ = "Adrian Ong Zhe Yee, Teh Yee Hong"
+__docformat__ = 'reStructuredText'
+
+from bisect import bisect_left
+from typing import TypeVar, Generic, Iterator
+from data_structures.referential_array import ArrayR
+
+T = TypeVar('T')
+
+
+class AdaptiveArray(Generic[T]):
+
+    NODE_SIZES = (4, 16)
+
+    __slots__ = ("length", "layout")
+
+    def __init__(self, length: int) -> None:
+        """ Creates an empty array of the given length, without allocating the positions
+        :complexity: O(1)
+        :pre: length > 0
+        """
+        if length <= 0:
+            raise ValueError("Array length should be larger than 0.")
+        self.length = length
+        self.layout: tuple[ArrayR[T] | None, tuple[int, ...], tuple[T, ...]] = (None, (), ())
+
+    @property
+    def array(self) -> ArrayR[T] | None:
+        """ Returns the ArrayR holding the items, None while they are kept in the tuples
+        :complexity: O(1)
+        """
+        return self.layout[0]
+
+    @property
+    def slots(self) -> tuple[tuple[int, ...], tuple[T, ...]]:
+        """ Returns the sorted positions and their items, both empty once moved to an ArrayR
+        :complexity: O(1)
+        """
+        return self.layout[1], self.layout[2]
+
+    def __len__(self) -> int:
+        """ Returns the length of the array
+        :complexity: O(1)
+        """
+        return self.length
+
+    def _find(self, positions: tuple[int, ...], index: int) -> int:
+        """ Returns where index is, or would be inserted, in the sorted positions
+        :complexity: O(NODE_SIZES[0]) while small, O(log(NODE_SIZES[-1])) after that
+        """
+        if len(positions) <= self.NODE_SIZES[0]:
+            i = 0
+            while i < len(positions) and positions[i] < index:
+                i += 1
+            return i
+        return bisect_left(positions, index)
+
+    def __getitem__(self, index: int) -> T:
+        """ Returns the object in position index, None if it is empty.
+        :complexity: O(1), see _find
+        :pre: index in between 0 and length
+        """
+        array, positions, items = self.layout
+        if array is not None:
+            return array[index]
+        if not 0 <= index < self.length:
+            raise IndexError(index)
+        i = self._find(positions, index)
+        if i < len(positions) and positions[i] == index:
+            return items[i]
+        return None
+
+    def __setitem__(self, index: int, value: T) -> None:
+        """ Sets the object in position index to value, setting None empties the position.
+        Moves the items to an ArrayR once there are more than NODE_SIZES[-1] of them.
+        :complexity: O(NODE_SIZES[-1]) while the items are kept in the tuples, O(length) when
+                     they are moved to an ArrayR, O(1) after that
+        :pre: index in between 0 and length
+        """
+        array, positions, items = self.layout
+        if array is not None:
+            array[index] = value
+            return
+        if not 0 <= index < self.length:
+            raise IndexError(index)
+        i = self._find(positions, index)
+        if i < len(positions) and positions[i] == index:
+            if value is None:
+                self.layout = (None, positions[:i] + positions[i + 1:], items[:i] + items[i + 1:])
+            else:
+                self.layout = (None, positions, items[:i] + (value,) + items[i + 1:])
+        elif value is not None:
+            if len(positions) == self.NODE_SIZES[-1]:
+                full = [None] * self.length
+                for position, item in zip(positions, items):
+                    full[position] = item
+                full[index] = value
+                # The tuples are dropped in the same store, so nothing keeps the old items alive.
+                self.layout = (ArrayR.from_list(full), (), ())
+            else:
+                self.layout = (None, positions[:i] + (index,) + positions[i:], items[:i] + (value,) + items[i:])
+
+    def __iter__(self) -> Iterator[T]:
+        """ Yields the object in every position, None for the empty ones.
+        :complexity: O(length)
+        """
+        array, positions, items = self.layout
+        if array is not None:
+            yield from array
+            return
+        i = 0
+        for index in range(self.length):
+            if i < len(positions) and positions[i] == index:
+                yield items[i]
+                i += 1
+            else:
+                yield None
+
+    def items(self) -> Iterator[tuple[int, T]]:
+        """ Yields (position, object) for every position that is not empty, in position order.
+        :complexity: O(number of items) while small, O(length) once moved to an ArrayR
+        """
+        array, positions, items = self.layout
+        if array is not None:
+            for i, item in enumerate(array):
+                if item is not None:
+                    yield i, item
+            return
+        yield from zip(positions, items)
@@ -0,0 +1,101 @@
+""" Stack ADT based on an array. """
+
+__author__ = 'Adrian Ong Zhe Yee, Teh Yee Hong'
+__docformat__ = 'reStructuredText'
+
+from data_structures.stack_adt import *
+
+
+class ArrayStack(Stack[T]):
+    """ Implementation of a stack with an array.
+
+        Pushing doesn't allocate anything until the array is full, at which point
+        it is doubled in size, so pushes cost O(1) amortised.
+
+        The array is a Python list used as a fixed-size block of references (it is
+        only ever indexed, and resized by doubling) rather than an ArrayR: every
+        store into a ctypes py_object array also records the reference in the
+        array's bookkeeping, which made an ArrayR-backed stack slower than LinkedStack.
+
+        Attributes:
+            length (int): number of elements in the stack (inherited)
+            array (list[T | None]): the elements, from the bottom of the stack up
+            max_capacity (int | None): the most elements the stack can hold, None for no limit
+    """
+
+    MIN_CAPACITY = 16
+
+    __slots__ = ("array", "max_capacity")
+
+    def __init__(self, max_capacity: int | None = None) -> None:
+        """ Object initializer.
+            :pre: max_capacity is None or > 0
+        """
+        Stack.__init__(self)
+        if max_capacity is not None and max_capacity <= 0:
+            raise ValueError("Capacity should be larger than 0.")
+        self.max_capacity = max_capacity
+        self.array = [None] * self._initial_capacity()
+
+    def _initial_capacity(self) -> int:
+        """ The size of a new array for this stack. """
+        if self.max_capacity is None:
+            return self.MIN_CAPACITY
+        return min(self.MIN_CAPACITY, self.max_capacity)
+
+    def clear(self) -> None:
+        """ Resets the stack, releasing its elements
+            :complexity: O(1)
+        """
+        super().clear()
+        self.array = [None] * self._initial_capacity()
+
+    def is_full(self) -> bool:
+        """ Returns whether the stack is full
+            :complexity: O(1)
+        """
+        return self.length == self.max_capacity
+
+    def push(self, item: T) -> None:
+        """ Pushes an element to the top of the stack.
+            :complexity: O(1) amortised, O(n) when the array has to grow
+            :raises Exception: if the stack is full
+        """
+        if self.length == len(self.array):
+            if self.is_full():
+                raise Exception('Stack is full')
+            self._grow()
+        self.array[self.length] = item
+        self.length += 1
+
+    def _grow(self) -> None:
+        """ Doubles the size of the array (capped at max_capacity).
+            :complexity: O(n)
+        """
+        capacity = 2 * len(self.array)
+        if self.max_capacity is not None:
+            capacity = min(capacity, self.max_capacity)
+        self.array.extend([None] * (capacity - len(self.array)))
+
+    def pop(self) -> T:
+        """ Pops the element at the top of the stack.
+            :pre: stack is not empty
+            :complexity: O(1)
+            :raises Exception: if the stack is empty
+        """
+        if self.length == 0:
+            raise Exception('Stack is empty')
+        self.length -= 1
+        item = self.array[self.length]
+        self.array[self.length] = None
+        return item
+
+    def peek(self) -> T:
+        """ Returns the element at the top, without popping it from stack.
+            :pre: stack is not empty
+            :complexity: O(1)
+            :raises Exception: if the stack is empty
+        """
+        if self.length == 0:
+            raise Exception('Stack is empty')
+        return self.array[self.length - 1]
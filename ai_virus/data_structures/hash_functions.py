@@ -0,0 +1,98 @@
+""" Hash functions for the probe tables.
+
+A LinearProbeTable or DoubleKeyTable given a hash_function reduces
+hash_function(key) modulo its table size, instead of using its own
+polynomial hash, whose multiplier is reduced modulo table_size - 1 (so
+its quality depends on the table size) and which costs two modulo
+operations per character.
+
+    - BuiltinHash:  Python's hash(). Strings cache their hash, so every
+                    hash after the first (including during rehashes) is
+                    O(1). The value changes between processes unless
+                    PYTHONHASHSEED is set.
+    - FNV1aHash:    64-bit FNV-1a over the UTF-8 bytes of the key. The
+                    same value in every process, but easily attacked.
+    - KeyedHash:    a keyed 64-bit hash (BLAKE2b with a secret key, which
+                    like SipHash is a keyed PRF), for keys chosen by
+                    someone else: without the key, colliding keys cannot
+                    be found.
+
+Use benchmarks.hash_functions to compare them on realistic names.
+
+A table whose probe chains grow past a bound (see LinearProbeTable.MAX_PROBE_FACTOR)
+rebuilds itself with hash_function.reseeded(): a KeyedHash with a new random
+key, whatever it was using before.
+"""
+from __future__ import annotations
+__author__ = "Adrian Ong Zhe Yee, Teh Yee Hong"
+__docformat__ = 'reStructuredText'
+
+import os
+from abc import ABC, abstractmethod
+from hashlib import blake2b
+
+MASK64 = (1 << 64) - 1
+
+
+class HashFunction(ABC):
+    """ A hash function that doesn't depend on the size of the table using it. """
+
+    __slots__ = ()
+
+    @abstractmethod
+    def __call__(self, key: str) -> int:
+        """ Returns a non-negative hash of key, less than 2 ** 64 """
+        pass
+
+    def reseeded(self) -> HashFunction:
+        """ Returns a hash function to use instead of this one once keys collide too much:
+        a KeyedHash with a new random key, as a hash that takes no key cannot be changed.
+        """
+        return KeyedHash()
+
+
+class BuiltinHash(HashFunction):
+
+    __slots__ = ()
+
+    def __call__(self, key: str) -> int:
+        """ Returns Python's hash of key
+        :complexity: O(len(key)) the first time key is hashed, O(1) after that
+        """
+        return hash(key) & MASK64
+
+
+class FNV1aHash(HashFunction):
+
+    OFFSET_BASIS = 0xcbf29ce484222325
+    PRIME = 0x100000001b3
+
+    __slots__ = ()
+
+    def __call__(self, key: str) -> int:
+        """ Returns the 64-bit FNV-1a hash of the UTF-8 encoding of key
+        :complexity: O(len(key))
+        """
+        value = self.OFFSET_BASIS
+        for byte in key.encode():
+            value = ((value ^ byte) * self.PRIME) & MASK64
+        return value
+
+
+class KeyedHash(HashFunction):
+
+    KEY_SIZE = 16
+
+    __slots__ = ("key",)
+
+    def __init__(self, key: bytes | None = None) -> None:
+        """ Creates a hash keyed with key, or with a random key when it is None
+        :pre: len(key) <= 64
+        """
+        self.key = os.urandom(self.KEY_SIZE) if key is None else key
+
+    def __call__(self, key: str) -> int:
+        """ Returns the keyed hash of the UTF-8 encoding of key
+        :complexity: O(len(key)), done in C
+        """
+        return int.from_bytes(blake2b(key.encode(), digest_size=8, key=self.key).digest(), "little")
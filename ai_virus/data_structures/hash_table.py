@@ -7,8 +7,9 @@ __author__ = 'Jackson Goerner'
 __since__ = '07/02/2023'
 
 
-from typing import TypeVar, Generic
+from typing import TypeVar, Generic, Iterator
 from data_structures.referential_array import ArrayR
+from data_structures.hash_functions import HashFunction, KeyedHash
 
 K = TypeVar('K')
 V = TypeVar('V')
@@ -26,6 +27,12 @@ class LinearProbeTable(Generic[K, V]):
                 Otherwise `hash` should be overwritten.
         - V:    Value Type.
 
+    An insert that probes more than MAX_PROBE_FACTOR * log2(table_size) positions, which
+    random keys practically never do but keys chosen to collide will, marks the table as
+    degraded, and it is rebuilt at the same size with a freshly seeded hash function
+    (see HashFunction.reseeded). That happens at most once per table size, so a table whose
+    `hash` is overridden, and so cannot be reseeded, doesn't keep rebuilding itself.
+
     Unless stated otherwise, all methods have O(1) complexity.
     """
 
@@ -34,12 +41,20 @@ class LinearProbeTable(Generic[K, V]):
 
     HASH_BASE = 31
 
-    def __init__(self, sizes=None) -> None:
+    MAX_PROBE_FACTOR = 4
+
+    def __init__(self, sizes=None, hash_function: HashFunction | None = None) -> None:
         """
         Initialise the Hash Table.
+
+        With a hash_function, keys are hashed with it (modulo the table size) rather than
+        with the polynomial hash in `hash`.
         """
         if sizes is not None:
             self.TABLE_SIZES = sizes
+        self.hash_function = hash_function
+        self.degraded = False
+        self.reseeded_index = -1
         self.size_index = 0
         self.array:ArrayR[tuple[K, V]] = ArrayR(self.TABLE_SIZES[self.size_index])
         self.count = 0
@@ -48,8 +63,10 @@ class LinearProbeTable(Generic[K, V]):
         """
         Hash a key for insert/retrieve/update into the hashtable.
 
-        :complexity: O(len(key))
+        :complexity: O(len(key)), or the complexity of hash_function
         """
+        if self.hash_function is not None:
+            return self.hash_function(key) % self.table_size
 
         value = 0
         a = 31415
@@ -80,10 +97,12 @@ class LinearProbeTable(Generic[K, V]):
         # Initial position
         position = self.hash(key)
 
-        for _ in range(self.table_size):
+        for probes in range(self.table_size):
             if self.array[position] is None:
                 # Empty spot. Am I upserting or retrieving?
                 if is_insert:
+                    if probes > self.MAX_PROBE_FACTOR * self.table_size.bit_length():
+                        self.degraded = True
                     return position
                 else:
                     raise KeyError(key)
@@ -104,11 +123,7 @@ class LinearProbeTable(Generic[K, V]):
 
         :complexity: O(N) where N is self.table_size.
         """
-        res = []
-        for x in range(self.table_size):
-            if self.array[x] is not None:
-                res.append(self.array[x][0])
-        return res
+        return [item[0] for item in self.array if item is not None]
 
     def values(self) -> list[V]:
         """
@@ -116,11 +131,25 @@ class LinearProbeTable(Generic[K, V]):
 
         :complexity: O(N) where N is self.table_size.
         """
-        res = []
-        for x in range(self.table_size):
-            if self.array[x] is not None:
-                res.append(self.array[x][1])
-        return res
+        return [item[1] for item in self.array if item is not None]
+
+    def iter_items(self, snapshot: bool = False) -> Iterator[tuple[K, V]]:
+        """
+        Yields every (key, value) pair straight from the slot array, without building a list.
+
+        By default every step reads the current array, so changing the table while iterating
+        changes what comes next. With snapshot=True the array is pinned when iteration starts:
+        a rehash replaces the array rather than changing it, and inserts never move existing
+        pairs, so every pair present throughout is yielded exactly once while inserts go on
+        (a pair inserted meanwhile may or may not be yielded). Deletes can still move pairs.
+
+        :complexity: O(N) where N is self.table_size, O(1) memory.
+        """
+        array = self.array
+        for x in range(len(array)):
+            item = array[x] if snapshot else self.array[x]
+            if item is not None:
+                yield item
 
     def __contains__(self, key: K) -> bool:
         """
@@ -162,6 +191,8 @@ class LinearProbeTable(Generic[K, V]):
 
         if len(self) > self.table_size / 2:
             self._rehash()
+        elif self.degraded:
+            self._reseed()
 
     def __delitem__(self, key: K) -> None:
         """
@@ -211,6 +242,23 @@ class LinearProbeTable(Generic[K, V]):
                 key, value = item
                 self[key] = value
 
+    def _reseed(self) -> None:
+        """
+        Rebuild a degraded table at the same size with a freshly seeded hash function,
+        unless it has already been reseeded at this size.
+
+        :complexity: see _rehash
+        """
+        self.degraded = False
+        # A table that has outgrown TABLE_SIZES still has its largest array, so it is rebuilt at that size.
+        self.size_index = min(self.size_index, len(self.TABLE_SIZES) - 1)
+        if self.reseeded_index == self.size_index:
+            return
+        self.reseeded_index = self.size_index
+        self.hash_function = KeyedHash() if self.hash_function is None else self.hash_function.reseeded()
+        self.size_index -= 1
+        self._rehash()
+
     def __str__(self) -> str:
         """
         Returns all they key/value pairs in our hash table (no particular
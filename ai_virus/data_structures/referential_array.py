@@ -12,12 +12,22 @@ space to hold the references.
 Note that while I do check the precondition in __init__ (noone else
 would), I do not check that of getitem or setitem, since that is already
 checked by self.array[index].
+
+The bulk operations (fill, copy_from, from_list, slicing and iteration)
+hand whole Python lists to the ctypes array, so the per-element work is
+done in C rather than through a Python call per position.
+
+ctypes keeps its own reference to every object stored in the array (in
+the array's _objects, keyed by the position in hex), and storing None
+doesn't drop it. So whenever a position is set to None, its entry is
+removed, otherwise an emptied position would keep its old object alive.
 """
+from __future__ import annotations
 __author__ = "Julian Garcia for the __init__ code, Maria Garcia de la Banda for the rest"
 __docformat__ = 'reStructuredText'
 
 from ctypes import py_object
-from typing import TypeVar, Generic
+from typing import TypeVar, Generic, Iterable, Iterator, Sequence
 
 T = TypeVar('T')
 
@@ -31,7 +41,7 @@ class ArrayR(Generic[T]):
         if length <= 0:
             raise ValueError("Array length should be larger than 0.")
         self.array = (length * py_object)() # initialises the space
-        self.array[:] =  [None for _ in range(length)]
+        self.array[:] = [None] * length
 
     def __len__(self) -> int:
         """ Returns the length of the array
@@ -39,17 +49,70 @@ class ArrayR(Generic[T]):
         """
         return len(self.array)
 
-    def __getitem__(self, index: int) -> T:
-        """ Returns the object in position index.
-        :complexity: O(1)
+    @classmethod
+    def from_list(cls, items: Sequence[T]) -> ArrayR[T]:
+        """ Creates an array holding the given items, without filling it with None first
+        :complexity: O(len(items))
+        :pre: len(items) > 0
+        """
+        items = list(items)
+        if len(items) <= 0:
+            raise ValueError("Array length should be larger than 0.")
+        array = cls.__new__(cls)
+        array.array = (len(items) * py_object)()
+        array.array[:] = items
+        return array
+
+    def __getitem__(self, index: int | slice) -> T | list[T]:
+        """ Returns the object in position index, or a list of the objects in a slice.
+        :complexity: O(1) for an index, O(length of the slice) for a slice
         :pre: index in between 0 and length - self.array[] checks it
         """
         return self.array[index]
 
-    def __setitem__(self, index: int, value: T) -> None:
-        """ Sets the object in position index to value
-        :complexity: O(1)
+    def __setitem__(self, index: int | slice, value: T | Sequence[T]) -> None:
+        """ Sets the object in position index to value, or the objects in a slice to
+        the items of value (which must have the same length as the slice).
+        :complexity: O(1) for an index, O(length of the slice) for a slice
         :pre: index in between 0 and length - self.array[] checks it
         """
         self.array[index] = value
+        if value is None:
+            self._release((index % len(self.array),))
+        elif type(index) is slice and None in value:
+            positions = range(*index.indices(len(self.array)))
+            self._release(position for position, item in zip(positions, value) if item is None)
+
+    def _release(self, positions: Iterable[int]) -> None:
+        """ Drops the reference ctypes keeps to the object that was in each of positions,
+        which must now hold None
+        :complexity: O(number of positions)
+        """
+        objects = self.array._objects
+        if objects:
+            for position in positions:
+                objects.pop(format(position, "x"), None)
+
+    def __iter__(self) -> Iterator[T]:
+        """ Iterates over the objects in the array, as they were when iteration started.
+        :complexity: O(length) to start, O(1) per object
+        """
+        return iter(self.array[:])
+
+    def fill(self, value: T) -> None:
+        """ Sets every position to value
+        :complexity: O(length)
+        """
+        self.array[:] = [value] * len(self.array)
+        if value is None and self.array._objects:
+            self.array._objects.clear()
+
+    def copy_from(self, source: ArrayR[T] | Sequence[T], start: int = 0) -> None:
+        """ Copies every object of source into this array, starting at position start
+        :complexity: O(len(source))
+        :pre: start + len(source) <= length
+        """
+        if start < 0 or start + len(source) > len(self.array):
+            raise IndexError("Source does not fit in the array.")
+        self[start:start + len(source)] = source[:]
 
@@ -0,0 +1,112 @@
+""" Array of machine numbers, a typed sibling of ArrayR.
+
+ArrayR holds references, so an array of integers in it is an array of
+pointers to boxed Python ints. ArrayT instead stores the numbers
+themselves, contiguously, in an array.array of the given dtype (one of
+the array module's type codes, e.g. 'b', 'i', 'q' or 'd'). New arrays are
+filled with zeros.
+
+The underlying array.array supports the buffer protocol, so view()
+returns a memoryview over the numbers without copying them, which can be
+handed to anything that accepts a buffer (struct, NumPy, file writes).
+"""
+from __future__ import annotations
+__author__ = "Adrian Ong Zhe Yee, Teh Yee Hong"
+__docformat__ = 'reStructuredText'
+
+from array import array
+from typing import Iterator, Sequence
+
+
+class ArrayT:
+    def __init__(self, dtype: str, length: int) -> None:
+        """ Creates an array of length zeros of the given dtype
+        :complexity: O(length), done in C
+        :pre: length > 0
+        :raises ValueError: when dtype is not an array type code
+        """
+        if length <= 0:
+            raise ValueError("Array length should be larger than 0.")
+        self.array = array(dtype)
+        self.array.frombytes(bytes(self.array.itemsize * length))
+
+    @classmethod
+    def from_list(cls, dtype: str, items: Sequence[int | float]) -> ArrayT:
+        """ Creates an array of the given dtype holding items
+        :complexity: O(len(items))
+        :pre: len(items) > 0
+        """
+        if len(items) <= 0:
+            raise ValueError("Array length should be larger than 0.")
+        result = cls.__new__(cls)
+        result.array = array(dtype, items)
+        return result
+
+    @property
+    def dtype(self) -> str:
+        """ The type code of the numbers in the array """
+        return self.array.typecode
+
+    def __len__(self) -> int:
+        """ Returns the length of the array
+        :complexity: O(1)
+        """
+        return len(self.array)
+
+    def __getitem__(self, index: int | slice) -> int | float | list[int | float]:
+        """ Returns the number in position index, or a list of the numbers in a slice.
+        :complexity: O(1) for an index, O(length of the slice) for a slice
+        :pre: index in between 0 and length - self.array[] checks it
+        """
+        if isinstance(index, slice):
+            return self.array[index].tolist()
+        return self.array[index]
+
+    def __setitem__(self, index: int | slice, value: int | float | Sequence[int | float]) -> None:
+        """ Sets the number in position index to value, or the numbers in a slice to
+        the items of value (which must have the same length as the slice).
+        :complexity: O(1) for an index, O(length of the slice) for a slice
+        :pre: index in between 0 and length - self.array[] checks it
+        :raises OverflowError: when value does not fit in dtype
+        """
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self.array))
+            if len(range(start, stop, step)) != len(value):
+                raise ValueError("Can only assign a sequence of the same length as the slice.")
+            self.array[index] = array(self.array.typecode, value)
+        else:
+            self.array[index] = value
+
+    def __iter__(self) -> Iterator[int | float]:
+        """ Iterates over the numbers in the array
+        :complexity: O(1) per number
+        """
+        return iter(self.array)
+
+    def fill(self, value: int | float) -> None:
+        """ Sets every position to value
+        :complexity: O(length), done in C
+        """
+        self.array[:] = array(self.array.typecode, [value]) * len(self.array)
+
+    def copy_from(self, source: ArrayT | Sequence[int | float], start: int = 0) -> None:
+        """ Copies every number of source into this array, starting at position start
+        :complexity: O(len(source))
+        :pre: start + len(source) <= length
+        """
+        if start < 0 or start + len(source) > len(self.array):
+            raise IndexError("Source does not fit in the array.")
+        if isinstance(source, ArrayT):
+            source = source.array
+        self.array[start:start + len(source)] = array(self.array.typecode, source)
+
+    def view(self) -> memoryview:
+        """ Returns a memoryview of the numbers, sharing their memory with this array.
+        The array cannot change length while a view is held, which an ArrayT never does.
+        :complexity: O(1)
+        """
+        return memoryview(self.array)
+
+    def __buffer__(self, flags: int) -> memoryview:
+        """ Buffer protocol support on Python 3.12+, so memoryview(array_t) works directly. """
+        return memoryview(self.array)
@@ -4,6 +4,7 @@ This module contains Double key table
 
 from __future__ import annotations
 from typing import Generic, TypeVar, Iterator
+from data_structures.hash_functions import HashFunction, KeyedHash
 from data_structures.hash_table import LinearProbeTable, FullError
 from data_structures.referential_array import ArrayR
 
@@ -25,6 +26,10 @@ class DoubleKeyTable(Generic[K1, K2, V]):
                 Otherwise `hash2` should be overwritten.
         - V:    Value Type.
 
+    The top-level table and every sub-table watch their own probe lengths like a
+    LinearProbeTable does, and rebuild themselves with a freshly seeded hash function
+    once they degrade (see LinearProbeTable.MAX_PROBE_FACTOR).
+
     Unless stated otherwise, all methods have O(1) complexity.
     """
 
@@ -33,7 +38,17 @@ class DoubleKeyTable(Generic[K1, K2, V]):
 
     HASH_BASE = 31
 
-    def __init__(self, sizes: list | None = None, internal_sizes: list | None = None) -> None:
+    MAX_PROBE_FACTOR = LinearProbeTable.MAX_PROBE_FACTOR
+
+    def __init__(self, sizes: list | None = None, internal_sizes: list | None = None,
+                 hash_function: HashFunction | None = None) -> None:
+        """
+        With a hash_function, both keys are hashed with it (modulo the size of their table)
+        rather than with the polynomial hashes in `hash1` and `hash2`.
+        """
+        self.hash_function = hash_function
+        self.degraded = False
+        self.reseeded_index = -1
         if sizes is not None:
             self.TABLE_SIZES = sizes
 
@@ -50,8 +65,10 @@ class DoubleKeyTable(Generic[K1, K2, V]):
         """
         Hash the 1st key for insert/retrieve/update into the hashtable.
 
-        :complexity: O(len(key))
+        :complexity: O(len(key)), or the complexity of hash_function
         """
+        if self.hash_function is not None:
+            return self.hash_function(key) % self.table_size
 
         value = 0
         a = 31417
@@ -64,8 +81,10 @@ class DoubleKeyTable(Generic[K1, K2, V]):
         """
         Hash the 2nd key for insert/retrieve/update into the hashtable.
 
-        :complexity: O(len(key))
+        :complexity: O(len(key)), or the complexity of hash_function
         """
+        if sub_table.hash_function is not None:
+            return sub_table.hash_function(key) % sub_table.table_size
 
         value = 0
         a = 31417
@@ -137,6 +156,8 @@ class DoubleKeyTable(Generic[K1, K2, V]):
                     if is_insert is not True:
                         raise KeyError(key1)
                     else:
+                        if i > self.MAX_PROBE_FACTOR * self.table_size.bit_length():
+                            self.degraded = True
                         sub_table = create_sub_table()
                         self.array[position_key] = (key1, sub_table)
                         return position_key
@@ -159,7 +180,7 @@ class DoubleKeyTable(Generic[K1, K2, V]):
             Example:
                 sub_table = create_sub_table()
             """
-            sub_table = LinearProbeTable(self.internal_sizes)
+            sub_table = LinearProbeTable(self.internal_sizes, self.hash_function)
             sub_table.hash = lambda k: self.hash2(k, sub_table)
             return sub_table
 
@@ -268,6 +289,44 @@ class DoubleKeyTable(Generic[K1, K2, V]):
             except KeyError:
                 return None
 
+    def iter_items(self, key: K1 | None = None, snapshot: bool = False) -> Iterator[tuple[tuple[K1, K2], V]]:
+        """
+        Returns an iterator of ((key1, key2), value) for every entry, read straight from the slot arrays.
+
+        Params:
+            key (K1 | None): If None, iterates over every entry in the table.
+                             If not None, only iterates over the entries with that top-level key.
+            snapshot (bool): If True, the top-level array and each sub-table's array are pinned when
+                             iteration reaches them, so inserts (including ones that rehash) don't disturb
+                             the iteration. See LinearProbeTable.iter_items.
+
+        Returns:
+            Iterator[tuple[tuple[K1, K2], V]]: An iterator of entries.
+
+        Raises:
+            None.
+
+        Complexity:
+            O(n + m) time and O(1) memory, where n is the size of the top-level table
+            and m is the total size of the sub-tables iterated over.
+        """
+        if key is not None:
+            try:
+                position = self._linear_probe(key, None, False)
+            except KeyError:
+                return
+            for key2, value in self.array[position][1].iter_items(snapshot):
+                yield (key, key2), value
+            return
+
+        array = self.array
+        for i in range(len(array)):
+            item = array[i] if snapshot else self.array[i]
+            if item is not None:
+                key1, sub_table = item
+                for key2, value in sub_table.iter_items(snapshot):
+                    yield (key1, key2), value
+
     def keys(self, key: K1 | None = None) -> list[K1 | K2]:
         """
         Returns a list of keys in the hash table.
@@ -292,20 +351,10 @@ class DoubleKeyTable(Generic[K1, K2, V]):
                 - When key is not None: O(m) this occurs when the desired top-level key is not found in the table,
                                         or its associated sub-table is empty.
         """
-        keys = []
-
         if key is None:
-            for i in range(self.table_size):
-                if self.array[i] is not None:
-                    keys.append(self.array[i][0])
-        else:
-            position = self._linear_probe(key, None, False)
-            sub_table = self.array[position][1]
-            for index in range(sub_table.table_size):
-                if sub_table.array[index] is not None:
-                    keys.append(sub_table.array[index][0])
-
-        return keys
+            return [item[0] for item in self.array if item is not None]
+        position = self._linear_probe(key, None, False)
+        return self.array[position][1].keys()
 
     def values(self, key: K1 | None = None) -> list[V]:
         """
@@ -333,19 +382,9 @@ class DoubleKeyTable(Generic[K1, K2, V]):
                 - When key is not None: O(m) this occurs when the desired top-level key is not found in the table,
                                         or its associated sub-table is empty.
         """
-        values = []
-
-        if key is None:
-            for item in self.array:
-                if item is not None:
-                    sub_table = item[1]
-                    values.extend(sub_table.values())
-        else:
-            position = self._linear_probe(key, None, False)
-            sub_table = self.array[position][1]
-            values.extend(sub_table.values())
-
-        return values
+        if key is not None:
+            self._linear_probe(key, None, False)
+        return [value for _, value in self.iter_items(key)]
 
 
     def __contains__(self, key: tuple[K1, K2]) -> bool:
@@ -419,6 +458,8 @@ class DoubleKeyTable(Generic[K1, K2, V]):
         # resize if necessary
         if len(self) > self.table_size / 2:
             self._rehash()
+        elif self.degraded:
+            self._reseed()
 
     def __delitem__(self, key: tuple[K1, K2]) -> None:
         """
@@ -487,6 +528,9 @@ class DoubleKeyTable(Generic[K1, K2, V]):
         """
         old_array = self.array
         self.size_index += 1
+        if self.size_index >= len(self.TABLE_SIZES):
+            # Cannot be resized further.
+            return
         new_size = self.TABLE_SIZES[self.size_index]
         new_array = ArrayR(new_size)
         self.count = 0
@@ -502,6 +546,24 @@ class DoubleKeyTable(Generic[K1, K2, V]):
                 self.count += 1
 
 
+    def _reseed(self) -> None:
+        """
+        Rebuild a degraded top-level table at the same size with a freshly seeded hash function,
+        unless it has already been reseeded at this size. The sub-tables are moved, not rebuilt.
+
+        Complexity:
+            See _rehash.
+        """
+        self.degraded = False
+        # A table that has outgrown TABLE_SIZES still has its largest array, so it is rebuilt at that size.
+        self.size_index = min(self.size_index, len(self.TABLE_SIZES) - 1)
+        if self.reseeded_index == self.size_index:
+            return
+        self.reseeded_index = self.size_index
+        self.hash_function = KeyedHash() if self.hash_function is None else self.hash_function.reseeded()
+        self.size_index -= 1
+        self._rehash()
+
     @property
     def table_size(self) -> int:
         """
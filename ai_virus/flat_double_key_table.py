@@ -0,0 +1,476 @@
+"""
+This module contains Flat double key table, a DoubleKeyTable with all its entries in one array
+"""
+
+from __future__ import annotations
+from typing import Generic, TypeVar, Iterator
+from data_structures.hash_functions import HashFunction, KeyedHash, MASK64
+from data_structures.hash_table import LinearProbeTable, FullError
+from data_structures.referential_array import ArrayR
+from data_structures.typed_array import ArrayT
+from double_key_table import DoubleKeyTable
+
+__author__ = "Adrian Ong Zhe Yee, Teh Yee Hong"
+
+K1 = TypeVar('K1')
+K2 = TypeVar('K2')
+V = TypeVar('V')
+
+
+class FlatDoubleKeyTable(Generic[K1, K2, V]):
+    """
+    Double Hash Table with a flat layout, and the same methods as DoubleKeyTable.
+
+    DoubleKeyTable keeps a whole LinearProbeTable (with its own array and hash closure) for
+    every top-level key. This table instead keeps every entry as (key1, key2, value) in one
+    linear probe array, at the position of the combined hash of both keys. The entries sharing
+    a top-level key are chained through the slot numbers in `next_slot` and `prev_slot`, and
+    `heads` maps every top-level key to [first slot of its chain, number of entries] (a list, so
+    it is updated without probing heads again), and the entries of one top-level key are found
+    without scanning the array.
+
+    As in DoubleKeyTable, len() is the number of top-level keys, and a top-level key is
+    removed along with its last entry.
+
+    Type Arguments:
+        - K1:   1st Key Type. In most cases should be string.
+        - K2:   2nd Key Type. In most cases should be string.
+                Otherwise `hash` should be overwritten.
+        - V:    Value Type.
+
+    Unless stated otherwise, all methods have O(1) complexity.
+    """
+
+    TABLE_SIZES = DoubleKeyTable.TABLE_SIZES
+
+    HASH_BASE = 31
+
+    MAX_PROBE_FACTOR = LinearProbeTable.MAX_PROBE_FACTOR
+
+    def __init__(self, sizes: list | None = None, internal_sizes: list | None = None,
+                 hash_function: HashFunction | None = None) -> None:
+        """
+        internal_sizes is accepted for compatibility with DoubleKeyTable, and unused as there
+        are no sub-tables. With a hash_function, the key pairs are hashed by combining its
+        hashes of both keys rather than with the polynomial hash in `hash`.
+        """
+        if sizes is not None:
+            self.TABLE_SIZES = sizes
+        self.hash_function = hash_function
+        self.degraded = False
+        self.reseeded_index = -1
+        self.size_index = 0
+        self.entries = 0
+        self._allocate(self.TABLE_SIZES[self.size_index])
+        self.heads: LinearProbeTable[K1, list[int]] = LinearProbeTable(hash_function=hash_function)
+
+    def _allocate(self, size: int) -> None:
+        """
+        Create empty slot and chain arrays of the given size. The links of a slot are only
+        read while it holds an entry, so they are left as zeros.
+
+        Complexity: O(size)
+        """
+        self.array: ArrayR[tuple[K1, K2, V] | None] = ArrayR(size)
+        self.next_slot = ArrayT('q', size)
+        self.prev_slot = ArrayT('q', size)
+
+    def hash(self, key1: K1, key2: K2) -> int:
+        """
+        Hash a pair of keys for insert/retrieve/update into the hashtable.
+
+        :complexity: O(len(key1) + len(key2)), or the complexity of hash_function
+        """
+        if self.hash_function is not None:
+            return ((self.hash_function(key1) * self.HASH_BASE + self.hash_function(key2)) & MASK64) % self.table_size
+
+        size = self.table_size
+        value = 0
+        a = 31415
+        for char in key1:
+            value = (ord(char) + a * value) % size
+            a = a * self.HASH_BASE % (size - 1)
+        # Separate the keys, so ("ab", "c") and ("a", "bc") don't hash the same.
+        value = (1 + a * value) % size
+        a = a * self.HASH_BASE % (size - 1)
+        for char in key2:
+            value = (ord(char) + a * value) % size
+            a = a * self.HASH_BASE % (size - 1)
+        return value
+
+    def _linear_probe(self, key1: K1, key2: K2, is_insert: bool) -> int:
+        """
+        Find the correct position for this key pair in the hash table using linear probing.
+
+        Params:
+            key1 (K1): The first key.
+            key2 (K2): The second key.
+            is_insert (bool): Whether the key pair is being inserted.
+
+        Returns:
+            The position of the key pair, or of the empty slot to insert it at.
+
+        Raises:
+            KeyError: If the key pair is not in the table, but is_insert is False.
+            FullError: If the table is full and cannot insert the key pair.
+
+        Complexity:
+            Best Case:
+                O(hash), the first position holds the key pair or is empty.
+            Worst Case:
+                O(hash + n), where n is the table size, when the whole table is probed.
+        """
+        array = self.array
+        size = len(array)
+        position = self.hash(key1, key2)
+        for probes in range(size):
+            item = array[position]
+            if item is None:
+                if is_insert:
+                    if probes > self.MAX_PROBE_FACTOR * size.bit_length():
+                        self.degraded = True
+                    return position
+                raise KeyError((key1, key2))
+            elif item[1] == key2 and item[0] == key1:
+                return position
+            position = (position + 1) % size
+
+        if is_insert:
+            raise FullError("Table is full!")
+        raise KeyError((key1, key2))
+
+    def _link(self, position: int) -> None:
+        """
+        Put the entry at position at the front of its top-level key's chain.
+
+        Complexity: the complexity of LinearProbeTable's linear probe on heads
+        """
+        key1 = self.array[position][0]
+        self.prev_slot[position] = -1
+        try:
+            chain = self.heads[key1]
+        except KeyError:
+            self.next_slot[position] = -1
+            self.heads[key1] = [position, 1]
+            return
+        self.next_slot[position] = chain[0]
+        self.prev_slot[chain[0]] = position
+        chain[0] = position
+        chain[1] += 1
+
+    def _unlink(self, position: int) -> None:
+        """
+        Take the entry at position out of its top-level key's chain, removing the top-level key
+        when it was its last entry.
+
+        Complexity: the complexity of LinearProbeTable's linear probe on heads
+        """
+        key1 = self.array[position][0]
+        chain = self.heads[key1]
+        if chain[1] == 1:
+            del self.heads[key1]
+            return
+        previous, following = self.prev_slot[position], self.next_slot[position]
+        if previous == -1:
+            chain[0] = following
+        else:
+            self.next_slot[previous] = following
+        if following != -1:
+            self.prev_slot[following] = previous
+        chain[1] -= 1
+
+    def _move(self, old: int, new: int) -> None:
+        """
+        Update the chain of the entry that has just moved from position old to position new.
+
+        Complexity: O(1) unless it heads its chain, then see _link
+        """
+        previous, following = self.prev_slot[old], self.next_slot[old]
+        self.prev_slot[new], self.next_slot[new] = previous, following
+        if previous == -1:
+            self.heads[self.array[new][0]][0] = new
+        else:
+            self.next_slot[previous] = new
+        if following != -1:
+            self.prev_slot[following] = new
+
+    def _chain(self, head: int, pinned: tuple[ArrayR, ArrayT] | None = None) -> Iterator[tuple[K1, K2, V]]:
+        """
+        Yields the entries of the chain starting at head, read from the pinned (array, next_slot)
+        when given, else from the current arrays at every step.
+
+        Complexity: O(1) per entry
+        """
+        position = head
+        while position != -1:
+            array, next_slot = pinned if pinned is not None else (self.array, self.next_slot)
+            yield array[position]
+            position = next_slot[position]
+
+    def iter_keys(self, key: K1 | None = None) -> Iterator[K1 | K2]:
+        """
+        Returns an iterator of keys in the hash table.
+
+        Params:
+            key (K1 | None): If None, returns an iterator of all top-level keys in the hash table.
+                             If not None, returns an iterator of all low-level keys of the given top-level key.
+
+        Returns:
+            Iterator[K1 | K2]: An iterator of keys.
+
+        Complexity:
+            - When key is None: O(h), where h is the size of heads.
+            - When key is not None: O(hash + m), where m is the number of entries with that top-level key.
+        """
+        if key is None:
+            for key1, _ in self.heads.iter_items():
+                yield key1
+        else:
+            for item in self._chain_of(key, False):
+                yield item[1]
+
+    def iter_values(self, key: K1 | None = None) -> Iterator[V]:
+        """
+        Returns an iterator of values in the hash table.
+
+        Params:
+            key (K1 | None): If None, returns an iterator of all values in the table.
+                             If not None, returns an iterator of the values of the given top-level key.
+
+        Returns:
+            Iterator[V]: An iterator of values.
+
+        Complexity:
+            See iter_items.
+        """
+        for _, value in self.iter_items(key):
+            yield value
+
+    def _chain_of(self, key1: K1, snapshot: bool) -> Iterator[tuple[K1, K2, V]]:
+        """
+        Yields the entries of key1, nothing if there are none.
+
+        Complexity: O(hash + m), where m is the number of entries of key1
+        """
+        pinned = (self.array, self.next_slot) if snapshot else None
+        try:
+            head, _ = self.heads[key1]
+        except KeyError:
+            return
+        yield from self._chain(head, pinned)
+
+    def iter_items(self, key: K1 | None = None, snapshot: bool = False) -> Iterator[tuple[tuple[K1, K2], V]]:
+        """
+        Returns an iterator of ((key1, key2), value) for every entry, grouped by top-level key.
+
+        Params:
+            key (K1 | None): If None, iterates over every entry in the table.
+                             If not None, only iterates over the entries with that top-level key.
+            snapshot (bool): If True, the arrays are pinned when iteration starts: a rehash replaces
+                             them (and heads) rather than changing them, and an insert only adds to
+                             the front of a chain, so inserts don't disturb the iteration. Deletes can
+                             still move entries. See LinearProbeTable.iter_items.
+
+        Returns:
+            Iterator[tuple[tuple[K1, K2], V]]: An iterator of entries.
+
+        Complexity:
+            O(h + n) time and O(1) memory, where h is the size of heads and n is the number of entries iterated over.
+        """
+        if key is not None:
+            for key1, key2, value in self._chain_of(key, snapshot):
+                yield (key1, key2), value
+            return
+
+        pinned = (self.array, self.next_slot) if snapshot else None
+        for _, chain in self.heads.iter_items(snapshot):
+            head = chain[0]
+            for key1, key2, value in self._chain(head, pinned):
+                yield (key1, key2), value
+
+    def keys(self, key: K1 | None = None) -> list[K1 | K2]:
+        """
+        Returns a list of keys in the hash table.
+
+        Params:
+            key (K1 | None): If None, returns all top-level keys in the hash table.
+                             If not None, returns all bottom-level keys for the given top-level key.
+
+        Raises:
+            KeyError: When key is not None and not in the table.
+
+        Complexity:
+            See iter_keys.
+        """
+        if key is None:
+            return self.heads.keys()
+        head, _ = self.heads[key]
+        return [item[1] for item in self._chain(head)]
+
+    def values(self, key: K1 | None = None) -> list[V]:
+        """
+        Returns a list of values in the hash table.
+
+        Params:
+            key (K1 | None): If None, returns all values in the table.
+                             If not None, returns all values for the given top-level key.
+
+        Raises:
+            KeyError: When key is not None and not in the table.
+
+        Complexity:
+            See iter_items.
+        """
+        if key is not None:
+            head, _ = self.heads[key]
+            return [item[2] for item in self._chain(head)]
+        return [value for _, value in self.iter_items()]
+
+    def __contains__(self, key: tuple[K1, K2]) -> bool:
+        """
+        Checks if the given key pair is in the Hash Table.
+
+        Complexity:
+            See linear probe.
+        """
+        try:
+            _ = self[key]
+        except KeyError:
+            return False
+        else:
+            return True
+
+    def __getitem__(self, key: tuple[K1, K2]) -> V:
+        """
+        Get the value associated with a certain key pair.
+
+        Raises:
+            KeyError: When the key pair doesn't exist.
+
+        Complexity:
+            See linear probe.
+        """
+        return self.array[self._linear_probe(key[0], key[1], False)][2]
+
+    def __setitem__(self, key: tuple[K1, K2], data: V) -> None:
+        """
+        Set a (key, value) pair in the hash table.
+
+        Raises:
+            FullError: When the table cannot be resized further.
+
+        Complexity:
+            See linear probe, plus a probe of heads for a new key pair.
+        """
+        key1, key2 = key
+        position = self._linear_probe(key1, key2, True)
+        if self.array[position] is not None:
+            self.array[position] = (key1, key2, data)
+            return
+
+        self.array[position] = (key1, key2, data)
+        self._link(position)
+        self.entries += 1
+
+        if self.entries > self.table_size / 2:
+            self._rehash()
+        elif self.degraded:
+            self._reseed()
+
+    def __delitem__(self, key: tuple[K1, K2]) -> None:
+        """
+        Deletes a (key, value) pair from the hash table, then reinserts the rest of its cluster,
+        moving the chain links of every entry that changes position.
+
+        Raises:
+            KeyError: When the key pair doesn't exist.
+
+        Complexity:
+            Best:
+                - O(hash) this occurs when the key pair is found without probing, and nothing follows it.
+            Worst:
+                - O(N*hash + N^2*comp) this occurs when the key pair is in the middle of a large cluster.
+        """
+        position = self._linear_probe(key[0], key[1], False)
+        self._unlink(position)
+        self.array[position] = None
+        self.entries -= 1
+
+        position = (position + 1) % self.table_size
+        while self.array[position] is not None:
+            item = self.array[position]
+            self.array[position] = None
+            new_position = self._linear_probe(item[0], item[1], True)
+            self.array[new_position] = item
+            if new_position != position:
+                self._move(position, new_position)
+            position = (position + 1) % self.table_size
+
+    def _rehash(self) -> None:
+        """
+        Resize the table and reinsert every entry, building new chains and a new heads table.
+
+        Complexity:
+            Best:
+                - O(N*hash) this occurs when no probing is required.
+            Worst:
+                - O(N*hash + N^2*comp) this occurs when there's lots of probing involved.
+        """
+        old_array = self.array
+        self.size_index += 1
+        if self.size_index >= len(self.TABLE_SIZES):
+            # Cannot be resized further.
+            return
+        self._allocate(self.TABLE_SIZES[self.size_index])
+        self.heads = LinearProbeTable(hash_function=self.heads.hash_function)
+        self.entries = 0
+        for item in old_array:
+            if item is not None:
+                position = self._linear_probe(item[0], item[1], True)
+                self.array[position] = item
+                self._link(position)
+                self.entries += 1
+
+    def _reseed(self) -> None:
+        """
+        Rebuild a degraded table at the same size with a freshly seeded hash function,
+        unless it has already been reseeded at this size.
+
+        Complexity:
+            See _rehash.
+        """
+        self.degraded = False
+        # A table that has outgrown TABLE_SIZES still has its largest array, so it is rebuilt at that size.
+        self.size_index = min(self.size_index, len(self.TABLE_SIZES) - 1)
+        if self.reseeded_index == self.size_index:
+            return
+        self.reseeded_index = self.size_index
+        self.hash_function = KeyedHash() if self.hash_function is None else self.hash_function.reseeded()
+        self.size_index -= 1
+        self._rehash()
+
+    @property
+    def table_size(self) -> int:
+        """
+        Return the current size of the table (different from the length)
+        """
+        return len(self.array)
+
+    def __len__(self) -> int:
+        """
+        Returns the number of top-level keys in the hash table
+        """
+        return len(self.heads)
+
+    def __str__(self) -> str:
+        """
+        Returns every entry in the table as (key1,key2) -> value, one per line, with the
+        entries of each top-level key together (no particular order otherwise).
+
+        Complexity: O(h + n * (str(key1) + str(key2) + str(value))), where h is the size of heads
+                    and n is the number of entries
+        """
+        result = ""
+        for (key1, key2), value in self.iter_items():
+            result += "(" + str(key1) + "," + str(key2) + ") -> " + str(value) + "\n"
+        return result
@@ -3,9 +3,11 @@ This module contains Infinite hash table
 """
 
 from __future__ import annotations
+import random
+from threading import Lock
 from typing import Generic, TypeVar, List
 from algorithms.mergesort import mergesort
-from data_structures.referential_array import ArrayR
+from data_structures.adaptive_array import AdaptiveArray
 
 __author__ = "Adrian Ong Zhe Yee, Teh Yee Hong"
 
@@ -22,26 +24,141 @@ class InfiniteHashTable(Generic[K, V]):
                 Otherwise `hash` should be overwritten.
         - V:    Value Type.
 
+    In compressed mode a chain of nested tables that would each hold a single nested table
+    is collapsed into one table (like a radix tree). That table records the positions it
+    skipped in `skip`, and `get_location` still reports them, so locations are the same in
+    both modes.
+
+    Different keys of the same length whose characters all share a position (such as "prod-a"
+    and "prodaa", as '-' and 'a' both hash to 19) can't be told apart at any level. They are kept
+    together in a bucket: a list of their key-value pairs, stored where their last character
+    takes them, and searched by comparing keys. A bucket is never changed once stored, an
+    insert or delete stores a new list instead.
+
+    A seeded table puts each character in a position picked by a random permutation made for
+    that table, rather than straight at ord(char) % 26, so its layout can't be predicted.
+    Seeding doesn't change which characters share a position, and the depth of a key comes
+    from the prefixes it shares with other keys, which no seed can change: so a seeded table
+    that isn't compressed rebuilds itself compressed, with a new permutation, as soon as an
+    insert goes through MAX_DEPTH tables. Nor can a seed separate keys that share every
+    position: whoever picks such keys can only make them share a bucket, which is searched in
+    time linear in its size, and can't make an insert fail.
+
     Unless stated otherwise, all methods have O(1) complexity.
     """
 
     TABLE_SIZE = 27
 
-    def __init__(self, level: int = 0) -> None:
-        self.array: ArrayR[tuple[K, V] | None] = ArrayR(self.TABLE_SIZE)
+    MAX_DEPTH = 16
+
+    __slots__ = ("array", "count", "level", "compressed", "skip", "edge", "permutation")
+
+    def __init__(self, level: int = 0, compressed: bool = False, seeded: bool = False) -> None:
+        # Nested tables usually hold only a few positions, so the slots are only
+        # allocated as a full array once the table fills up.
+        self.array: AdaptiveArray[tuple[K, V] | list[tuple[K, V]] | InfiniteHashTable[K, V] | None] = AdaptiveArray(self.TABLE_SIZE)
+        # The number of keys in this table and all the tables below it.
         self.count = 0
         self.level = level
+        self.compressed = compressed
+        # Positions of the levels between the parent table and this one that every key
+        # below this table shares. Always empty when not compressed.
+        self.skip: tuple[int, ...] = ()
+        # The characters every key below this table has between the parent's level and this
+        # table's level, or None once two different characters have hashed to the same slot.
+        self.edge: str | None = None
+        # The position of each character class when seeded, shared by every table below.
+        self.permutation: tuple[int, ...] | None = self._new_permutation() if seeded else None
+
+    def _new_permutation(self) -> tuple[int, ...]:
+        """
+        Returns a random order of the positions of the characters
 
-    def hash(self, key: K) -> int:
+        Complexity: O(TABLE_SIZE)
+        """
+        return tuple(random.SystemRandom().sample(range(self.TABLE_SIZE - 1), self.TABLE_SIZE - 1))
+
+    def hash(self, key: K, level: int | None = None) -> int:
         """
         Hash a key for insert/retrieve/update into the hashtable.
 
+        param arg1: the key to hash
+        param arg2: the level to hash at, defaults to the level of this table
+
         :complexity: O(1)
         """
-        if self.level < len(key):
-            return ord(key[self.level]) % (self.TABLE_SIZE - 1)
+        if level is None:
+            level = self.level
+        if level < len(key):
+            if self.permutation is not None:
+                return self.permutation[ord(key[level]) % (self.TABLE_SIZE - 1)]
+            return ord(key[level]) % (self.TABLE_SIZE - 1)
         return self.TABLE_SIZE - 1
 
+    def _skip_mismatch(self, key: K) -> int | None:
+        """
+        Compare the positions of key against the positions this table skipped.
+
+        param arg1: the key to compare
+
+        Returns: the index in skip of the first position key doesn't share, or None if it shares all of them
+
+        Complexity: O(len(skip))
+        """
+        skip = self.skip
+        level = self.level - len(skip)
+        for i in range(len(skip)):
+            if self.hash(key, level + i) != skip[i]:
+                return i
+        return None
+
+    def _with_skip(self, skip: tuple[int, ...], edge: str | None) -> InfiniteHashTable[K, V]:
+        """
+        Returns a table holding the same positions as this one, but with the given skip and edge.
+
+        The two tables share their array, so the new one is meant to replace this one in its
+        parent's slot. This table is left unchanged, so a reader still inside it finds the same
+        keys as before.
+
+        param arg1: the positions the new table skips
+        param arg2: the characters every key below the new table shares, or None
+
+        Complexity: O(1)
+        """
+        table = InfiniteHashTable(self.level, self.compressed)
+        table.array = self.array
+        table.count = self.count
+        table.permutation = self.permutation
+        table.skip = skip
+        table.edge = edge
+        return table
+
+    @staticmethod
+    def _bucket_index(bucket: list[tuple[K, V]], key: K) -> int | None:
+        """
+        Find key in a bucket.
+
+        param arg1: the bucket
+        param arg2: the key to find
+
+        Returns: the index of key's pair in bucket, or None if key isn't in it
+
+        Complexity: O(len(bucket))
+        """
+        for i in range(len(bucket)):
+            if bucket[i][0] == key:
+                return i
+        return None
+
+    @staticmethod
+    def _pairs(item: tuple[K, V] | list[tuple[K, V]]) -> list[tuple[K, V]]:
+        """
+        Returns the key-value pairs held by a position that isn't a nested table
+
+        Complexity: O(1)
+        """
+        return item if type(item) is list else [item]
+
     def __getitem__(self, key: K) -> V:
         """
         Get the value at a certain key
@@ -54,38 +171,42 @@ class InfiniteHashTable(Generic[K, V]):
 
         Complexity: Best case occur when the item is straight away at the position (the position is not an InfiniteHashTable)
                     Complexity is O(1)
-                    Worst case occur when the item is inside a lot of InfiniteHashTable, recursion occur a lot of time
-                    Complexity is O(n)
+                    Worst case occur when the item is inside a lot of InfiniteHashTable, Complexity is O(n)
         """
+        return self._lookup(key)[0]
 
-        def find_key(table, key):
-            """
-            To find the key
+    def _lookup(self, key: K) -> tuple[V, int]:
+        """
+        Get the value at a certain key, and its depth: the number of positions get_location would
+        return for it, counted on the way down rather than by a second walk.
 
-            param arg1: The table to be search
-            param arg2: Used to get the position
+        param arg1: the key to get the value
 
-            Returns: the value of the key
+        Returns: the value of the key and its depth
 
-            :raises KeyError: when the key doesn't exist.
+        :raises KeyError: when the key doesn't exist.
 
-            Complexity: Best case occur when the item is straight away at the position (the position is not an InfiniteHashTable)
-                        Complexity is O(1)
-                        Worst case occur when the item is inside a lot of InfiniteHashTable, recursion occur a lot of time
-                        Complexity is O(n)
-            """
-            position = self.hash(key)
-            if table[position] is None:
-                raise KeyError
+        Complexity: See __getitem__.
+        """
+        table = self
+        depth = 1
+        while True:
+            item = table.array[table.hash(key)]
+            if isinstance(item, InfiniteHashTable):
+                skip = item.skip
+                if skip and item._skip_mismatch(key) is not None:
+                    raise KeyError(key)
+                depth += 1 + len(skip)
+                table = item
+            elif type(item) is list:
+                index = self._bucket_index(item, key)
+                if index is None:
+                    raise KeyError(key)
+                return item[index][1], depth
+            elif item is not None and item[0] == key:
+                return item[1], depth
             else:
-                if isinstance(table[position], InfiniteHashTable):
-                    self.level += 1
-                    return find_key(table[position].array, key)
-                else:
-                    return table[position][1]
-
-        self.level = 0
-        return find_key(self.array, key)
+                raise KeyError(key)
 
     def __setitem__(self, key: K, value: V) -> None:
         """
@@ -95,141 +216,231 @@ class InfiniteHashTable(Generic[K, V]):
         param arg2: the value of the key
 
         Complexity: Best case occur when the first position is None, can be added straight away, Complexity is O(1)
-                    Worst case occur when recursion occurs alot of time, Complexity is O(n)
+                    Worst case occur when a lot of nested InfiniteHashTable are passed through or created, Complexity is O(n)
+                    A key going into a bucket of b keys adds O(b)
         """
+        self._insert(key, value)
 
-        def insert_key_value(table, key, value):
-            """
-            To find position to be added, if there's already a key in the position, and it's not an InfiniteHashTable,
-            Create one and add both the old key and value and the current key and value into it
+    def _insert(self, key: K, value: V) -> bool:
+        """
+        Insert a (key, value) pair below this table, using this table's level as the starting depth.
+        If there's already a different key in the position, the tables separating the two keys
+        are built first and only then stored in the position, so a reader never sees them half built.
+        The count of every table passed through is increased when the key is new.
 
-            param arg1: the table to be gone through
-            param arg2: used to get the position
-            param arg3: value to be added
+        param arg1: the key to find a spot
+        param arg2: the value of the key
 
-            Complexity: Best case occur when the first position is None, can be added straight away, Complexity is O(1)
-                        Worst case occur when recursion occurs alot of time, Complexity is O(n)
-            """
-            position = self.hash(key)
-            if table[position] is None:
-                table[position] = (key, value)
-            else:
-                if isinstance(table[position], InfiniteHashTable):
-                    self.level += 1
-                    insert_key_value(table[position].array, key, value)
-                else:  # if it's a key-value pair
-                    temp = InfiniteHashTable()
-                    temp.level += self.level + 1
-                    old_key = table[position][0]
-                    old_value = table[position][1]
-                    old_position = temp.hash(old_key)
-                    table[position] = temp
-                    temp.array[old_position] = (old_key, old_value)
-                    self.level += 1
-                    insert_key_value(temp.array, key, value)
-
-        self.level = 0
-        insert_key_value(self.array, key, value)
+        Returns: True if the key was added, False if an existing key was overwritten
 
-    def __delitem__(self, key: K) -> None:
+        Complexity: Best case occur when the first position is None, Complexity is O(1)
+                    Worst case occur when a lot of nested InfiniteHashTable are passed through or created, Complexity is O(n)
+                    A key going into a bucket of b keys adds O(b)
+        """
+        path = []
+        table = self
+        while True:
+            position = table.hash(key)
+            item = table.array[position]
+            if item is None:
+                table.array[position] = (key, value)
+                break
+            elif isinstance(item, InfiniteHashTable):
+                mismatch = item._skip_mismatch(key) if item.skip else None
+                if mismatch is not None:
+                    table.array[position] = item._split_skip(mismatch, (key, value))
+                    break
+                if item.edge is not None and item.edge != key[table.level:item.level]:
+                    # Stored as a copy, like a split, so a table a reader can see never changes.
+                    item = item._with_skip(item.skip, None)
+                    table.array[position] = item
+                path.append(table)
+                table = item
+            elif type(item) is list:
+                index = self._bucket_index(item, key)
+                if index is None:
+                    table.array[position] = self._build(table.level + 1, item + [(key, value)])
+                    break
+                table.array[position] = item[:index] + [(key, value)] + item[index + 1:]
+                return False
+            elif item[0] == key:
+                table.array[position] = (key, value)
+                return False
+            else:  # if it's a different key-value pair
+                table.array[position] = self._build(table.level + 1, [item, (key, value)])
+                break
+
+        table.count += 1
+        for parent in path:
+            parent.count += 1
+        if len(path) >= self.MAX_DEPTH and self.permutation is not None and not self.compressed:
+            self._reseed()
+        return True
+
+    def _reseed(self) -> None:
         """
-        Deletes a (key, value) pair in our hash table. How it works is by removing the key to be deleted,
-        then get all the keys that share the same position with the key to be deleted, removing all of them out and
-        adding them back again
+        Rebuild this table and every table below it compressed, with a new permutation.
+        Only called on the top table.
 
-        :raises KeyError: when the key doesn't exist.
+        Complexity: O(n * m), n is the number of keys and m is the length of the keys
+        """
+        entries = []
+        stack = [self]
+        while stack:
+            for _, item in stack.pop().array.items():
+                if isinstance(item, InfiniteHashTable):
+                    stack.append(item)
+                else:
+                    entries.extend(self._pairs(item))
+
+        self.permutation = self._new_permutation()
+        self.compressed = True
+        groups = {}
+        for entry in entries:
+            groups.setdefault(self.hash(entry[0]), []).append(entry)
+        array = AdaptiveArray(self.TABLE_SIZE)
+        for position, group in groups.items():
+            array[position] = self._build(self.level + 1, group)
+        self.array = array
+
+    def _build(self, level: int, entries: list[tuple[K, V]]) -> InfiniteHashTable[K, V] | tuple[K, V] | list[tuple[K, V]]:
+        """
+        Build the smallest structure holding entries, to be stored in a position whose
+        tables below start at level. All entries must share the positions before level.
 
-        param arg1: the key to be deleted
+        param arg1: the level of the first table to build
+        param arg2: the key-value pairs to store, at least one
+
+        Returns: the only pair if there is one, a bucket of the entries if every key has ended
+                 before level (so they share every position), else the new table
 
-        Complexity: Best case occur when the key cannot be found, Complexity is O(1)
-                    Worst case occur when there's a lot of nested InfiniteHashTable for delete, then insert_remaining is needed,
-                    then len(lst) != 0, Complexity is O(n) + O(1) + O(n * m) + O(n) = O(n * m)
+        Complexity: O(n * m), n is the number of entries and m is the length of the keys
         """
+        if len(entries) == 1:
+            return entries[0]
+        if all(level >= len(entry[0]) for entry in entries):
+            return list(entries)
+
+        start = level
+        skip = []
+        while True:
+            groups = {}
+            for entry in entries:
+                groups.setdefault(self.hash(entry[0], level), []).append(entry)
+            # A table whose only position leads to a bucket isn't skipped, so a bucket is in the same place in both modes.
+            if len(groups) > 1 or not self.compressed or all(level + 1 >= len(entry[0]) for entry in entries):
+                break
+            skip.append(self.hash(entries[0][0], level))
+            level += 1
+
+        table = InfiniteHashTable(level, self.compressed)
+        table.permutation = self.permutation
+        table.skip = tuple(skip)
+        edge = entries[0][0][start - 1:level]
+        if len(edge) == level - start + 1 and all(entry[0][start - 1:level] == edge for entry in entries):
+            table.edge = edge
+        for position, group in groups.items():
+            table.array[position] = self._build(level + 1, group)
+        table.count = len(entries)
+        return table
+
+    def _split_skip(self, index: int, entry: tuple[K, V]) -> InfiniteHashTable[K, V]:
+        """
+        Make room for a key that stops sharing this table's skipped positions at skip[index],
+        by putting a new table at that level in front of a copy of this one with a shorter
+        skip and edge (see _with_skip).
+
+        This table is left unchanged and everything is built before the caller stores the new
+        table, so a reader still inside this table sees the same skip it started with.
+
+        param arg1: the index in skip of the first position the key doesn't share
+        param arg2: the key-value pair being added
+
+        Returns: the new table, to be stored where this table was
 
-        def delete(table, key):
-            """
-            This function deletes the key and value pair
+        Complexity: O(len(skip))
+        """
+        level = self.level - len(self.skip) + index
+        table = InfiniteHashTable(level, self.compressed)
+        table.permutation = self.permutation
+        table.skip = self.skip[:index]
+        if self.edge is not None and entry[0][level - index - 1:level] == self.edge[:index + 1]:
+            table.edge = self.edge[:index + 1]
+        edge = None if self.edge is None else self.edge[index + 1:]
+        table.array[self.skip[index]] = self._with_skip(self.skip[index + 1:], edge)
+        table.array[self.hash(entry[0], level)] = entry
+        table.count = self.count + 1
+        return table
 
-            param arg1: the table to be searched through
-            param arg2: the key to be deleted
+    def __delitem__(self, key: K) -> None:
+        """
+        Deletes a (key, value) pair in our hash table. How it works is by removing the pair (from its bucket,
+        if it shares one), then going back up the tables on its path: a table left with a single key-value pair is replaced by that pair,
+        a table left with only a bucket of keys that have all ended is replaced by that bucket,
+        and in compressed mode a table left with a single nested table is merged into it.
+        Tables off the path are never touched.
 
-            complexity: Best case occur when the first position is already the key (not InfiniteHashTable),
-                        Complexity is O(1)
-                        Worst case occur when there is alot of InfiniteHashTable
-                        Complexity is O(1)
-            """
-            position = self.hash(key)
-            if isinstance(table[position], InfiniteHashTable):
-                self.level += 1
-                delete(table[position].array, key)
+        :raises KeyError: when the key doesn't exist.
+
+        param arg1: the key to be deleted
+
+        Complexity: Best case occur when the key is straight away at the position, Complexity is O(1)
+                    Worst case occur when the key is inside a lot of nested InfiniteHashTable, Complexity is O(n),
+                    n is the depth of the key, as each table on the path is checked in O(TABLE_SIZE)
+        """
+        path = []
+        table = self
+        while True:
+            position = table.hash(key)
+            item = table.array[position]
+            if isinstance(item, InfiniteHashTable):
+                if item.skip and item._skip_mismatch(key) is not None:
+                    raise KeyError(key)
+                path.append((table, position))
+                table = item
+            elif type(item) is list:
+                index = self._bucket_index(item, key)
+                if index is None:
+                    raise KeyError(key)
+                break
+            elif item is not None and item[0] == key:
+                break
             else:
-                table[position] = None
-                return
+                raise KeyError(key)
 
-        def reinsert_remaining(lst, table):
-            """
-            This function search for all the other values in the same position as the key to be deleted,
-            then add them into a list
-
-            param arg1: the list that contains the pairs
-            param arg2: the table to be searched through
-
-            complexity: Best case occur when every element in the table is None, no adding or recursion needed,
-                        Complexity is O(n)
-                        Worst case occur when there is a lot of nested InfiniteHashTable, recursion is needed,
-                        Complexity is O(n * m), n is the loop and m is depth of InfiniteHashTable
-            """
-            for x in table:
-                if x is not None:
-                    if isinstance(x, InfiniteHashTable):
-                        reinsert_remaining(lst, x.array)
-                    else:
-                        lst.append(x)
-
-        if self.__contains__(key):
-            self.level = 0
-            delete(self.array, key)
+        if type(item) is list:
+            rest = item[:index] + item[index + 1:]
+            table.array[position] = rest[0] if len(rest) == 1 else rest
         else:
-            raise KeyError
-
-        self.level = 0
-        lst = []
-        position = self.hash(key)
-        if self.array[position] is not None:
-            reinsert_remaining(lst, self.array[position].array)
-            self.array[position] = None
-            if len(lst) != 0:
-                for x in lst:
-                    self[x[0]] = x[1]
+            table.array[position] = None
+        table.count -= 1
+        for parent, _ in path:
+            parent.count -= 1
+
+        while path:
+            parent, position = path.pop()
+            occupied = list(table.array.items())
+            if table.count == 1:
+                parent.array[position] = occupied[0][1]
+            elif len(occupied) == 1 and occupied[0][0] == self.TABLE_SIZE - 1 and type(occupied[0][1]) is list:
+                # Every key left has ended before this table, so, as _build would, the parent holds their bucket.
+                parent.array[position] = occupied[0][1]
+            elif self.compressed and len(occupied) == 1 and isinstance(occupied[0][1], InfiniteHashTable):
+                # A copy of the child with the longer skip is stored, so a reader still going through table and child sees them unchanged.
+                child_position, child = occupied[0]
+                edge = None if table.edge is None or child.edge is None else table.edge + child.edge
+                parent.array[position] = child._with_skip(table.skip + (child_position,) + child.skip, edge)
+            else:
+                return
+            table = parent
 
     def __len__(self) -> int:
         """
         Return the number of elements in the table
 
-        Complexity: Best case occur when there's nothing in the table, hence looping only once, Complexity is O(n)
-                    Worst case occur when there's alot of nested InfiniteHashTables, Complexity is O(n * m), n is the loop and m is depth of InfiniteHashTable
+        Complexity: O(1), every table keeps the count of the keys below it up to date on insert and delete
         """
-        def count_elements(table):
-            """
-            This counts the number of elements in the table
-
-            param arg1: the table to be searched through
-
-            Returns: integer value of numbers of elements
-
-            Complexity: Best case occur when there's nothing in the table, hence looping only once, Complexity is O(n)
-                        Worst case occur when there's alot of nested InfiniteHashTables, Complexity is O(n * m), n is the loop and m is depth of InfiniteHashTable
-            """
-            count = 0
-            for x in table:
-                if isinstance(x, InfiniteHashTable):
-                    count += count_elements(x.array)
-                elif isinstance(x, tuple):
-                    count += 1
-            return count
-
-        self.level = 0
-        return count_elements(self.array)
+        return self.count
 
     def __str__(self) -> str:
         """
@@ -249,41 +460,28 @@ class InfiniteHashTable(Generic[K, V]):
 
         Returns: a list of integers
 
-        Complexity: Best case occur when best case for find_position occur, Complexity is O(n)
-                    Worst case occur when worst case for find_position occur, Complexity is O(n^2)
+        Complexity: Best case occur when the key is straight away at the position, Complexity is O(1)
+                    Worst case occur when there's alot of nested InfiniteHashTable, Complexity is O(n)
         """
-
-        def find_position(lst, table, key):
-            """
-            this function search through InfiniteHashTables to get the sequence of positions
-
-            param arg1: the list that stores the sequence
-            param arg2: the table to be searched through
-            param arg3: the key to be found
-
-            Returns: the list containing sequence
-
-            Complexity: Best case occur when there's no InfiniteHashTable, only key-value pair, Complexity is O(1)
-                        Worst case occur when there's alot of nested InfiniteHashTable, Complexity is O(n)
-            """
-            position = self.hash(key)
-            if table[position] is None:
+        lst = []
+        table = self
+        while True:
+            position = table.hash(key)
+            item = table.array[position]
+            lst.append(position)
+            if isinstance(item, InfiniteHashTable):
+                if item.skip and item._skip_mismatch(key) is not None:
+                    raise KeyError(key)
+                lst.extend(item.skip)
+                table = item
+            elif type(item) is list:
+                if self._bucket_index(item, key) is None:
+                    raise KeyError(key)
+                return lst
+            elif item is not None and item[0] == key:
                 return lst
             else:
-                lst.append(position)
-                self.level += 1
-                if isinstance(table[position], InfiniteHashTable):
-                    return find_position(lst, table[position].array, key)
-                else:
-                    return lst
-
-        if self.__contains__(key):
-            self.level = 0
-            lst = []
-            find_position(lst, self.array, key)
-            return lst
-        else:
-            raise KeyError
+                raise KeyError(key)
 
     def __contains__(self, key: K) -> bool:
         """
@@ -293,36 +491,14 @@ class InfiniteHashTable(Generic[K, V]):
 
         Returns: boolean
 
-        Complexity: Best case occur when the position is None, Complexity is O(1)
-                    Worst case occur when there are alot of nested InfiniteHashTable, Complexity is O(n)
-
+        Complexity: See __getitem__.
         """
-
-        def search(table, key):
-            """
-            This function helps to find the key
-
-            param arg1: the table to be searched through
-            param arg2: the key to be found
-
-            Returns: boolean
-
-            Complexity: Best case occur when the position is None, Complexity is O(1)
-                        Worst case occur when there are alot of nested InfiniteHashTable, Complexity is O(n)
-            """
-            position = self.hash(key)
-            if table[position] is None:
-                return False
-            else:
-                if isinstance(table[position], InfiniteHashTable):
-                    self.level += 1
-                    return search(table[position].array, key)
-                elif table[position][0] == key:
-                    return True
+        try:
+            _ = self[key]
+        except KeyError:
             return False
-
-        self.level = 0
-        return search(self.array, key)
+        else:
+            return True
 
     def sort_keys(self, current=None) -> List[str]:
         """
@@ -350,9 +526,149 @@ class InfiniteHashTable(Generic[K, V]):
             if isinstance(item, InfiniteHashTable):
                 keys.extend(item.sort_keys())
             elif item:
-                keys.append(item[0])
+                keys.extend(pair[0] for pair in self._pairs(item))
         return mergesort(keys)
 
+    def _prefix_subtree(self, prefix: str) -> tuple[InfiniteHashTable[K, V] | tuple[K, V] | list[tuple[K, V]] | None, bool]:
+        """
+        Descend to the part of the table holding every key that starts with prefix.
+
+        param arg1: the prefix to descend along
+
+        Returns: the sub-table (or single key-value pair or bucket, or None when nothing can match) that
+                 holds all keys starting with prefix, and whether every key below it is known to
+                 start with prefix. The second value is False when two different characters have
+                 hashed to the same slot somewhere along the path, so the caller has to filter.
+
+        Complexity: Best case occur when the first position is None or a key-value pair, Complexity is O(1)
+                    Worst case occur when the prefix is fully descended, Complexity is O(len(prefix))
+        """
+        node = self
+        exact = True
+        while node.level < len(prefix):
+            item = node.array[node.hash(prefix)]
+            if not isinstance(item, InfiniteHashTable):
+                return item, False
+            mismatch = item._skip_mismatch(prefix) if item.skip else None
+            if mismatch is not None and item.level - len(item.skip) + mismatch < len(prefix):
+                return None, False
+            edge = item.edge
+            if edge is None or not edge.startswith(prefix[node.level:item.level]):
+                exact = False
+            node = item
+        return node, exact
+
+    def keys_with_prefix(self, prefix: str) -> List[str]:
+        """
+        Returns all keys starting with prefix in lexicographically sorted order.
+        Only the sub-table that the prefix hashes to is enumerated.
+
+        param arg1: the prefix to search for
+
+        Returns: a list of keys in lexicographically sorted order
+
+        Complexity: O(len(prefix) + m log m), where m is the number of keys in the prefix's sub-table
+        """
+        node, _ = self._prefix_subtree(prefix)
+        if node is None:
+            return []
+        if isinstance(node, InfiniteHashTable):
+            keys = node.sort_keys()
+        else:
+            keys = [pair[0] for pair in self._pairs(node)]
+        return [key for key in keys if key.startswith(prefix)]
+
+    def count_prefix(self, prefix: str) -> int:
+        """
+        Returns the number of keys starting with prefix.
+
+        param arg1: the prefix to count
+
+        Returns: integer value of numbers of keys starting with prefix
+
+        Complexity: Best case occur when no other character shares a slot with the prefix's characters,
+                    the subtree count is used directly, Complexity is O(len(prefix))
+                    Worst case occur when a shared slot means the sub-table has to be filtered,
+                    Complexity is O(len(prefix) + m log m), where m is the number of keys in the sub-table
+        """
+        node, exact = self._prefix_subtree(prefix)
+        if node is None:
+            return 0
+        if not isinstance(node, InfiniteHashTable):
+            return sum(1 for pair in self._pairs(node) if pair[0].startswith(prefix))
+        if exact:
+            return node.count
+        return len(self.keys_with_prefix(prefix))
+
+    def range(self, lo: str, hi: str) -> List[str]:
+        """
+        Returns all keys k with lo <= k < hi in lexicographically sorted order.
+        Only the sub-table of the longest common prefix of lo and hi is enumerated.
+
+        param arg1: the inclusive lower bound
+        param arg2: the exclusive upper bound
+
+        Returns: a list of keys in lexicographically sorted order
+
+        Complexity: O(len(lo) + m log m), where m is the number of keys in the common prefix's sub-table
+        """
+        if hi <= lo:
+            return []
+        common = 0
+        while common < len(lo) and common < len(hi) and lo[common] == hi[common]:
+            common += 1
+        return [key for key in self.keys_with_prefix(lo[:common]) if lo <= key < hi]
+
+
+class ConcurrentInfiniteHashTable(InfiniteHashTable[K, V]):
+    """
+    Infinite Hash Table that can be shared between threads.
+
+    Lookups (`__getitem__`, `__contains__`, `get_location` and the prefix queries) take no lock.
+    Writers are serialised by a lock, so at most one change is under way at a time.
+
+    An insert changes the tables through single slot assignments: new nested tables and buckets
+    are fully built before they are stored, so a lookup finds the key either missing or with its
+    whole path in place. In compressed mode, a key that stops sharing a table's skip stores a new
+    table in front of a copy of that table with a shorter skip. The skip and edge of a table are
+    never changed once it is stored, so a reader comparing a key against them sees one table
+    throughout.
+
+    A delete changes the tables on the key's path in place. It first empties the key's slot (or
+    stores its bucket without the key), after which lookups of that key miss, while lookups of
+    every other key are unaffected. Then it goes back up the path: a table left with a single pair
+    is replaced by that pair in its parent's slot, and in compressed mode a table left with a single
+    nested table is merged into it, by storing a copy of the nested table with the longer skip.
+    The tables taken out are left as they were, so a reader still inside them finds the same keys
+    there as it would through the parent's slot.
+
+    Counts are updated one table at a time, after the slots, so `len` and `count_prefix` can be
+    one off while a change is under way. `sort_keys`, `keys_with_prefix` and `range` aren't
+    snapshots: every slot is read as it is when reached, so a key inserted or deleted during the
+    walk may or may not be listed.
+
+    It is never seeded, as rebuilding the whole table when it degrades can't be made visible
+    in a single assignment.
+    """
+
+    def __init__(self, level: int = 0, compressed: bool = False) -> None:
+        super().__init__(level, compressed)
+        self.lock = Lock()
+
+    def __setitem__(self, key: K, value: V) -> None:
+        """
+        Set an (key, value) pair in our hash table, see InfiniteHashTable.__setitem__.
+        """
+        with self.lock:
+            super().__setitem__(key, value)
+
+    def __delitem__(self, key: K) -> None:
+        """
+        Deletes a (key, value) pair in our hash table, see InfiniteHashTable.__delitem__.
+        """
+        with self.lock:
+            super().__delitem__(key)
+
 
 if __name__ == '__main__':
     pass
\ No newline at end of file
@@ -1,12 +1,17 @@
 """
-This module contains the dataclass RouteSplit, RouteSeries and Route
+This module contains the dataclass RouteSplit, RouteFanOut, RouteSeries, RouteRun and Route,
+and LazyRoute
 """
 
 from __future__ import annotations
+import copy
 from dataclasses import dataclass
+from enum import auto, Enum
+from hashlib import blake2b
 from computer import Computer
-from typing import TYPE_CHECKING, Union
+from typing import TYPE_CHECKING, Callable, Union
 from branch_decision import *
+from data_structures.array_stack import ArrayStack
 
 __author__ = "Adrian Ong Zhe Yee, Teh Yee Hong"
 
@@ -14,15 +19,149 @@ __author__ = "Adrian Ong Zhe Yee, Teh Yee Hong"
 if TYPE_CHECKING:
     from virus import VirusType
 
+FINGERPRINT_SIZE = 16
+EMPTY_FINGERPRINT = blake2b(b"empty", digest_size=FINGERPRINT_SIZE).digest()
 
-@dataclass
-class RouteSplit:
+
+class _Fingerprinted:
+    """
+    Content equality for the route nodes through a Merkle fingerprint: a hash of the node's own
+    content (its kind and computer) and of the fingerprints of its children. It is computed the
+    first time it is asked for and kept on the node, so nodes must not be changed once fingerprinted
+    (the edit methods never change a node, they build new ones), and neither may their computers.
+
+    Two nodes are equal when their fingerprints are, which is O(1) once both are known. A node
+    shared between routes keeps its fingerprint, so after an edit only the new nodes are hashed.
+
+    Until then the fingerprint is this class attribute rather than a dataclass field, so building
+    a node doesn't store it.
+    """
+
+    _fingerprint: bytes | None = None
+
+    def fingerprint(self) -> bytes:
+        """
+        Returns the fingerprint of this node, hashing the nodes below it that haven't been yet.
+
+        Complexity: O(1) when already known, otherwise O(n), where n is the number of nodes below
+                    this one not fingerprinted yet
+        """
+        if self._fingerprint is None:
+            _fingerprint_all(self)
+        return self._fingerprint
+
+    def __eq__(self, other: object) -> bool:
+        if self is other:
+            return True
+        # A route only equals a route (a LazyRoute included), and a store a store, of any kind.
+        if not isinstance(other, _Fingerprinted) or isinstance(other, Route) != isinstance(self, Route):
+            return NotImplemented
+        return self.fingerprint() == other.fingerprint()
+
+    def __hash__(self) -> int:
+        return int.from_bytes(self.fingerprint()[:8], "little")
+
+
+def _children(node: RouteSplit | RouteFanOut | RouteSeries | RouteRun | Route) -> list[RouteStore | Route]:
+    """
+    Returns the nodes directly below node.
+
+    Complexity: O(1)
+    """
+    if isinstance(node, Route):
+        return [] if node.store is None else [node.store]
+    if isinstance(node, (RouteSeries, RouteRun)):
+        return [node.following]
+    if isinstance(node, RouteFanOut):
+        return [*node.branches, node.following]
+    return [node.top, node.bottom, node.following]
+
+
+def _computer_bytes(computer: Computer) -> bytes:
+    """
+    Returns the content of computer, for fingerprints. Numbers are written as _number_key gives them,
+    so computers that are equal (a hacked value of 1 and one of 1.0) have the same content.
+
+    Complexity: O(len(computer.name))
+    """
+    return repr((computer.name, _number_key(computer.hacking_difficulty), _number_key(computer.hacked_value),
+                 _number_key(computer.risk_factor))).encode()
+
+
+def _number_key(value: object) -> object:
+    """
+    Returns value as an int when it is a whole number (a bool, or a float such as 1.0 or -0.0), so
+    that numbers that are equal are written the same, and value itself otherwise
+
+    Complexity: O(1)
+    """
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _series_fingerprint(computer: Computer, following: bytes) -> bytes:
+    """
+    Returns the fingerprint of a series of computer, followed by a route with fingerprint following
+
+    Complexity: O(len(computer.name))
+    """
+    digest = blake2b(b"series", digest_size=FINGERPRINT_SIZE)
+    digest.update(_computer_bytes(computer))
+    digest.update(following)
+    return digest.digest()
+
+
+def _fingerprint_all(node: RouteSplit | RouteFanOut | RouteSeries | RouteRun | Route) -> None:
+    """
+    Fingerprint node and every node below it that isn't yet, children first. The nodes still to
+    be hashed are kept on an ArrayStack rather than the call stack, so deep routes don't hit
+    the recursion limit.
+
+    Complexity: O(n), where n is the number of nodes not fingerprinted yet
+    """
+    stack = ArrayStack()
+    stack.push((node, False))
+    while not stack.is_empty():
+        node, expanded = stack.pop()
+        if node._fingerprint is not None:
+            continue
+        children = _children(node)
+        if not expanded:
+            stack.push((node, True))
+            for child in children:
+                if child._fingerprint is None:
+                    stack.push((child, False))
+            continue
+        if isinstance(node, Route):
+            node._fingerprint = EMPTY_FINGERPRINT if node.store is None else node.store._fingerprint
+            continue
+        if isinstance(node, RouteSeries):
+            node._fingerprint = _series_fingerprint(node.computer, node.following._fingerprint)
+        elif isinstance(node, RouteRun):
+            # The same as the RouteSeries the run stands for, so that a run equals them.
+            fingerprint = node.following._fingerprint
+            for computer in reversed(node.computers):
+                fingerprint = _series_fingerprint(computer, fingerprint)
+            node._fingerprint = fingerprint
+        else:
+            kind = b"split" if isinstance(node, RouteSplit) else b"fan out %d" % len(node.branches)
+            digest = blake2b(kind, digest_size=FINGERPRINT_SIZE)
+            for child in children:
+                digest.update(child._fingerprint)
+            node._fingerprint = digest.digest()
+
+
+@dataclass(eq=False)
+class RouteSplit(_Fingerprinted):
     """
     A split in the route.
        _____top______
-      /              \
+      /              \\
     -<                >-following-
-      \____bottom____/
+      \\____bottom____/
     """
 
     top: Route
@@ -38,8 +177,68 @@ class RouteSplit:
         """
         return self.following.store
 
-@dataclass
-class RouteSeries:
+
+@dataclass(eq=False)
+class RouteFanOut(_Fingerprinted):
+    """
+    A split into any number of branches, the virus taking one of them (see
+    VirusType.select_branch_many) or stopping.
+       ___branches[0]___
+      /                 \\
+    -<----branches[1]----->-following-
+      \\___branches[2]___/
+
+    A fan out has at least one branch.
+    """
+
+    branches: tuple[Route, ...]
+    following: Route
+
+    def remove_branch(self) -> RouteStore:
+        """Removes the branches, should just leave the remaining following route.
+
+        Returns: a dataclass Route's store
+
+        Complexity: O(1)
+        """
+        return self.following.store
+
+    def add_branch(self, branch: Route) -> RouteStore:
+        """
+        Returns a route store which would be the result of:
+        Adding branch after the current branches.
+
+        Complexity: O(k), where k is the number of branches
+        """
+        return RouteFanOut(self.branches + (branch,), self.following)
+
+    def remove_branch_at(self, index: int) -> RouteStore:
+        """
+        Returns a route store which would be the result of:
+        Removing the branch at index.
+
+        Raises: IndexError if there is no branch at index, see branch_index
+
+        Complexity: O(k), where k is the number of branches
+        """
+        index = self.branch_index(index)
+        return RouteFanOut(self.branches[:index] + self.branches[index + 1:], self.following)
+
+    def branch_index(self, index: int) -> int:
+        """
+        Returns the position in branches of the branch at index, which counts back from the
+        last branch when negative, as in tuple indexing.
+
+        Raises: IndexError if there is no branch at index
+
+        Complexity: O(1)
+        """
+        if not -len(self.branches) <= index < len(self.branches):
+            raise IndexError(f"No branch at {index} of {len(self.branches)} branches")
+        return index % len(self.branches)
+
+@dataclass(eq=False)
+class RouteSeries(_Fingerprinted):
     """
     A computer, followed by the rest of the route
 
@@ -95,14 +294,299 @@ class RouteSeries:
         """
         return RouteSeries(self.computer, Route(RouteSplit(Route(None), Route(None), self.following)))
 
-RouteStore = Union[RouteSplit, RouteSeries, None]
+
+@dataclass(eq=False)
+class RouteRun(_Fingerprinted):
+    """
+    A run of computers one after the other, followed by the rest of the route: the same route as a
+    RouteSeries for each of them, in two objects rather than two per computer.
+
+    --computers[0]--computers[1]-- ... --following--
+
+    It has the edit methods of RouteSeries, acting on its first computer, which split or merge the
+    run as needed. They copy the run, so they cost O(k), where k is the number of computers in it.
+    A run equals (and has the fingerprint of) the RouteSeries it stands for.
+
+    A run holds at least one computer.
+    """
+
+    computers: tuple[Computer, ...]
+    following: Route
+
+    @staticmethod
+    def of(computers: tuple[Computer, ...], following: Route) -> RouteSeries | RouteRun:
+        """
+        Returns computers followed by following, as a RouteSeries when there is one computer and a
+        RouteRun when there are more.
+
+        param arg1: the computers, at least one
+        param arg2: the route after them
+
+        Complexity: O(1)
+        """
+        if len(computers) == 1:
+            return RouteSeries(computers[0], following)
+        return RouteRun(computers, following)
+
+    @property
+    def computer(self) -> Computer:
+        """
+        Returns the first computer of the run, like RouteSeries.computer
+
+        Complexity: O(1)
+        """
+        return self.computers[0]
+
+    def split_at(self, index: int) -> RouteStore:
+        """
+        Returns the same route, with the run cut into its first index computers and the rest,
+        each a RouteSeries when it holds a single computer.
+
+        param arg1: an index between 1 and the number of computers in the run
+
+        Complexity: O(k), where k is the number of computers in the run
+        """
+        if index >= len(self.computers):
+            return self
+        return RouteRun.of(self.computers[:index], Route(RouteRun.of(self.computers[index:], self.following)))
+
+    def remove_computer(self) -> RouteStore:
+        """
+        Returns a route store which would be the result of:
+        Removing the first computer of this run.
+
+        Complexity: O(k), where k is the number of computers in the run
+        """
+        if len(self.computers) == 1:
+            return self.following.store
+        return RouteRun.of(self.computers[1:], self.following)
+
+    def add_computer_before(self, computer: Computer) -> RouteStore:
+        """
+        Returns a route store which would be the result of:
+        Adding a computer before the run, which joins it.
+
+        Complexity: O(k), where k is the number of computers in the run
+        """
+        return RouteRun((computer,) + self.computers, self.following)
+
+    def add_computer_after(self, computer: Computer) -> RouteStore:
+        """
+        Returns a route store which would be the result of:
+        Adding a computer after the first computer of the run, which joins it.
+
+        Complexity: O(k), where k is the number of computers in the run
+        """
+        return RouteRun(self.computers[:1] + (computer,) + self.computers[1:], self.following)
+
+    def add_empty_branch_before(self) -> RouteStore:
+        """
+        Returns a route store which would be the result of:
+        Adding an empty branch, where the current routestore is now the following path.
+
+        Complexity: O(1)
+        """
+        return RouteSplit(Route(None), Route(None), Route(self))
+
+    def add_empty_branch_after(self) -> RouteStore:
+        """
+        Returns a route store which would be the result of:
+        Adding an empty branch after the first computer, which splits the run in two.
+
+        Complexity: O(k), where k is the number of computers in the run
+        """
+        rest = Route(RouteSplit(Route(None), Route(None), Route(self.remove_computer())))
+        return RouteSeries(self.computers[0], rest)
+
+RouteStore = Union[RouteSplit, RouteFanOut, RouteSeries, RouteRun, None]
+
+
+class NormalisePolicy(Enum):
+    """
+    Which splits (or fan outs) with only empty branches Route.normalise may remove. Following such
+    a split adds no computers, but the virus is still asked for a decision there, and may STOP.
+
+    REMOVE:     remove them all, for viruses that never STOP when both branches are empty (every
+                virus in virus.py takes the top branch)
+    COLLAPSE:   keep one of every run of them one after the other, for viruses whose decision only
+                depends on the branches, so that they decide the same at all of them
+    """
+    REMOVE = auto()
+    COLLAPSE = auto()
+
+
+@dataclass
+class NormaliseReport:
+    """
+    What Route.normalise removed.
+
+    removed:    the splits removed
+    emptied:    the number of branches left empty because everything on them was removed
+    """
+
+    removed: list[RouteSplit | RouteFanOut]
+    emptied: int = 0
+
+
+def hacked_value(computer: Computer) -> float:
+    """
+    Objective for Route.best_path: the most total hacked value
+
+    Complexity: O(1)
+    """
+    return computer.hacked_value
+
+
+def least_risk(computer: Computer) -> float:
+    """
+    Objective for Route.best_path: the least total risk factor
+
+    Complexity: O(1)
+    """
+    return -computer.risk_factor
 
 
 @dataclass
-class Route:
+class BestPath:
+    """
+    The best way through a route, found by Route.best_path.
+
+    score:      the total of the objective over the computers
+    decisions:  the decision at every split (BranchDecision.TOP or BOTTOM) and fan out (the index
+                of the branch) met, in order, ending with BranchDecision.STOP if the path stops
+    computers:  the computers on the path, in the order they are hacked
+    """
+
+    score: float
+    decisions: list[BranchDecision | int]
+    computers: list[Computer]
+
+
+def path_scores(route: Route, objective: Callable[[Computer], float], memo: dict[int, list]) -> list:
+    """
+    Returns the best scores of route, working them out for every sub-route not in memo yet. The
+    sub-routes are scored bottom up with an ArrayStack, each shared sub-route once.
+
+    memo maps the id of each sub-route scored to [the sub-route (so that its id isn't reused),
+    full, stop, full_choice, stop_choice], where
+        full:           the best total of objective going all the way through the sub-route
+        stop:           the best total stopping at a split inside it (-inf when it has no split)
+        full_choice:    the branch taken at its first split or fan out for full
+        stop_choice:    how stop is reached there: (None, None) stopping at it, (index, True) going
+                        all the way through that branch then stopping in the following route, or
+                        (index, False) stopping inside that branch
+
+    param arg1: a route
+    param arg2: a function giving the score of each computer, summed over a path
+    param arg3: the scores already worked out with this objective, added to
+
+    Complexity: O(n), where n is the number of distinct nodes and computers not in memo yet
+    """
+    stack = ArrayStack()
+    stack.push((route, False))
+    while not stack.is_empty():
+        node, expanded = stack.pop()
+        if id(node) in memo:
+            continue
+        store = node.store
+        if store is None:
+            memo[id(node)] = [node, 0, float("-inf"), None, None]
+            continue
+        children = _children(store)
+        if not expanded:
+            stack.push((node, True))
+            for child in children:
+                stack.push((child, False))
+            continue
+        following = memo[id(children[-1])]
+        if isinstance(store, (RouteSeries, RouteRun)):
+            computers = [store.computer] if isinstance(store, RouteSeries) else store.computers
+            score = sum(objective(computer) for computer in computers)
+            memo[id(node)] = [node, score + following[1], score + following[2], None, None]
+            continue
+        branches = [memo[id(child)] for child in children[:-1]]
+        full_choice = 0
+        for i in range(1, len(branches)):
+            if branches[i][1] > branches[full_choice][1]:
+                full_choice = i
+        full = branches[full_choice][1]
+        stop, stop_choice = full + following[2], (full_choice, True)
+        for i, branch in enumerate(branches):
+            if branch[2] > stop:
+                stop, stop_choice = branch[2], (i, False)
+        if 0 > stop:
+            stop, stop_choice = 0, (None, None)
+        memo[id(node)] = [node, full + following[1], stop, full_choice, stop_choice]
+    return memo[id(route)]
+
+
+@dataclass(eq=False)
+class Route(_Fingerprinted):
 
     store: RouteStore = None
 
+    def __reduce__(self) -> tuple:
+        """
+        Pickle the route in the binary format of route_format when it gives the same route back
+        (see route_format.round_trips), otherwise as the list of its nodes made by _nodes, in which
+        the computers are pickled as they are. Neither recurses once per node, as pickling the
+        nested dataclasses would.
+
+        Complexity: O(n), see route_format.dump
+        """
+        from route_format import dumps, loads, round_trips
+        if round_trips(self):
+            return loads, (dumps(self),)
+        return _from_nodes, (_nodes(self),)
+
+    def __copy__(self) -> Route:
+        """
+        Returns a route sharing this route's store, which (the nodes never being changed) is all
+        a shallow copy needs, rather than the round trip through route_format of __reduce__.
+
+        Complexity: O(1), plus loading the store of a LazyRoute
+        """
+        return Route(self.store)
+
+    def __deepcopy__(self, memo: dict) -> Route:
+        """
+        Returns a copy of this route with new nodes and a deep copy of each computer, so computers
+        that are equal but distinct stay distinct, and a sub-route or computer shared in this route
+        is shared in the copy. The nodes are copied bottom up with an ArrayStack.
+
+        param arg1: the memo of copy.deepcopy
+
+        Complexity: O(n), where n is the number of distinct nodes and computers in the route
+        """
+        copied: dict[int, Route] = {}
+        stack = ArrayStack()
+        stack.push((self, False))
+        while not stack.is_empty():
+            route, expanded = stack.pop()
+            if id(route) in copied:
+                continue
+            store = route.store
+            if store is None:
+                copied[id(route)] = Route(None)
+                continue
+            children = _children(store)
+            if not expanded:
+                stack.push((route, True))
+                for child in children:
+                    stack.push((child, False))
+                continue
+            new = [copied[id(child)] for child in children]
+            if isinstance(store, RouteSeries):
+                copied[id(route)] = Route(RouteSeries(copy.deepcopy(store.computer, memo), new[0]))
+            elif isinstance(store, RouteRun):
+                computers = tuple(copy.deepcopy(computer, memo) for computer in store.computers)
+                copied[id(route)] = Route(RouteRun(computers, new[0]))
+            elif isinstance(store, RouteFanOut):
+                copied[id(route)] = Route(RouteFanOut(tuple(new[:-1]), new[-1]))
+            else:
+                copied[id(route)] = Route(RouteSplit(*new))
+        return copied[id(self)]
+
     def add_computer_before(self, computer: Computer) -> Route:
         """
         Returns a *new* route which would be the result of:
@@ -121,96 +605,431 @@ class Route:
         """
         return Route(RouteSplit(Route(None), Route(None), self))
 
+    def normalise(self, policy: NormalisePolicy = NormalisePolicy.REMOVE) -> tuple[Route, NormaliseReport]:
+        """
+        Returns this route without the splits (or fan outs) whose branches are all empty that policy allows
+        removing, and a report of what was removed. A branch holding nothing but such splits is
+        left empty, which may let the split it is on go too.
+
+        The sub-routes are normalised bottom up with an ArrayStack, each (shared) sub-route once,
+        and a sub-route with nothing to remove is kept as it is rather than copied.
+
+        param arg1: a NormalisePolicy, REMOVE by default
+
+        Complexity: O(n), where n is the number of distinct nodes in the route
+        """
+        report = NormaliseReport([])
+        normalised: dict[int, Route] = {}
+        stack = ArrayStack()
+        stack.push((self, False))
+        while not stack.is_empty():
+            route, expanded = stack.pop()
+            if id(route) in normalised:
+                continue
+            store = route.store
+            if store is None:
+                normalised[id(route)] = route
+                continue
+            children = _children(store)
+            if not expanded:
+                stack.push((route, True))
+                for child in children:
+                    stack.push((child, False))
+                continue
+            new = [normalised[id(child)] for child in children]
+            if isinstance(store, (RouteSplit, RouteFanOut)):
+                report.emptied += sum(old.store is not None and child.store is None
+                                      for child, old in zip(new[:-1], children))
+                following = new[-1].store
+                if _is_empty_split(new[:-1]) and (policy == NormalisePolicy.REMOVE or (
+                        isinstance(following, (RouteSplit, RouteFanOut))
+                        and _is_empty_split(_children(following)[:-1]))):
+                    report.removed.append(store)
+                    normalised[id(route)] = new[-1]
+                    continue
+            if all(child is old for child, old in zip(new, children)):
+                normalised[id(route)] = route
+            elif isinstance(store, RouteSeries):
+                normalised[id(route)] = Route(RouteSeries(store.computer, new[0]))
+            elif isinstance(store, RouteRun):
+                normalised[id(route)] = Route(RouteRun(store.computers, new[0]))
+            elif isinstance(store, RouteFanOut):
+                normalised[id(route)] = Route(RouteFanOut(tuple(new[:-1]), new[-1]))
+            else:
+                normalised[id(route)] = Route(RouteSplit(*new))
+        return normalised[id(self)], report
+
+    def best_path(self, objective: Callable[[Computer], float] = hacked_value, allow_stop: bool = False) -> BestPath:
+        """
+        Returns the path through the route with the highest total of objective over its computers,
+        by dynamic programming over the sub-routes (see path_scores) rather than by trying every
+        combination of decisions. Then the path is followed down the decisions that gave the best
+        scores, with an ArrayStack.
+
+        To minimise the total risk, use least_risk as objective.
+
+        param arg1: a function giving the score of each computer, hacked_value by default
+        param arg2: whether the path may STOP at a split, giving up everything after it (worth it
+                    when what follows only scores below zero)
+
+        Complexity: O(n), where n is the number of distinct nodes and computers in the route
+        """
+        memo: dict[int, list] = {}
+        _, full, stop, _, _ = path_scores(self, objective, memo)
+        stopping = allow_stop and stop > full
+        result = BestPath(stop if stopping else full, [], [])
+        stack = ArrayStack()
+        stack.push((self, stopping))
+        while not stack.is_empty():
+            route, stopping = stack.pop()
+            store = route.store
+            if store is None:
+                continue
+            if isinstance(store, RouteSeries):
+                result.computers.append(store.computer)
+                stack.push((store.following, stopping))
+                continue
+            if isinstance(store, RouteRun):
+                result.computers.extend(store.computers)
+                stack.push((store.following, stopping))
+                continue
+            branches = _children(store)[:-1]
+            _, _, _, full_choice, stop_choice = memo[id(route)]
+            index, through = (stop_choice if stopping else (full_choice, True))
+            if index is None:
+                result.decisions.append(BranchDecision.STOP)
+                break
+            if isinstance(store, RouteFanOut):
+                result.decisions.append(index)
+            else:
+                result.decisions.append(BranchDecision.TOP if index == 0 else BranchDecision.BOTTOM)
+            if through:
+                stack.push((store.following, stopping))
+                stack.push((branches[index], False))
+            else:
+                stack.push((branches[index], True))
+        return result
+
     def follow_path(self, virus_type: VirusType) -> None:
         """
         Follow a path and add computers according to a virus_type.
-        How it works is by separating the whole route into two parts,
-        then solve each parts by breaking them down into more parts
+        At each split (or fan out) the virus picks a branch, which is followed before the route
+        after the split. The routes still to follow after the current branch are kept on an
+        ArrayStack rather than in nested loops, so splits may be nested to any depth. The virus
+        stops for good at the first BranchDecision.STOP.
 
         param arg1: a virus type
 
-        Complexity: Best case occur when route is None, loop will not even start, complexity is O(1)
-                    Worst case occur when nested loop occurs and worst case for there_is_still_more occur, Complexity is O(x * y * z)
-                    where x is the number of outer loop, y is the number of nested loop and z is there_is_still_more occur
-        """
-        def there_is_still_more(route, virus_type):
-            """
-            This function is used to add the computers in the choosen route,
-            and check whether there is still more "front" route to go to,
-            if there's none, None will be return in "front"
-
-            param arg1: a route (the whole route before separation into smaller parts)
-            param arg2: a virus type
-
-            Returns: "front", a route to be broken down if there's still more
-                     "route", the continuing route
-                     "choice", choice taken by the virus
-
-            Complexity: Depending on virus_type.select_branch(route.top, route.bottom)
-                        Best case occur when virus type is either a TopVirus or BottomVirus, Complexity is O(1)
-                        Worst case occur when virus type is FancyVirus and both route are a RouteSeries, Complexity is O(n)
-            """
-            front = None
-            choice = None
-            if isinstance(route, RouteSeries):
-                virus_type.add_computer(route.computer)
-                route = route.following.store
-            elif isinstance(route, RouteSplit):
-                choice = virus_type.select_branch(route.top, route.bottom)
-                if choice == BranchDecision.TOP:
-                    front = route.top.store
-                elif choice == BranchDecision.BOTTOM:
-                    front = route.bottom.store
-                elif choice == BranchDecision.STOP:
-                    return None, None, choice
-                route = route.following.store
-            return front, route, choice
-
-        route = self.store
-        while route is not None:
-            front, route, choice = there_is_still_more(route, virus_type)
-            if choice == BranchDecision.STOP:
-                break
-            while front is not None:
-                front1, front, choice = there_is_still_more(front, virus_type)
-                if choice == BranchDecision.STOP:
-                    route = None
-                while front1 is not None:
-                    front2, front1, choice = there_is_still_more(front1, virus_type)
+        Complexity: O(n * select_branch), where n is the number of nodes on the path followed
+        """
+        stack = ArrayStack()
+        stack.push(self.store)
+        while not stack.is_empty():
+            store = stack.pop()
+            while store is not None:
+                if isinstance(store, RouteSeries):
+                    virus_type.add_computer(store.computer)
+                    store = store.following.store
+                    continue
+                if isinstance(store, RouteRun):
+                    virus_type.computers.extend(store.computers)
+                    store = store.following.store
+                    continue
+                if isinstance(store, RouteFanOut):
+                    choice = virus_type.select_branch_many(store.branches)
+                    if choice == BranchDecision.STOP:
+                        return
+                    branch = store.branches[choice]
+                else:
+                    choice = virus_type.select_branch(store.top, store.bottom)
                     if choice == BranchDecision.STOP:
-                        front = None
-                    while front2 is not None:
-                        front3, front2, choice = there_is_still_more(front2, virus_type)
-                        if choice == BranchDecision.STOP:
-                            front1 = None
-                        while front3 is not None:
-                            front4, front3, choice = there_is_still_more(front3, virus_type)
-                            if choice == BranchDecision.STOP:
-                                front2 = None
+                        return
+                    branch = store.top if choice == BranchDecision.TOP else store.bottom
+                stack.push(store.following.store)
+                store = branch.store
 
     def add_all_computers(self) -> list[Computer]:
-        """Returns a list of all computers on the route."""
-        lst = []
-
-        def there_is_still_more(route):
-            """
-            Check whether there is still more parts inside it, if yes, recursion will occur
-
-            param arg1: the route to be checked
+        """
+        Returns a list of all computers on the route, top branches before bottom branches
+        before the following route.
+        The routes still to be visited are kept on an ArrayStack rather than the call stack,
+        so deep routes don't hit the recursion limit.
 
-            Complexity: Best case occur when it is only a RouteSeries, complexity is O(n)
-                        Worst case occur when the route is separated into a lot of parts, complexity is O(n)
-            """
+        Complexity: O(n), where n is the number of computers and RouteSplit in the route
+        """
+        lst = []
+        stack = ArrayStack()
+        stack.push(self.store)
+        while not stack.is_empty():
+            route = stack.pop()
             if isinstance(route, RouteSeries):
                 lst.append(route.computer)
-                there_is_still_more(route.following.store)
+                stack.push(route.following.store)
+            elif isinstance(route, RouteRun):
+                lst.extend(route.computers)
+                stack.push(route.following.store)
             elif isinstance(route, RouteSplit):
-                there_is_still_more(route.top.store)
-                there_is_still_more(route.bottom.store)
-                there_is_still_more(route.following.store)
-
-        there_is_still_more(self.store)
+                stack.push(route.following.store)
+                stack.push(route.bottom.store)
+                stack.push(route.top.store)
+            elif isinstance(route, RouteFanOut):
+                stack.push(route.following.store)
+                for i in range(len(route.branches) - 1, -1, -1):
+                    stack.push(route.branches[i].store)
         return lst
 
+def _nodes(route: Route) -> list[tuple | None]:
+    """
+    Returns the routes of route bottom up, walked with an ArrayStack, as a list whose last item is
+    route itself. An empty route is None, any other is (kind of store, computer or computers, or
+    None for a split or fan out, the indexes in the list of the routes directly below it). A route
+    shared in route is listed once.
+
+    Complexity: O(n), where n is the number of distinct routes in route
+    """
+    indexes: dict[int, int] = {}
+    nodes: list[tuple | None] = []
+    stack = ArrayStack()
+    stack.push((route, False))
+    while not stack.is_empty():
+        route, expanded = stack.pop()
+        if id(route) in indexes:
+            continue
+        store = route.store
+        if store is None:
+            indexes[id(route)] = len(nodes)
+            nodes.append(None)
+            continue
+        children = _children(store)
+        if not expanded:
+            stack.push((route, True))
+            for child in children:
+                stack.push((child, False))
+            continue
+        if isinstance(store, RouteSeries):
+            payload = store.computer
+        elif isinstance(store, RouteRun):
+            payload = store.computers
+        else:
+            payload = None
+        indexes[id(route)] = len(nodes)
+        nodes.append((type(store), payload, tuple(indexes[id(child)] for child in children)))
+    return nodes
+
+
+def _from_nodes(nodes: list[tuple | None]) -> Route:
+    """
+    Returns the route listed by _nodes
+
+    Complexity: O(n), where n is the length of nodes
+    """
+    routes: list[Route] = []
+    for node in nodes:
+        if node is None:
+            routes.append(Route(None))
+            continue
+        kind, payload, children = node
+        below = [routes[i] for i in children]
+        if kind is RouteSeries or kind is RouteRun:
+            routes.append(Route(kind(payload, below[0])))
+        elif kind is RouteFanOut:
+            routes.append(Route(RouteFanOut(tuple(below[:-1]), below[-1])))
+        else:
+            routes.append(Route(RouteSplit(*below)))
+    return routes[-1]
+
+
+class LazyRoute(Route):
+    """
+    A Route whose store is only made, by calling loader, the first time it is asked for, and kept
+    from then on. A loader usually gives a store whose routes are LazyRoute too (see
+    route_format.RouteFile), so following a route only makes the nodes the virus goes through,
+    and the first node of the branches it is asked to choose between.
+
+    Anything that goes through the whole route (add_all_computers, equality, normalise, dump ...)
+    loads all of it.
+
+    Attributes:
+        loader: makes the store, None once it has been called
+        loaded: whether the store has been made
+    """
+
+    def __init__(self, loader: Callable[[], RouteStore]) -> None:
+        self.loader = loader
+        self.loaded = False
+        self._store = None
+
+    @property
+    def store(self) -> RouteStore:
+        """
+        Returns the store, made by the loader the first time
+
+        Complexity: O(1) once loaded, the cost of the loader the first time
+        """
+        if not self.loaded:
+            self._store = self.loader()
+            self.loaded = True
+            self.loader = None
+        return self._store
+
+    def __repr__(self) -> str:
+        if not self.loaded:
+            return "LazyRoute(<not loaded>)"
+        return f"LazyRoute(store={self._store!r})"
+
+
+def _is_empty_split(branches: list[Route]) -> bool:
+    """
+    Returns whether branches, the branches of a split or fan out, are all empty
+
+    Complexity: O(k), where k is the number of branches
+    """
+    return all(branch.store is None for branch in branches)
+
+
+class RouteChangeKind(Enum):
+    INSERTED = auto()
+    REMOVED = auto()
+    CHANGED = auto()
+    REPLACED = auto()
+
+
+@dataclass
+class RouteChange:
+    """
+    A difference found by diff, at path: the steps ("top", "bottom" or "following", or the index
+    of a branch of a fan out) from the root to the route that differs.
+
+    INSERTED:   new is old with a node added in front (new.store.following equals old)
+    REMOVED:    old is new with a node added in front (old.store.following equals new)
+    CHANGED:    both start with a computer, and the computers differ, what follows is compared
+                separately
+    REPLACED:   anything else, old and new have nothing in common at this point
+
+    A run is compared as the series it stands for, one computer and one "following" step at a
+    time, so a change doesn't depend on whether either route keeps its computers in runs. A
+    change inside a run has, as old or new, a LazyRoute for the rest of the run.
+    """
+
+    kind: RouteChangeKind
+    path: tuple[str | int, ...]
+    old: Route
+    new: Route
+
+
+def diff(old: Route, new: Route) -> list[RouteChange]:
+    """
+    Returns the differences between two routes, top branches before bottom branches before the
+    following route. Both routes are walked together, and a pair of sub-routes with the same
+    fingerprint is skipped whole, so only the parts that changed (and the path down to them)
+    are visited. The pairs still to be compared are kept on an ArrayStack, each side as a route
+    and the index of a computer in its run (see _run_fingerprint), 0 when it isn't a run.
+
+    param arg1: a route
+    param arg2: another version of the route
+
+    Complexity: O(1) when the routes are equal and already fingerprinted, otherwise
+                O(c) plus the cost of fingerprinting, where c is the number of pairs of
+                sub-routes visited, those that differ and their children
+    """
+    changes = []
+    runs: dict[int, list[bytes]] = {}
+    stack = ArrayStack()
+    stack.push((old, 0, new, 0, None))
+    while not stack.is_empty():
+        old, i, new, j, steps = stack.pop()
+        if _run_fingerprint(old, i, runs) == _run_fingerprint(new, j, runs):
+            continue
+        old_store, new_store = old.store, new.store
+        if new_store is not None and _run_fingerprint(*_after(new, j), runs) == _run_fingerprint(old, i, runs):
+            kind = RouteChangeKind.INSERTED
+        elif old_store is not None and _run_fingerprint(*_after(old, i), runs) == _run_fingerprint(new, j, runs):
+            kind = RouteChangeKind.REMOVED
+        elif isinstance(old_store, (RouteSeries, RouteRun)) and isinstance(new_store, (RouteSeries, RouteRun)):
+            old_computer = old_store.computers[i] if isinstance(old_store, RouteRun) else old_store.computer
+            new_computer = new_store.computers[j] if isinstance(new_store, RouteRun) else new_store.computer
+            if old_computer != new_computer:
+                changes.append(RouteChange(RouteChangeKind.CHANGED, _path(steps), _rest(old, i), _rest(new, j)))
+            stack.push((*_after(old, i), *_after(new, j), ("following", steps)))
+            continue
+        elif isinstance(old_store, RouteSplit) and isinstance(new_store, RouteSplit):
+            for step in ("following", "bottom", "top"):
+                stack.push((getattr(old_store, step), 0, getattr(new_store, step), 0, (step, steps)))
+            continue
+        elif isinstance(old_store, RouteFanOut) and isinstance(new_store, RouteFanOut) and (
+                len(old_store.branches) == len(new_store.branches)):
+            stack.push((old_store.following, 0, new_store.following, 0, ("following", steps)))
+            for k in range(len(old_store.branches) - 1, -1, -1):
+                stack.push((old_store.branches[k], 0, new_store.branches[k], 0, (k, steps)))
+            continue
+        else:
+            kind = RouteChangeKind.REPLACED
+        changes.append(RouteChange(kind, _path(steps), _rest(old, i), _rest(new, j)))
+    return changes
+
+
+def _run_fingerprint(route: Route, index: int, runs: dict[int, list[bytes]]) -> bytes:
+    """
+    Returns the fingerprint of route from the computer at index of its run on, the fingerprint of
+    route itself when index is 0. The fingerprints of every index of a run are made together the
+    first time one is asked for, and kept in runs by the id of the run.
+
+    Complexity: O(1) once the run's fingerprints are made, O(k) the first time for a run of k
+                computers, plus fingerprinting route when index is 0
+    """
+    if index == 0:
+        return route.fingerprint()
+    run = route.store
+    if id(run) not in runs:
+        fingerprints = [run.following.fingerprint()]
+        for computer in reversed(run.computers):
+            fingerprints.append(_series_fingerprint(computer, fingerprints[-1]))
+        fingerprints.reverse()
+        runs[id(run)] = fingerprints
+    return runs[id(run)][index]
+
+
+def _after(route: Route, index: int) -> tuple[Route, int]:
+    """
+    Returns the route and index after the computer at index of route's run, or after route's node
+    when it isn't a run.
+
+    :pre: route isn't empty
+
+    Complexity: O(1)
+    """
+    store = route.store
+    if isinstance(store, RouteRun) and index + 1 < len(store.computers):
+        return route, index + 1
+    return store.following, 0
+
+
+def _rest(route: Route, index: int) -> Route:
+    """
+    Returns route from the computer at index of its run on: route itself when index is 0, otherwise
+    a LazyRoute that only copies the rest of the run if its store is asked for.
+
+    Complexity: O(1)
+    """
+    if index == 0:
+        return route
+    run = route.store
+    return LazyRoute(lambda: RouteRun.of(run.computers[index:], run.following))
+
+
+def _path(steps: tuple | None) -> tuple[str | int, ...]:
+    """
+    Returns the path of steps, which are kept as (last step, steps before it) pairs while walking
+    so that going down a step is O(1).
+
+    Complexity: O(depth)
+    """
+    path = []
+    while steps is not None:
+        step, steps = steps
+        path.append(step)
+    return tuple(reversed(path))
+
+
 if __name__ == "__main__":
     pass
\ No newline at end of file
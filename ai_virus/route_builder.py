@@ -0,0 +1,207 @@
+"""
+This module contains RouteBuilder, which builds a route front to back
+"""
+
+from __future__ import annotations
+import gc
+from contextlib import contextmanager
+from threading import Lock
+from typing import Iterable, Iterator
+from computer import Computer
+from data_structures.array_stack import ArrayStack
+from route import Route, RouteRun, RouteSeries, RouteSplit
+
+__author__ = "Adrian Ong Zhe Yee, Teh Yee Hong"
+
+
+_paused_lock = Lock()
+_paused_count = 0
+_paused_enabled = False
+
+
+@contextmanager
+def collection_paused() -> Iterator[None]:
+    """
+    Pause the cyclic garbage collector while many nodes are made. Route nodes never form cycles,
+    so reference counting still frees them, and a million new nodes would otherwise set off
+    hundreds of collections, each walking the nodes already made.
+
+    The collector is process-wide, so this pauses it for every thread, not only the caller's.
+    Pauses may overlap, nested or from several threads: the first to start records whether the
+    collector was enabled and disables it, and the last to end puts back what was recorded, so a
+    collector the caller had disabled stays disabled.
+    """
+    global _paused_count, _paused_enabled
+    with _paused_lock:
+        if _paused_count == 0:
+            _paused_enabled = gc.isenabled()
+            gc.disable()
+        _paused_count += 1
+    try:
+        yield
+    finally:
+        with _paused_lock:
+            _paused_count -= 1
+            if _paused_count == 0 and _paused_enabled:
+                gc.enable()
+
+
+class RouteBuilder:
+    """
+    Builds a route in the order it is followed, then makes it into an ordinary Route with freeze().
+
+    The builder always appends to the end of the route, or of the branch it is in:
+
+        builder.series([a, b])      --a--b--
+        builder.split()             opens a split, and goes into its top branch
+        builder.series([c])         --a--b--<c
+        builder.bottom()            goes into the bottom branch
+        builder.series([d])         --a--b--<c / d
+        builder.end()               closes the split, and goes on after it
+        builder.series([e])         --a--b--<c / d>--e--
+        builder.freeze()            returns the route
+
+    Until freeze(), the route is only recorded: every sequence (the whole route, or a branch) is a
+    list of its computers and splits, in order, and a split is the list [top, bottom] of the
+    sequences of its branches. freeze() then makes every node in one pass, from the back of each
+    sequence, with the garbage collector paused. A builder made with runs=True makes every stretch
+    of computers between two splits into a single RouteRun.
+
+    Attributes:
+        root: the sequence of the whole route
+        current: the sequence being appended to
+        splits: for every split still open, innermost last: the split and the sequence it is in
+        frozen: whether freeze() has been called, after which the builder can't be used
+        runs: whether consecutive computers are made into a RouteRun rather than a RouteSeries each
+    """
+
+    def __init__(self, runs: bool = False) -> None:
+        self.root = self.current = []
+        self.splits: list[tuple[list, list]] = []
+        self.frozen = False
+        self.runs = runs
+
+    def _check(self) -> None:
+        """
+        Raises: ValueError if the route has already been frozen
+        """
+        if self.frozen:
+            raise ValueError("The route has been frozen, start a new RouteBuilder")
+
+    def _open_split(self) -> list[list]:
+        """
+        Returns the innermost open split
+
+        Raises: ValueError if there is none, or if the route has been frozen
+
+        Complexity: O(1)
+        """
+        self._check()
+        if not self.splits:
+            raise ValueError("There is no open split")
+        return self.splits[-1][0]
+
+    def series(self, computers: Iterable[Computer]) -> RouteBuilder:
+        """
+        Append computers, in order, to the route or branch being built
+
+        param arg1: the computers
+
+        Returns: the builder, so calls can be chained
+
+        Complexity: O(n), where n is the number of computers
+        """
+        self._check()
+        self.current.extend(computers)
+        return self
+
+    def split(self) -> RouteBuilder:
+        """
+        Append a split with empty branches, and go into its top branch
+
+        Complexity: O(1)
+        """
+        self._check()
+        split = [[], []]
+        self.current.append(split)
+        self.splits.append((split, self.current))
+        self.current = split[0]
+        return self
+
+    def top(self) -> RouteBuilder:
+        """
+        Go to the end of the top branch of the innermost open split
+
+        Raises: ValueError if there is no open split
+
+        Complexity: O(1)
+        """
+        self.current = self._open_split()[0]
+        return self
+
+    def bottom(self) -> RouteBuilder:
+        """
+        Go to the end of the bottom branch of the innermost open split
+
+        Raises: ValueError if there is no open split
+
+        Complexity: O(1)
+        """
+        self.current = self._open_split()[1]
+        return self
+
+    def end(self) -> RouteBuilder:
+        """
+        Close the innermost open split, and go on with the route after it
+
+        Raises: ValueError if there is no open split
+
+        Complexity: O(1)
+        """
+        self._open_split()
+        _, self.current = self.splits.pop()
+        return self
+
+    def freeze(self) -> Route:
+        """
+        Returns the route built, made of new Route, RouteSeries (or RouteRun) and RouteSplit nodes. A sequence is
+        made once the sequences of the branches of its splits are, which are kept on an ArrayStack
+        until then, so deeply nested splits don't hit the recursion limit.
+
+        Raises: ValueError if a split is still open, or if the route has already been frozen
+
+        Complexity: O(n), where n is the number of computers and splits
+        """
+        self._check()
+        if self.splits:
+            raise ValueError(f"{len(self.splits)} split(s) still open, end() them first")
+        self.frozen = True
+        made: dict[int, Route] = {}
+        stack = ArrayStack()
+        stack.push((self.root, False))
+        with collection_paused():
+            while not stack.is_empty():
+                sequence, branches_made = stack.pop()
+                if not branches_made:
+                    stack.push((sequence, True))
+                    for item in sequence:
+                        if type(item) is list:
+                            stack.push((item[0], False))
+                            stack.push((item[1], False))
+                    continue
+                route = Route(None)
+                end = len(sequence)
+                for i in range(len(sequence) - 1, -1, -1):
+                    item = sequence[i]
+                    if type(item) is list:
+                        if end > i + 1:
+                            route = Route(RouteRun.of(tuple(sequence[i + 1:end]), route))
+                        route = Route(RouteSplit(made.pop(id(item[0])), made.pop(id(item[1])), route))
+                        end = i
+                    elif not self.runs:
+                        route = Route(RouteSeries(item, route))
+                        end = i
+                if end > 0:
+                    route = Route(RouteRun.of(tuple(sequence[:end]), route))
+                made[id(sequence)] = route
+        return made[id(self.root)]
@@ -0,0 +1,268 @@
+"""
+This module contains RouteCursor, a zipper for editing a route away from its head
+"""
+
+from __future__ import annotations
+from computer import Computer
+from route import Route, RouteFanOut, RouteRun, RouteSeries, RouteSplit
+
+__author__ = "Adrian Ong Zhe Yee, Teh Yee Hong"
+
+
+class RouteCursor:
+    """
+    A position (the focus) inside a route, with the way back up to the root.
+
+    The cursor moves down into the following route of a series, run, split or fan out, into the
+    top or bottom branch of a split, or into a branch of a fan out, and applies the edit methods of Route and RouteSeries to the route
+    at its focus. commit() then returns a new root holding the edited focus: only the nodes on the
+    path from the root to the focus are copied, every other node is shared with the original route,
+    which is left unchanged.
+
+    Attributes:
+        focus: the route at the cursor, with the edits made so far
+        crumbs: for every step taken from the root, the route stepped from and the step taken
+                ("following", "top" or "bottom", or the index of a branch of a fan out)
+    """
+
+    def __init__(self, route: Route) -> None:
+        self.focus = route
+        self.crumbs: list[tuple[Route, str]] = []
+
+    @property
+    def depth(self) -> int:
+        """
+        Returns the number of steps from the root to the focus
+
+        Complexity: O(1)
+        """
+        return len(self.crumbs)
+
+    def _down(self, step: str | int, kinds: tuple[type, ...]) -> RouteCursor:
+        """
+        Move the focus to the route reached through step, which the focus' store must have.
+
+        Raises: ValueError if the focus' store isn't one of kinds
+
+        Complexity: O(1)
+        """
+        store = self.focus.store
+        if not isinstance(store, kinds):
+            raise ValueError(f"Cannot move into {step} of {type(store).__name__}")
+        child = _child(store, step)
+        self.crumbs.append((self.focus, step))
+        self.focus = child
+        return self
+
+    def following(self, count: int = 1) -> RouteCursor:
+        """
+        Move the focus past count computers or splits, into what follows them. A RouteRun is passed
+        in one step when all of its computers are, and otherwise cut (see RouteRun.split_at) where
+        the focus stops.
+
+        param arg1: how many steps to take, 1 by default
+
+        Returns: the cursor, so moves and edits can be chained
+
+        Raises: ValueError if the route ends before count steps
+
+        Complexity: O(count) plus O(k) for the run cut, where k is the number of computers in it
+        """
+        while count > 0:
+            store = self.focus.store
+            if isinstance(store, RouteRun):
+                if count < len(store.computers):
+                    self.focus = Route(store.split_at(count))
+                    store = self.focus.store
+                count -= len(store.computers) if isinstance(store, RouteRun) else 1
+            else:
+                count -= 1
+            self._down("following", (RouteSeries, RouteRun, RouteSplit, RouteFanOut))
+        return self
+
+    def top(self) -> RouteCursor:
+        """
+        Move the focus into the top branch of the split at the focus
+
+        Raises: ValueError if the focus isn't a split
+
+        Complexity: O(1)
+        """
+        return self._down("top", (RouteSplit,))
+
+    def bottom(self) -> RouteCursor:
+        """
+        Move the focus into the bottom branch of the split at the focus
+
+        Raises: ValueError if the focus isn't a split
+
+        Complexity: O(1)
+        """
+        return self._down("bottom", (RouteSplit,))
+
+    def branch(self, index: int) -> RouteCursor:
+        """
+        Move the focus into the branch at index of the fan out at the focus, counting back from the
+        last branch when index is negative
+
+        Raises: ValueError if the focus isn't a fan out
+                IndexError if it has no branch at index
+
+        Complexity: O(1)
+        """
+        store = self.focus.store
+        if isinstance(store, RouteFanOut):
+            index = store.branch_index(index)
+        return self._down(index, (RouteFanOut,))
+
+    def up(self) -> RouteCursor:
+        """
+        Move the focus back up one step, to a copy of the route above holding the edited focus
+        (the route above itself when the focus wasn't edited)
+
+        Raises: ValueError if the focus is the root
+
+        Complexity: O(1)
+        """
+        if not self.crumbs:
+            raise ValueError("The cursor is already at the root")
+        parent, step = self.crumbs.pop()
+        self.focus = self._rebuild(parent, step, self.focus)
+        return self
+
+    @staticmethod
+    def _rebuild(parent: Route, step: str | int, child: Route) -> Route:
+        """
+        Returns parent with the route at step replaced by child
+
+        Complexity: O(1), O(k) for a fan out of k branches
+        """
+        store = parent.store
+        if _child(store, step) is child:
+            return parent
+        if isinstance(store, RouteSeries):
+            return Route(RouteSeries(store.computer, child))
+        if isinstance(store, RouteRun):
+            return Route(RouteRun(store.computers, child))
+        if isinstance(store, RouteFanOut):
+            if step == "following":
+                return Route(RouteFanOut(store.branches, child))
+            return Route(RouteFanOut(store.branches[:step] + (child,) + store.branches[step + 1:], store.following))
+        top, bottom, following = store.top, store.bottom, store.following
+        if step == "top":
+            top = child
+        elif step == "bottom":
+            bottom = child
+        else:
+            following = child
+        return Route(RouteSplit(top, bottom, following))
+
+    def commit(self) -> Route:
+        """
+        Returns the root of the route with every edit made at the focus. The cursor stays where it
+        is, so editing can go on, and committing again gives a route with the later edits too.
+
+        Complexity: O(depth), plus the number of branches of the fan outs on the way
+        """
+        route = self.focus
+        for parent, step in reversed(self.crumbs):
+            route = self._rebuild(parent, step, route)
+        return route
+
+    def replace(self, route: Route) -> RouteCursor:
+        """
+        Replace the route at the focus with route
+
+        Complexity: O(1)
+        """
+        self.focus = route
+        return self
+
+    def _series(self) -> RouteSeries | RouteRun:
+        """
+        Returns the series or run at the focus, whose edit methods act on its first computer
+
+        Raises: ValueError if the focus isn't a series or a run
+
+        Complexity: O(1)
+        """
+        store = self.focus.store
+        if not isinstance(store, (RouteSeries, RouteRun)):
+            raise ValueError(f"The focus is a {type(store).__name__}, not a RouteSeries or RouteRun")
+        return store
+
+    def add_computer_before(self, computer: Computer) -> RouteCursor:
+        """
+        Add computer before everything at the focus, see Route.add_computer_before
+
+        Complexity: O(1)
+        """
+        self.focus = self.focus.add_computer_before(computer)
+        return self
+
+    def add_empty_branch_before(self) -> RouteCursor:
+        """
+        Add an empty branch before everything at the focus, see Route.add_empty_branch_before
+
+        Complexity: O(1)
+        """
+        self.focus = self.focus.add_empty_branch_before()
+        return self
+
+    def add_computer_after(self, computer: Computer) -> RouteCursor:
+        """
+        Add computer after the computer at the focus, see RouteSeries.add_computer_after
+
+        Raises: ValueError if the focus isn't a series or a run
+
+        Complexity: O(1) for a series, O(k) for a run of k computers
+        """
+        self.focus = Route(self._series().add_computer_after(computer))
+        return self
+
+    def add_empty_branch_after(self) -> RouteCursor:
+        """
+        Add an empty branch after the computer at the focus, see RouteSeries.add_empty_branch_after
+
+        Raises: ValueError if the focus isn't a series or a run
+
+        Complexity: O(1) for a series, O(k) for a run of k computers
+        """
+        self.focus = Route(self._series().add_empty_branch_after())
+        return self
+
+    def remove_computer(self) -> RouteCursor:
+        """
+        Remove the computer at the focus, see RouteSeries.remove_computer
+
+        Raises: ValueError if the focus isn't a series or a run
+
+        Complexity: O(1) for a series, O(k) for a run of k computers
+        """
+        self.focus = Route(self._series().remove_computer())
+        return self
+
+    def remove_branch(self) -> RouteCursor:
+        """
+        Remove the split (or fan out) at the focus, keeping what follows it, see RouteSplit.remove_branch
+
+        Raises: ValueError if the focus isn't a split or a fan out
+
+        Complexity: O(1)
+        """
+        store = self.focus.store
+        if not isinstance(store, (RouteSplit, RouteFanOut)):
+            raise ValueError(f"The focus is a {type(store).__name__}, not a RouteSplit or RouteFanOut")
+        self.focus = Route(store.remove_branch())
+        return self
+
+
+def _child(store: RouteSplit | RouteFanOut | RouteSeries | RouteRun, step: str | int) -> Route:
+    """
+    Returns the route reached from store through step
+
+    Complexity: O(1)
+    """
+    if isinstance(step, int):
+        return store.branches[step]
+    return getattr(store, step)
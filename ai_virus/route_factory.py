@@ -0,0 +1,369 @@
+"""
+This module contains RouteFactory, which hash-conses routes: every distinct sub-route is kept once
+"""
+
+from __future__ import annotations
+from typing import TYPE_CHECKING, Any
+from branch_decision import BranchDecision
+from computer import Computer
+from data_structures.array_stack import ArrayStack
+from route import Route, RouteFanOut, RouteRun, RouteSeries, RouteSplit, RouteStore
+
+__author__ = "Adrian Ong Zhe Yee, Teh Yee Hong"
+
+# Avoid circular imports for typing.
+if TYPE_CHECKING:
+    from virus import VirusType
+
+
+class RouteFactory:
+    """
+    Builds routes out of canonical nodes: asking twice for the same content gives back the same node,
+    so identical sub-routes, however they were built, exist once.
+
+    Computers are interned by value (name, difficulty, value and risk), keeping the first Computer
+    seen for each, and nodes by the identity of their (already canonical) parts. Computers given
+    to the factory must not be changed afterwards.
+
+    Results that only depend on a sub-route (the computers on it, their totals, the computers a
+    stateless virus collects on it) are memoised on its canonical Route, so they are computed once
+    per distinct sub-route, across every route built by this factory. The computers of a sub-route
+    are memoised as a _Computers made of those of its parts, so memoising them for every sub-route
+    takes space linear in the number of sub-routes.
+
+    The routes returned are ordinary Route, RouteSeries and RouteSplit objects. Their edit methods
+    build new nodes outside the factory, which `intern` brings back in. A RouteRun is interned as the
+    RouteSeries it stands for, so canonical routes have no runs.
+    """
+
+    def __init__(self) -> None:
+        self.computers: dict[tuple, Computer] = {}
+        self.nodes: dict[tuple, RouteSeries | RouteSplit | RouteFanOut | Route] = {}
+        self.canonical: set[int] = set()
+        self.memo: dict[tuple[Any, int], Any] = {}
+        self.empty = self._keep(("route", None), Route(None))
+
+    def _keep(self, key: tuple, node: RouteSeries | RouteSplit | RouteFanOut | Route) -> RouteSeries | RouteSplit | RouteFanOut | Route:
+        """
+        Store node as the canonical node for key.
+
+        Complexity: O(1)
+        """
+        self.nodes[key] = node
+        if isinstance(node, Route):
+            self.canonical.add(id(node))
+        return node
+
+    def computer(self, computer: Computer) -> Computer:
+        """
+        Returns the canonical computer with the same values as computer
+
+        param arg1: a computer
+
+        Complexity: O(1)
+        """
+        key = (computer.name, computer.hacking_difficulty, computer.hacked_value, computer.risk_factor)
+        return self.computers.setdefault(key, computer)
+
+    def route(self, store: RouteStore = None) -> Route:
+        """
+        Returns the canonical route holding store, which must be canonical (or None)
+
+        param arg1: a canonical RouteSeries, RouteSplit or RouteFanOut, or None for the empty route
+
+        Complexity: O(1)
+        """
+        key = ("route", id(store) if store is not None else None)
+        node = self.nodes.get(key)
+        if node is None:
+            node = self._keep(key, Route(store))
+        return node
+
+    def series(self, computer: Computer, following: Route | None = None) -> Route:
+        """
+        Returns the canonical route of computer followed by following
+
+        param arg1: a computer
+        param arg2: a canonical route, defaults to the empty route
+
+        Complexity: O(1)
+        """
+        computer = self.computer(computer)
+        following = self.empty if following is None else following
+        key = ("series", id(computer), id(following))
+        store = self.nodes.get(key)
+        if store is None:
+            store = self._keep(key, RouteSeries(computer, following))
+        return self.route(store)
+
+    def split(self, top: Route | None = None, bottom: Route | None = None, following: Route | None = None) -> Route:
+        """
+        Returns the canonical route of a split between top and bottom, followed by following
+
+        param arg1: a canonical route, defaults to the empty route
+        param arg2: a canonical route, defaults to the empty route
+        param arg3: a canonical route, defaults to the empty route
+
+        Complexity: O(1)
+        """
+        top = self.empty if top is None else top
+        bottom = self.empty if bottom is None else bottom
+        following = self.empty if following is None else following
+        key = ("split", id(top), id(bottom), id(following))
+        store = self.nodes.get(key)
+        if store is None:
+            store = self._keep(key, RouteSplit(top, bottom, following))
+        return self.route(store)
+
+    def fan_out(self, branches: tuple[Route, ...], following: Route | None = None) -> Route:
+        """
+        Returns the canonical route of a fan out into branches, followed by following
+
+        param arg1: canonical routes, at least one
+        param arg2: a canonical route, defaults to the empty route
+
+        Complexity: O(k), where k is the number of branches
+        """
+        following = self.empty if following is None else following
+        key = ("fan out", id(following), *(id(branch) for branch in branches))
+        store = self.nodes.get(key)
+        if store is None:
+            store = self._keep(key, RouteFanOut(tuple(branches), following))
+        return self.route(store)
+
+    def intern(self, route: Route) -> Route:
+        """
+        Returns the canonical route with the same content as route. The route is walked
+        bottom up with an ArrayStack, stopping at sub-routes that are already canonical.
+
+        param arg1: any route
+
+        Complexity: O(1) when route is already canonical, otherwise O(n), where n is the number of
+                    nodes (counting each computer of a run) of route that aren't canonical
+        """
+        if id(route) in self.canonical:
+            return route
+        interned: dict[int, Route] = {}
+        stack = ArrayStack()
+        stack.push((route, None))
+        while not stack.is_empty():
+            node, children = stack.pop()
+            if id(node) in self.canonical:
+                interned[id(node)] = node
+                continue
+            store = node.store
+            if children is None:
+                children = []
+                if isinstance(store, (RouteSeries, RouteRun)):
+                    children = [store.following]
+                elif isinstance(store, RouteSplit):
+                    children = [store.top, store.bottom, store.following]
+                elif isinstance(store, RouteFanOut):
+                    children = [*store.branches, store.following]
+                stack.push((node, children))
+                for child in children:
+                    if id(child) not in interned:
+                        stack.push((child, None))
+                continue
+            if isinstance(store, RouteSeries):
+                interned[id(node)] = self.series(store.computer, interned[id(store.following)])
+            elif isinstance(store, RouteRun):
+                following = interned[id(store.following)]
+                for computer in reversed(store.computers):
+                    following = self.series(computer, following)
+                interned[id(node)] = following
+            elif isinstance(store, RouteSplit):
+                interned[id(node)] = self.split(*(interned[id(child)] for child in children))
+            elif isinstance(store, RouteFanOut):
+                branches = tuple(interned[id(child)] for child in children[:-1])
+                interned[id(node)] = self.fan_out(branches, interned[id(children[-1])])
+            else:
+                interned[id(node)] = self.empty
+        return interned[id(route)]
+
+    def _fold(self, kind: Any, route: Route, value_of) -> Any:
+        """
+        Returns value_of(route, values of its parts) for a canonical route, memoised under kind on
+        every sub-route. The sub-routes are evaluated bottom up with an ArrayStack, and sub-routes
+        already memoised aren't walked again.
+
+        value_of(route, values) gets the values of the following route (for a series), of the
+        top, bottom and following routes (for a split) or of the branches and the following route
+        (for a fan out), and returns the value of route.
+
+        Complexity: O(n * value_of), where n is the number of sub-routes not memoised yet
+        """
+        memo = self.memo
+        stack = ArrayStack()
+        stack.push((route, None))
+        while not stack.is_empty():
+            node, children = stack.pop()
+            if children is not None:
+                memo[(kind, id(node))] = value_of(node, [memo[(kind, id(child))] for child in children])
+                continue
+            if (kind, id(node)) in memo:
+                continue
+            store = node.store
+            if isinstance(store, RouteSeries):
+                children = [store.following]
+            elif isinstance(store, RouteSplit):
+                children = [store.top, store.bottom, store.following]
+            elif isinstance(store, RouteFanOut):
+                children = [*store.branches, store.following]
+            else:
+                children = []
+            stack.push((node, children))
+            for child in children:
+                stack.push((child, None))
+        return memo[(kind, id(route))]
+
+    def computers_on(self, route: Route) -> tuple[Computer, ...]:
+        """
+        Returns every computer on route, in the order of Route.add_all_computers.
+
+        param arg1: any route, interned first
+
+        Complexity: O(n + k), where n is the number of distinct sub-routes not computed yet and k is
+                    the number of computers returned
+        """
+        def value_of(node: Route, values: list[_Computers]) -> _Computers:
+            if isinstance(node.store, RouteSeries):
+                return _Computers((node.store.computer, values[0]))
+            return _Computers(tuple(values))
+
+        return self._fold("computers", self.intern(route), value_of).to_tuple()
+
+    def totals(self, route: Route) -> tuple[int, int, float]:
+        """
+        Returns the number of computers on route, their total hacked value and total risk factor.
+
+        param arg1: any route, interned first
+
+        Complexity: O(n) where n is the number of distinct sub-routes, the first time,
+                    O(1) for a sub-route already computed
+        """
+        def value_of(node: Route, values: list[tuple[int, int, float]]) -> tuple[int, int, float]:
+            count, value, risk = 0, 0, 0.0
+            for child_count, child_value, child_risk in values:
+                count, value, risk = count + child_count, value + child_value, risk + child_risk
+            if isinstance(node.store, RouteSeries):
+                computer = node.store.computer
+                count, value, risk = count + 1, value + computer.hacked_value, risk + computer.risk_factor
+            return count, value, risk
+
+        return self._fold("totals", self.intern(route), value_of)
+
+    def outcome(self, route: Route, virus_type: VirusType) -> tuple[tuple[Computer, ...], bool]:
+        """
+        Returns the computers virus_type collects following route, and whether it stopped, without
+        changing virus_type. Memoised per virus_type.memo_key(), so the branches the virus
+        selects may only depend on the branches it is given and on that key.
+
+        Branches the virus doesn't take are never evaluated, and the route after a split (or fan out)
+        only once the branch taken is known not to stop.
+
+        param arg1: any route, interned first
+        param arg2: a stateless virus, see VirusType.memo_key
+
+        Complexity: O(n + k), where n is the number of distinct sub-routes visited not computed yet
+                    and k is the number of computers returned
+        """
+        kind = ("outcome", virus_type.memo_key())
+        memo = self.memo
+        route = self.intern(route)
+        stack = ArrayStack()
+        stack.push((route, None))
+        while not stack.is_empty():
+            node, children = stack.pop()
+            store = node.store
+            if children is not None:
+                computers, stopped = memo[(kind, id(children[0]))]
+                if isinstance(store, RouteSeries):
+                    computers = _Computers((store.computer, computers))
+                elif not stopped:
+                    if (kind, id(children[1])) not in memo:
+                        # The branch went all the way through, so what follows it is needed after all.
+                        stack.push((node, children))
+                        stack.push((children[1], None))
+                        continue
+                    rest, stopped = memo[(kind, id(children[1]))]
+                    computers = _Computers((computers, rest))
+                memo[(kind, id(node))] = (computers, stopped)
+                continue
+            if (kind, id(node)) in memo:
+                continue
+            if store is None:
+                memo[(kind, id(node))] = (_Computers.EMPTY, False)
+                continue
+            if isinstance(store, RouteSeries):
+                children = [store.following]
+            elif isinstance(store, RouteFanOut):
+                decision = virus_type.select_branch_many(store.branches)
+                if decision == BranchDecision.STOP:
+                    memo[(kind, id(node))] = (_Computers.EMPTY, True)
+                    continue
+                children = [store.branches[decision], store.following]
+            else:
+                decision = virus_type.select_branch(store.top, store.bottom)
+                if decision == BranchDecision.STOP:
+                    memo[(kind, id(node))] = (_Computers.EMPTY, True)
+                    continue
+                chosen = store.top if decision == BranchDecision.TOP else store.bottom
+                children = [chosen, store.following]
+            stack.push((node, children))
+            stack.push((children[0], None))
+        computers, stopped = memo[(kind, id(route))]
+        return computers.to_tuple(), stopped
+
+    def follow_path(self, route: Route, virus_type: VirusType) -> None:
+        """
+        Add the computers a stateless virus_type collects on route to it, as Route.follow_path does,
+        reusing the memoised outcomes of the sub-routes.
+
+        param arg1: any route, interned first
+        param arg2: a stateless virus, see VirusType.memo_key
+
+        Complexity: see outcome
+        """
+        computers, _ = self.outcome(route, virus_type)
+        virus_type.computers.extend(computers)
+
+
+class _Computers:
+    """
+    The computers on a sub-route, in order, as the computers and _Computers of its parts rather
+    than a copy of them, so a sub-route shares the memoised computers of the sub-routes it is
+    made of.
+
+    Attributes:
+        parts: computers, and the _Computers of the parts of the sub-route, in order
+    """
+
+    __slots__ = ("parts",)
+
+    EMPTY: _Computers
+
+    def __init__(self, parts: tuple[Computer | _Computers, ...]) -> None:
+        self.parts = parts
+
+    def to_tuple(self) -> tuple[Computer, ...]:
+        """
+        Returns the computers, laid out in order. The parts are expanded with an ArrayStack, as
+        they nest as deep as the route is long.
+
+        Complexity: O(k + m), where k is the number of computers and m the number of _Computers expanded
+        """
+        computers = []
+        stack = ArrayStack()
+        stack.push(self)
+        while not stack.is_empty():
+            part = stack.pop()
+            if type(part) is _Computers:
+                for i in range(len(part.parts) - 1, -1, -1):
+                    stack.push(part.parts[i])
+            else:
+                computers.append(part)
+        return tuple(computers)
+
+
+_Computers.EMPTY = _Computers(())
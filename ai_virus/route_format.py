@@ -0,0 +1,595 @@
+"""
+This module contains dump and load, which write a route to a binary file object and read it back.
+
+The format is, after the MAGIC bytes:
+
+    the computer table:     the number of computers, then each computer once, however many
+                            times it is on the route: its name (length and UTF-8 bytes), hacking
+                            difficulty and hacked value (zigzag varints) and risk factor (a
+                            little-endian double)
+    the node stream:        every Route of the route in pre-order, each a tag byte then
+        EMPTY               nothing
+        SERIES              the index of its computer in the table, then its following route
+        RUN                 the number of computers and their indexes, then its following route
+        SPLIT               the encoded sizes of its top and bottom routes, then its top, bottom
+                            and following routes
+        FAN_OUT             the number of branches and the encoded size of each, then its branches
+                            and following route
+
+Every number is an unsigned LEB128 varint. The sizes let a reader skip a branch without decoding
+it, and the sizes of large branches are padded to SIZE_WIDTH bytes (see dump). A sub-route shared
+between several places is written at each of them.
+
+Neither function recurses, and both go through the file in blocks of BLOCK_SIZE bytes. Beyond the
+route itself, load uses memory for the nodes still waiting for the routes below them, and dump
+for at most a block of bytes held back until the sizes of the branches being written are known.
+"""
+
+from __future__ import annotations
+import io
+import struct
+from functools import partial
+from typing import BinaryIO
+from computer import Computer
+from data_structures.array_stack import ArrayStack
+from route import LazyRoute, Route, RouteFanOut, RouteRun, RouteSeries, RouteSplit, RouteStore, _children
+from route_builder import collection_paused
+
+__author__ = "Adrian Ong Zhe Yee, Teh Yee Hong"
+
+MAGIC = b"ROUTE\x01"
+BLOCK_SIZE = 1 << 16
+SIZE_WIDTH = 8
+
+EMPTY = 0
+SERIES = 1
+RUN = 2
+SPLIT = 3
+FAN_OUT = 4
+
+DOUBLE = struct.Struct("<d")
+
+
+def _write_varint(buffer: bytearray, value: int) -> None:
+    """
+    Append value to buffer as a varint
+
+    :pre: value >= 0
+
+    Complexity: O(log(value))
+    """
+    while value >= 0x80:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def _zigzag(value: int) -> int:
+    """
+    Returns value mapped to a non-negative int: 0, -1, 1, -2, 2 ... to 0, 1, 2, 3, 4 ...
+
+    Complexity: O(1)
+    """
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def _unzigzag(value: int) -> int:
+    """
+    Returns the int mapped to value by _zigzag
+
+    Complexity: O(1)
+    """
+    return value // 2 if value % 2 == 0 else -(value + 1) // 2
+
+
+def _computer_table(route: Route) -> tuple[dict[int, int], bytearray]:
+    """
+    Returns the index of every computer on route, by id, and the computer table. Equal computers
+    share an index, and only the first of them is in the table. The route is walked with an
+    ArrayStack, and each node of a shared sub-route as many times as it is reached.
+
+    Complexity: O(n), where n is the number of nodes and computers written
+    """
+    indexes: dict[int, int] = {}
+    by_value: dict[tuple, int] = {}
+    records = bytearray()
+    stack = ArrayStack()
+    stack.push(route.store)
+    while not stack.is_empty():
+        store = stack.pop()
+        if store is None:
+            continue
+        if isinstance(store, (RouteSeries, RouteRun)):
+            for computer in (store.computer,) if isinstance(store, RouteSeries) else store.computers:
+                if id(computer) in indexes:
+                    continue
+                key = (computer.name, computer.hacking_difficulty, computer.hacked_value, computer.risk_factor)
+                if key not in by_value:
+                    by_value[key] = len(by_value)
+                    name = computer.name.encode()
+                    _write_varint(records, len(name))
+                    records += name
+                    _write_varint(records, _zigzag(computer.hacking_difficulty))
+                    _write_varint(records, _zigzag(computer.hacked_value))
+                    records += DOUBLE.pack(computer.risk_factor)
+                indexes[id(computer)] = by_value[key]
+            stack.push(store.following.store)
+        elif isinstance(store, RouteSplit):
+            stack.push(store.following.store)
+            stack.push(store.bottom.store)
+            stack.push(store.top.store)
+        else:
+            stack.push(store.following.store)
+            for branch in store.branches:
+                stack.push(branch.store)
+    table = bytearray()
+    _write_varint(table, len(by_value))
+    return indexes, table + records
+
+
+def round_trips(route: Route) -> bool:
+    """
+    Returns whether load gives back route as dump writes it, down to which computers are the same
+    object: every computer is a Computer with the field types the table stores, no two distinct
+    computers are equal, and no sub-route is reached twice. The route is walked with an ArrayStack.
+
+    Complexity: O(n), where n is the number of nodes and computers on route
+    """
+    seen: set[int] = set()
+    by_value: dict[tuple, int] = {}
+    stack = ArrayStack()
+    stack.push(route)
+    while not stack.is_empty():
+        route = stack.pop()
+        if id(route) in seen:
+            return False
+        seen.add(id(route))
+        store = route.store
+        if store is None:
+            continue
+        if isinstance(store, (RouteSeries, RouteRun)):
+            for computer in (store.computer,) if isinstance(store, RouteSeries) else store.computers:
+                if type(computer) is not Computer or type(computer.name) is not str \
+                        or type(computer.hacking_difficulty) is not int or type(computer.hacked_value) is not int \
+                        or type(computer.risk_factor) is not float:
+                    return False
+                key = (computer.name, computer.hacking_difficulty, computer.hacked_value, computer.risk_factor)
+                if by_value.setdefault(key, id(computer)) != id(computer):
+                    return False
+        for child in _children(store):
+            stack.push(child)
+    return True
+
+
+def _write_header(buffer: bytearray, tag: int, sizes: list[int], width: int | None = None) -> None:
+    """
+    Append the header of a split or fan out with the given branch sizes to buffer, each size as a
+    varint padded to width bytes if width is given
+
+    Complexity: O(k), where k is the number of branches
+    """
+    buffer.append(tag)
+    if tag == FAN_OUT:
+        _write_varint(buffer, len(sizes))
+    for size in sizes:
+        if width is None:
+            _write_varint(buffer, size)
+            continue
+        if size >= 1 << (7 * width):
+            raise ValueError(f"A branch of {size} bytes doesn't fit in {width} bytes")
+        for _ in range(width - 1):
+            buffer.append((size & 0x7F) | 0x80)
+            size >>= 7
+        buffer.append(size)
+
+
+def dump(route: Route, file: BinaryIO) -> int:
+    """
+    Write route to file: the computer table, then the nodes in pre-order, walked with an ArrayStack.
+
+    The sizes of the branches of a split or fan out are only known once they are encoded, so the
+    bytes after the split are held back, with a gap for its header, until its last branch is done.
+    Once BLOCK_SIZE bytes are held back, they are written out with a placeholder in each gap, its
+    sizes padded to SIZE_WIDTH bytes, and the placeholder is overwritten in the file when the sizes
+    are known. So only the headers of large branches take the extra bytes, and the memory used is
+    bounded by BLOCK_SIZE, the largest run and the depth of the route. A file that can't seek keeps everything
+    after a gap in memory until the gap is filled.
+
+    param arg1: the route
+    param arg2: a binary file object open for writing
+
+    Returns: the number of bytes written
+
+    Raises: ValueError if a branch is larger than SIZE_WIDTH bytes can give the size of
+
+    Complexity: O(n), where n is the number of nodes and computers written
+    """
+    indexes, table = _computer_table(route)
+    written = file.write(MAGIC) + file.write(table)
+    seekable = file.seekable()
+    stream = file.tell() if seekable else 0    # where the node stream starts in the file
+
+    # Held back: bytes, and a waiting record for each gap.
+    chunks: list[bytearray | bytes | list] = []
+    held = 0        # bytes in chunks
+    current = bytearray()
+    done = 0        # bytes written, held back or in current, without the headers of the records still waiting
+    gaps = 0        # records whose gap is in chunks
+    flushed = 0     # bytes of the node stream written to the file
+    stack = ArrayStack()
+    stack.push(route)
+    while not stack.is_empty():
+        item = stack.pop()
+        if type(item) is list:
+            # [tag, branch boundaries so far, number of branches, index of its gap in chunks,
+            #  offset of its placeholder in the node stream once written, else None]
+            tag, boundaries, count, gap, offset = item
+            boundaries.append(done + len(current))
+            if len(boundaries) <= count:
+                continue
+            sizes = [boundaries[i + 1] - boundaries[i] for i in range(count)]
+            header = bytearray()
+            if offset is None:
+                _write_header(header, tag, sizes)
+                chunks[gap] = header
+                held += len(header)
+                gaps -= 1
+            else:
+                _write_header(header, tag, sizes, SIZE_WIDTH)
+                end = file.tell()
+                file.seek(stream + offset)
+                file.write(header)
+                file.seek(end)
+            done += len(header)
+            if gaps == 0 and chunks:
+                for chunk in chunks:
+                    written += file.write(chunk)
+                flushed += held
+                chunks.clear()
+                held = 0
+            continue
+
+        rest, store = item, item.store
+        full = BLOCK_SIZE if gaps == 0 or seekable else None
+        while isinstance(store, (RouteSeries, RouteRun)):
+            if full is not None and held + len(current) >= full:
+                break
+            if isinstance(store, RouteSeries):
+                current.append(SERIES)
+                _write_varint(current, indexes[id(store.computer)])
+            else:
+                current.append(RUN)
+                _write_varint(current, len(store.computers))
+                for computer in store.computers:
+                    _write_varint(current, indexes[id(computer)])
+            rest = store.following
+            store = rest.store
+        if isinstance(store, (RouteSeries, RouteRun)):
+            # A long series: write out the block, then come back for the rest of it.
+            stack.push(rest)
+        elif store is None:
+            current.append(EMPTY)
+        else:
+            if isinstance(store, RouteSplit):
+                tag, branches = SPLIT, [store.top, store.bottom]
+            else:
+                tag, branches = FAN_OUT, store.branches
+            chunks.append(current)
+            held += len(current)
+            done += len(current)
+            current = bytearray()
+            record = [tag, [], len(branches), len(chunks), None]
+            chunks.append(record)
+            gaps += 1
+            stack.push(store.following)
+            stack.push(record)
+            for i in range(len(branches) - 1, -1, -1):
+                stack.push(branches[i])
+                stack.push(record)
+        if held + len(current) >= BLOCK_SIZE and (gaps == 0 or seekable):
+            for chunk in chunks:
+                if type(chunk) is list:
+                    chunk[4] = flushed
+                    placeholder = bytearray()
+                    _write_header(placeholder, chunk[0], [0] * chunk[2], SIZE_WIDTH)
+                    chunk = placeholder
+                written += file.write(chunk)
+                flushed += len(chunk)
+            written += file.write(current)
+            flushed += len(current)
+            done += len(current)
+            chunks.clear()
+            held = gaps = 0
+            current = bytearray()
+    for chunk in chunks:
+        written += file.write(chunk)
+    written += file.write(current)
+    return written
+
+
+class _Reader:
+    """
+    Reads a binary file object a block at a time.
+    """
+
+    def __init__(self, file: BinaryIO, block_size: int = BLOCK_SIZE) -> None:
+        self.file = file
+        self.block_size = block_size
+        self.block = b""
+        self.position = 0
+        self.before = 0     # bytes in the blocks before this one
+
+    def consumed(self) -> int:
+        """
+        Returns the number of bytes read so far
+
+        Complexity: O(1)
+        """
+        return self.before + self.position
+
+    def _fill(self) -> None:
+        """
+        Read the next block
+
+        Raises: EOFError at the end of the file
+        """
+        self.before += len(self.block)
+        self.block = self.file.read(self.block_size)
+        self.position = 0
+        if not self.block:
+            raise EOFError("The route is cut short")
+
+    def byte(self) -> int:
+        """
+        Returns the next byte
+
+        Complexity: O(1) amortised
+        """
+        if self.position >= len(self.block):
+            self._fill()
+        self.position += 1
+        return self.block[self.position - 1]
+
+    def varint(self) -> int:
+        """
+        Returns the next varint
+
+        Complexity: O(its length)
+        """
+        block, position = self.block, self.position
+        value = shift = 0
+        while position < len(block):
+            byte = block[position]
+            position += 1
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                self.position = position
+                return value
+            shift += 7
+        self.position = position
+        while True:
+            byte = self.byte()
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return value
+            shift += 7
+
+    def bytes(self, count: int) -> bytes:
+        """
+        Returns the next count bytes
+
+        Complexity: O(count)
+        """
+        if self.position + count <= len(self.block):
+            self.position += count
+            return self.block[self.position - count:self.position]
+        data = bytearray()
+        while len(data) < count:
+            if self.position >= len(self.block):
+                self._fill()
+            taken = self.block[self.position:self.position + count - len(data)]
+            self.position += len(taken)
+            data += taken
+        return bytes(data)
+
+
+def load(file: BinaryIO) -> Route:
+    """
+    Returns the route read from file, written there by dump. The nodes are read in pre-order, and
+    every split or fan out, and every chain of series and runs one after the other, waits on an
+    ArrayStack until the routes below it are read. Equal computers are read as one Computer object.
+
+    param arg1: a binary file object open for reading, at the start of the route
+
+    Raises: ValueError if file doesn't start with a route
+            EOFError if the route is cut short
+
+    Complexity: O(n), where n is the number of nodes and computers read
+    """
+    reader = _Reader(file)
+    computers = _read_computer_table(reader)
+
+    # Each waiting node is [tag, payload, the routes below it read so far, the number it has].
+    # A chain is waiting with the tag SERIES and its computers (or tuples of them, for runs) as
+    # payload: the node after a series or run is what follows it, so it joins the chain on top.
+    stack = ArrayStack()
+    with collection_paused():
+        while True:
+            tag = reader.byte()
+            if tag == SERIES or tag == RUN:
+                if tag == SERIES:
+                    item = computers[reader.varint()]
+                else:
+                    item = tuple(computers[reader.varint()] for _ in range(reader.varint()))
+                if not stack.is_empty() and stack.peek()[0] == SERIES:
+                    stack.peek()[1].append(item)
+                else:
+                    stack.push([SERIES, [item], [], 1])
+                continue
+            if tag == SPLIT:
+                reader.varint()
+                reader.varint()
+                stack.push([tag, None, [], 3])
+                continue
+            if tag == FAN_OUT:
+                count = reader.varint()
+                for _ in range(count):
+                    reader.varint()
+                stack.push([tag, None, [], count + 1])
+                continue
+            if tag != EMPTY:
+                raise ValueError(f"Unknown node tag {tag}")
+            route = Route(None)
+            while not stack.is_empty():
+                node = stack.peek()
+                node[2].append(route)
+                if len(node[2]) < node[3]:
+                    break
+                stack.pop()
+                route = _make(*node[:3])
+            if stack.is_empty():
+                return route
+
+
+def _read_computer_table(reader: _Reader) -> list[Computer]:
+    """
+    Returns the computers of the table, after checking the MAGIC bytes before it
+
+    Raises: ValueError if the file doesn't start with a route
+
+    Complexity: O(c), where c is the size of the table
+    """
+    if reader.bytes(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a route")
+    computers = []
+    with collection_paused():
+        for _ in range(reader.varint()):
+            name = reader.bytes(reader.varint()).decode()
+            difficulty = _unzigzag(reader.varint())
+            value = _unzigzag(reader.varint())
+            risk, = DOUBLE.unpack(reader.bytes(DOUBLE.size))
+            computers.append(Computer(name, difficulty, value, risk))
+    return computers
+
+
+def _make(tag: int, payload, children: list[Route]) -> Route:
+    """
+    Returns the route of the node tagged tag, with payload (for a chain, its computers and runs)
+    and the routes below it
+
+    Complexity: O(k), where k is the number of series and runs of a chain or branches of a fan out
+    """
+    if tag == SERIES:
+        route = children[0]
+        for i in range(len(payload) - 1, -1, -1):
+            item = payload[i]
+            route = Route(RouteRun(item, route) if type(item) is tuple else RouteSeries(item, route))
+        return route
+    if tag == SPLIT:
+        return Route(RouteSplit(*children))
+    return Route(RouteFanOut(tuple(children[:-1]), children[-1]))
+
+
+def dumps(route: Route) -> bytes:
+    """
+    Returns route encoded as dump writes it
+
+    Complexity: O(n), see dump
+    """
+    file = io.BytesIO()
+    dump(route, file)
+    return file.getvalue()
+
+
+def loads(data: bytes) -> Route:
+    """
+    Returns the route encoded in data by dumps
+
+    Complexity: O(n), see load
+    """
+    return load(io.BytesIO(data))
+
+
+class RouteFile:
+    """
+    A route written by dump, read a node at a time as it is followed rather than all at once.
+
+    root() is a LazyRoute, whose store is read from the file the first time it is asked for: a
+    series, run, split or fan out whose routes are LazyRoute in turn, at the offsets the encoded
+    sizes give. A virus following the route therefore only reads the nodes it goes through, and
+    the first node of each branch it is asked to choose between, which is all that the viruses of
+    virus.py look at.
+
+    The computer table is read when the RouteFile is made. The file must stay open, and not be
+    read or written by anything else, while the route is in use.
+
+    Attributes:
+        file: a seekable binary file object, open for reading
+        computers: the computer table
+        start: the offset of the node stream in file
+    """
+
+    NODE_BLOCK_SIZE = 64
+
+    def __init__(self, file: BinaryIO) -> None:
+        """
+        param arg1: a seekable binary file object open for reading, at the start of the route
+
+        Raises: ValueError if file doesn't start with a route
+        """
+        self.file = file
+        offset = file.tell()
+        reader = _Reader(file)
+        self.computers = _read_computer_table(reader)
+        self.start = offset + reader.consumed()
+
+    def root(self) -> LazyRoute:
+        """
+        Returns the route, none of which has been read yet
+
+        Complexity: O(1)
+        """
+        return self.route_at(self.start)
+
+    def route_at(self, offset: int) -> LazyRoute:
+        """
+        Returns the route whose node starts at offset, read when its store is first asked for
+
+        Complexity: O(1)
+        """
+        return LazyRoute(partial(self._store_at, offset))
+
+    def _store_at(self, offset: int) -> RouteStore:
+        """
+        Returns the store of the node at offset, with a LazyRoute for each route below it
+
+        Raises: ValueError if there is no node at offset
+
+        Complexity: O(k), where k is the number of computers of a run or branches of a fan out
+        """
+        self.file.seek(offset)
+        reader = _Reader(self.file, self.NODE_BLOCK_SIZE)
+        tag = reader.byte()
+        if tag == EMPTY:
+            return None
+        if tag == SERIES:
+            computer = self.computers[reader.varint()]
+            return RouteSeries(computer, self.route_at(offset + reader.consumed()))
+        if tag == RUN:
+            run = tuple(self.computers[reader.varint()] for _ in range(reader.varint()))
+            return RouteRun(run, self.route_at(offset + reader.consumed()))
+        if tag == SPLIT:
+            sizes = [reader.varint(), reader.varint()]
+        elif tag == FAN_OUT:
+            sizes = [reader.varint() for _ in range(reader.varint())]
+        else:
+            raise ValueError(f"Unknown node tag {tag}")
+        routes = []
+        position = offset + reader.consumed()
+        for size in sizes:
+            routes.append(self.route_at(position))
+            position += size
+        following = self.route_at(position)
+        if tag == SPLIT:
+            return RouteSplit(routes[0], routes[1], following)
+        return RouteFanOut(tuple(routes), following)
@@ -0,0 +1,325 @@
+"""
+This module contains opt-in instrumentation for LinearProbeTable, DoubleKeyTable and InfiniteHashTable.
+
+Instrumentation is switched on per table by swapping the table's class for a subclass that
+records statistics, and switched off by swapping it back, so a table that isn't being measured
+runs exactly the same code as before, with no checks in its probe loops:
+
+    enable_stats(table)
+    ...
+    export_stats(table)   # a dict for the metrics pipeline
+    disable_stats(table)
+"""
+
+from __future__ import annotations
+import time
+from typing import Any
+
+from data_structures.hash_table import LinearProbeTable
+from data_structures.typed_array import ArrayT
+from double_key_table import DoubleKeyTable
+from infinite_hash_table import InfiniteHashTable
+
+__author__ = "Adrian Ong Zhe Yee, Teh Yee Hong"
+
+
+class TableStats:
+    """
+    Statistics gathered by an instrumented table.
+
+    Probe lengths and depths are counted in histograms of HISTOGRAM_SIZE bins, where the last
+    bin also counts everything longer.
+    """
+
+    HISTOGRAM_SIZE = 64
+
+    def __init__(self) -> None:
+        self.hit_probes = ArrayT('q', self.HISTOGRAM_SIZE)
+        self.miss_probes = ArrayT('q', self.HISTOGRAM_SIZE)
+        self.sub_hit_probes = ArrayT('q', self.HISTOGRAM_SIZE)
+        self.sub_miss_probes = ArrayT('q', self.HISTOGRAM_SIZE)
+        self.rehashes = 0
+        self.sub_rehashes = 0
+        self.rehash_seconds: list[float] = []
+        self.load_factors: list[tuple[float, float]] = []
+        self.rehashing = False
+
+    def record(self, histogram: ArrayT, length: int) -> None:
+        """
+        Count one probe sequence (or lookup depth) of the given length.
+
+        Complexity: O(1)
+        """
+        histogram[min(length, self.HISTOGRAM_SIZE - 1)] += 1
+
+    def record_load_factor(self, table: LinearProbeTable | DoubleKeyTable) -> None:
+        """
+        Record the current load factor of table with the time it was taken.
+
+        Complexity: O(1)
+        """
+        self.load_factors.append((time.time(), len(table) / table.table_size))
+
+    def as_dict(self) -> dict[str, Any]:
+        """
+        Returns the statistics as plain dicts, lists and numbers. Histograms only have their
+        non-zero bins, keyed by length.
+
+        Complexity: O(HISTOGRAM_SIZE + number of rehashes)
+        """
+        def histogram(counts: ArrayT) -> dict[int, int]:
+            return {length: count for length, count in enumerate(counts) if count}
+
+        return {
+            "hit_probes": histogram(self.hit_probes),
+            "miss_probes": histogram(self.miss_probes),
+            "sub_hit_probes": histogram(self.sub_hit_probes),
+            "sub_miss_probes": histogram(self.sub_miss_probes),
+            "rehashes": self.rehashes,
+            "sub_rehashes": self.sub_rehashes,
+            "rehash_seconds": list(self.rehash_seconds),
+            "load_factors": list(self.load_factors),
+        }
+
+
+def _probe_length(array, start: int, position: int) -> int:
+    """
+    The number of slots looked at by a probe from start that stopped at position.
+
+    Complexity: O(1)
+    """
+    return (position - start) % len(array) + 1
+
+
+def _miss_length(array, start: int) -> int:
+    """
+    The number of slots looked at by a probe from start that ran until an empty slot.
+
+    Complexity: O(N) where N is the length of the probe chain
+    """
+    length = 1
+    position = start
+    while array[position] is not None and length < len(array):
+        position = (position + 1) % len(array)
+        length += 1
+    return length
+
+
+class LinearProbeTableStats:
+    """
+    The methods of an instrumented LinearProbeTable, recording probe lengths, rehashes and load factors.
+    """
+
+    def _linear_probe(self, key, is_insert: bool) -> int:
+        try:
+            position = self.uninstrumented._linear_probe(self, key, is_insert)
+        except KeyError:
+            if not self.stats.rehashing:
+                self.stats.record(self.stats.miss_probes, _miss_length(self.array, self.hash(key)))
+            raise
+        if not self.stats.rehashing:
+            hit = self.array[position] is not None
+            histogram = self.stats.hit_probes if hit else self.stats.miss_probes
+            self.stats.record(histogram, _probe_length(self.array, self.hash(key), position))
+        return position
+
+    def _rehash(self) -> None:
+        self.stats.record_load_factor(self)
+        self.stats.rehashing = True
+        start = time.perf_counter()
+        try:
+            self.uninstrumented._rehash(self)
+        finally:
+            self.stats.rehashing = False
+        self.stats.rehash_seconds.append(time.perf_counter() - start)
+        self.stats.rehashes += 1
+        self.stats.record_load_factor(self)
+
+
+class DoubleKeyTableStats:
+    """
+    The methods of an instrumented DoubleKeyTable, recording top-level and sub-table probe lengths,
+    rehashes of both levels and top-level load factors.
+    """
+
+    def _linear_probe(self, key1, key2, is_insert: bool):
+        try:
+            result = self.uninstrumented._linear_probe(self, key1, key2, is_insert)
+        except KeyError:
+            if not self.stats.rehashing:
+                self._record_miss(key1, key2)
+            raise
+        if self.stats.rehashing:
+            return result
+        position1 = result[0] if isinstance(result, tuple) else result
+        # An insert of a new key1 has already stored it, with an empty sub-table: a key1 is only kept
+        # while its sub-table holds a key2, so an empty one means the slot was empty before the probe.
+        new_key1 = is_insert and self.array[position1][1].is_empty()
+        histogram = self.stats.miss_probes if new_key1 else self.stats.hit_probes
+        self.stats.record(histogram, _probe_length(self.array, self.hash1(key1), position1))
+        if isinstance(result, tuple):
+            sub_table = self.array[position1][1]
+            hit = sub_table.array[result[1]] is not None
+            histogram = self.stats.sub_hit_probes if hit else self.stats.sub_miss_probes
+            self.stats.record(histogram, _probe_length(sub_table.array, self.hash2(key2, sub_table), result[1]))
+        return result
+
+    def _record_miss(self, key1, key2) -> None:
+        """
+        Work out which level a failed lookup missed at, and record its probe length.
+
+        Complexity: O(N + M), the lengths of the two probe chains
+        """
+        start = self.hash1(key1)
+        position = start
+        for _ in range(self.table_size):
+            item = self.array[position]
+            if item is None:
+                self.stats.record(self.stats.miss_probes, _probe_length(self.array, start, position))
+                return
+            if item[0] == key1:
+                break
+            position = (position + 1) % self.table_size
+        self.stats.record(self.stats.hit_probes, _probe_length(self.array, start, position))
+        sub_table = self.array[position][1]
+        self.stats.record(self.stats.sub_miss_probes, _miss_length(sub_table.array, self.hash2(key2, sub_table)))
+
+    def _sub_table_size(self, key1) -> int:
+        """
+        The size index of key1's sub-table, 0 if it doesn't have one yet. Probes without recording.
+
+        Complexity: see DoubleKeyTable._linear_probe
+        """
+        try:
+            return self.array[self.uninstrumented._linear_probe(self, key1, None, False)][1].size_index
+        except KeyError:
+            return 0
+
+    def __setitem__(self, key, data) -> None:
+        # The top-level rehash is timed by _rehash, a sub-table's happens inside its own __setitem__.
+        sub_size = self._sub_table_size(key[0])
+        start = time.perf_counter()
+        self.uninstrumented.__setitem__(self, key, data)
+        if self._sub_table_size(key[0]) != sub_size:
+            self.stats.sub_rehashes += 1
+            self.stats.rehash_seconds.append(time.perf_counter() - start)
+
+    def _rehash(self) -> None:
+        self.stats.record_load_factor(self)
+        self.stats.rehashing = True
+        start = time.perf_counter()
+        try:
+            self.uninstrumented._rehash(self)
+        finally:
+            self.stats.rehashing = False
+        self.stats.rehash_seconds.append(time.perf_counter() - start)
+        self.stats.rehashes += 1
+        self.stats.record_load_factor(self)
+
+
+class InfiniteHashTableStats:
+    """
+    The methods of an instrumented InfiniteHashTable, recording the depth of every successful lookup
+    (in hit_probes) and the number of failed ones (in miss_probes, at depth 0).
+    """
+
+    def __getitem__(self, key):
+        try:
+            value, depth = self.uninstrumented._lookup(self, key)
+        except KeyError:
+            self.stats.record(self.stats.miss_probes, 0)
+            raise
+        self.stats.record(self.stats.hit_probes, depth)
+        return value
+
+
+STATS_METHODS = [
+    (InfiniteHashTable, InfiniteHashTableStats),
+    (DoubleKeyTable, DoubleKeyTableStats),
+    (LinearProbeTable, LinearProbeTableStats),
+]
+
+
+def enable_stats(table: LinearProbeTable | DoubleKeyTable | InfiniteHashTable) -> TableStats:
+    """
+    Start recording statistics for table, by swapping its class for an instrumented subclass.
+    Enabling an already instrumented table keeps its statistics.
+
+    The subclass gets its methods copied from the matching *Stats class, rather than inheriting
+    them, so it has exactly the memory layout of the table's class (with or without __slots__),
+    which is what allows the swap.
+
+    param arg1: the table to instrument
+
+    Returns: the table's TableStats
+
+    :raises TypeError: when table is not one of the supported tables
+
+    Complexity: O(1)
+    """
+    stats = getattr(type(table), "stats", None)
+    if stats is not None:
+        return stats
+    for table_type, methods in STATS_METHODS:
+        if isinstance(table, table_type):
+            base = type(table)
+            namespace = {name: value for name, value in vars(methods).items() if callable(value)}
+            namespace.update({"__slots__": (), "stats": TableStats(), "uninstrumented": base})
+            table.__class__ = type("Instrumented" + base.__name__, (base,), namespace)
+            return table.stats
+    raise TypeError(f"Cannot record statistics for {type(table).__name__}")
+
+
+def disable_stats(table: LinearProbeTable | DoubleKeyTable | InfiniteHashTable) -> TableStats | None:
+    """
+    Stop recording statistics for table, swapping its original class back.
+
+    param arg1: the table
+
+    Returns: the statistics recorded, None if the table wasn't instrumented
+
+    Complexity: O(1)
+    """
+    stats = getattr(type(table), "stats", None)
+    if stats is not None:
+        table.__class__ = type(table).uninstrumented
+    return stats
+
+
+def export_stats(table: LinearProbeTable | DoubleKeyTable | InfiniteHashTable) -> dict[str, Any]:
+    """
+    Returns the recorded statistics of table (empty ones if it isn't instrumented) together with
+    its current shape, as a dict of plain values:
+        - LinearProbeTable and DoubleKeyTable: "size", "table_size" and "load_factor"
+        - DoubleKeyTable: "sub_table_occupancy", a list of (key1, entries, table size)
+        - InfiniteHashTable: "size" and "depths", a histogram of the depth of every key
+
+    param arg1: the table
+
+    Complexity: O(N) where N is the total size of the table's arrays
+    """
+    stats = getattr(type(table), "stats", None) or TableStats()
+    result = stats.as_dict()
+    if isinstance(table, InfiniteHashTable):
+        depths = ArrayT('q', TableStats.HISTOGRAM_SIZE)
+        stack = [(table, 1)]
+        while stack:
+            node, depth = stack.pop()
+            for item in node.array:
+                if isinstance(item, InfiniteHashTable):
+                    stack.append((item, depth + 1 + len(item.skip)))
+                elif item is not None:
+                    depths[min(depth, TableStats.HISTOGRAM_SIZE - 1)] += len(item) if type(item) is list else 1
+        result["size"] = len(table)
+        result["depths"] = {depth: count for depth, count in enumerate(depths) if count}
+        return result
+
+    result["size"] = len(table)
+    result["table_size"] = table.table_size
+    result["load_factor"] = len(table) / table.table_size
+    if isinstance(table, DoubleKeyTable):
+        result["sub_table_occupancy"] = [
+            (key1, len(sub_table.keys()), sub_table.table_size)
+            for key1, sub_table in (item for item in table.array if item is not None)
+        ]
+    return result
@@ -103,3 +103,75 @@ class TestComputerManager(unittest.TestCase):
         self.assertEqual(len(res), 4)
 
         self.assertEqual(self.make_set(res[3]), self.make_set([c8]))
+
+    @number("6.3")
+    def test_unusual_difficulties(self):
+        c1 = Computer("c1", 12, 4, 0.1)
+        c2 = Computer("c2", -1, 2, 0.2)
+        c3 = Computer("c3", 3, 5, 0.3)
+        c4 = Computer("c4", 12, 3, 0.4)
+        c5 = Computer("c5", 100, 3, 0.5)
+
+        cm = ComputerManager()
+        for c in [c1, c2, c3, c4, c5]:
+            cm.add_computer(c)
+
+        self.assertEqual(self.make_set(cm.computers_with_difficulty(12)), self.make_set([c1, c4]))
+        self.assertEqual(self.make_set(cm.computers_with_difficulty(50)), self.make_set([]))
+        res = cm.group_by_difficulty()
+        self.assertEqual([self.make_set(group) for group in res],
+                         [self.make_set(group) for group in [[c2], [c3], [c1, c4], [c5]]])
+
+        c6 = Computer("c3", 12, 5, 0.3)
+        cm.edit_computer(c3, c6)
+        self.assertEqual(self.make_set(cm.computers_with_difficulty(3)), self.make_set([]))
+        self.assertEqual(self.make_set(cm.computers_with_difficulty(12)), self.make_set([c1, c4, c6]))
+        self.assertRaises(KeyError, lambda: cm.remove_computer(c3))
+
+        # Difficulties that aren't numbers are kept too, and listed after the others.
+        c7 = Computer("c7", "hard", 1, 0.1)
+        c8 = Computer("c8", "easy", 1, 0.1)
+        for c in [c7, c8]:
+            cm.add_computer(c)
+        self.assertEqual([difficulty for difficulty, _ in cm.iter_group_by_difficulty()], ["-1", "12", "100", "easy", "hard"])
+        self.assertEqual(self.make_set(cm.computers_with_difficulty("hard")), self.make_set([c7]))
+
+        c9 = Computer("c9", True, 1, 0.1)
+        cm.add_computer(c9)
+        self.assertIsNone(cm.by_difficulty[1])
+        self.assertEqual(self.make_set(cm.computers_with_difficulty(True)), self.make_set([c9]))
+        self.assertEqual(self.make_set(cm.computers_with_difficulty(1)), self.make_set([]))
+
+        # Fallback difficulties that are numbers go between the direct ones, by their exact value.
+        cm = ComputerManager()
+        for difficulty in [2 ** 60 + 1, 12, 2 ** 60, 3.5, "02", 9, 2, -0.5, "hard", 2.0]:
+            cm.add_computer(Computer(f"c{difficulty}", difficulty, 1, 0.1))
+        self.assertEqual([difficulty for difficulty, _ in cm.iter_group_by_difficulty()],
+                         ["-0.5", 2, "02", "2.0", "3.5", 9, "12", str(2 ** 60), str(2 ** 60 + 1), "hard"])
+
+    @number("6.4")
+    def test_streaming(self):
+        computers = [Computer(f"c{i}", i % 4 * 3, i, 0.1) for i in range(20)]
+        cm = ComputerManager()
+        for c in computers:
+            cm.add_computer(c)
+
+        items = list(cm.iter_items())
+        self.assertEqual([difficulty for difficulty, _ in items], sorted(c.hacking_difficulty for c in computers))
+        self.assertEqual(self.make_set(c for _, c in items), self.make_set(computers))
+
+        groups = [(difficulty, self.make_set(group)) for difficulty, group in cm.iter_group_by_difficulty()]
+        self.assertEqual(groups, [(d, self.make_set(computers[i::4])) for i, d in enumerate([0, 3, 6, 9])])
+
+        batches = list(cm.iter_batches(6))
+        self.assertEqual([len(batch) for batch in batches], [6, 6, 6, 2])
+        self.assertEqual(self.make_set(c for batch in batches for c in batch), self.make_set(computers))
+
+        # Inserting while streaming a snapshot, enough to rehash every table, yields each original computer once.
+        seen = []
+        for i, (_, computer) in enumerate(cm.iter_items(snapshot=True)):
+            seen.append(computer)
+            for j in range(10):
+                cm.add_computer(Computer(f"new{i}-{j}", j % 4 * 3, 0, 0.1))
+        self.assertTrue(set(map(id, computers)) <= set(map(id, seen)))
+        self.assertEqual(len(seen), len(set(map(id, seen))))
@@ -1,7 +1,15 @@
+import gc
 import unittest
+import weakref
 from ed_utils.decorators import number
 
+from data_structures.hash_table import LinearProbeTable
 from double_key_table import DoubleKeyTable
+from flat_double_key_table import FlatDoubleKeyTable
+from table_stats import enable_stats, disable_stats, export_stats
+from data_structures.referential_array import ArrayR
+from data_structures.typed_array import ArrayT
+from data_structures.hash_functions import HashFunction, BuiltinHash, FNV1aHash, KeyedHash
 
 
 class TestDoubleHash(unittest.TestCase):
@@ -136,3 +144,279 @@ class TestDoubleHash(unittest.TestCase):
         # with an iterator.
         self.assertRaises(BaseException, lambda: next(key_iterator))
         self.assertRaises(BaseException, lambda: next(value_iterator))
+
+    @number("3.6")
+    def test_iter_items(self):
+        dt = DoubleKeyTable()
+        dt["May", "Jim"] = 1
+        dt["Kim", "Tim"] = 2
+        dt["May", "Ben"] = 3
+
+        self.assertEqual(set(dt.iter_items()), {(("May", "Jim"), 1), (("Kim", "Tim"), 2), (("May", "Ben"), 3)})
+        self.assertEqual(set(dt.iter_items("May")), {(("May", "Jim"), 1), (("May", "Ben"), 3)})
+        self.assertEqual(list(dt.iter_items("Amy")), [])
+
+        seen = []
+        for i, (keys, value) in enumerate(dt.iter_items(snapshot=True)):
+            seen.append(keys)
+            for j in range(20):
+                dt[f"New{i}", f"K{j}"] = j
+        # Entries inserted meanwhile may or may not be seen, but the original ones are seen exactly once.
+        self.assertTrue({("Kim", "Tim"), ("May", "Ben"), ("May", "Jim")} <= set(seen))
+        self.assertEqual(len(seen), len(set(seen)))
+
+    @number("3.7")
+    def test_stats(self):
+        dt = DoubleKeyTable(sizes=[5, 13], internal_sizes=[5, 13])
+        stats = enable_stats(dt)
+        self.assertIsInstance(dt, DoubleKeyTable)
+        for i in range(4):
+            dt["May", f"K{i}"] = i
+        dt["Kim", "Tim"] = 5
+        self.assertEqual(dt["May", "K2"], 2)
+        self.assertRaises(KeyError, lambda: dt["Amy", "Tim"])
+
+        exported = export_stats(dt)
+        self.assertEqual(exported["rehashes"], 0)
+        self.assertEqual(exported["sub_rehashes"], 1)
+        # Inserting "May" and "Kim" misses at the top level, as does looking up "Amy".
+        self.assertEqual(sum(exported["miss_probes"].values()), 3)
+        self.assertEqual(sum(exported["hit_probes"].values()), 4)
+        self.assertEqual(sum(exported["sub_miss_probes"].values()), 5)
+        self.assertEqual(sorted(exported["sub_table_occupancy"]), [("Kim", 1, 5), ("May", 4, 13)])
+        self.assertEqual(exported["load_factor"], 2 / 5)
+
+        dt["Ben", "Tim"] = 6
+        self.assertEqual(stats.rehashes, 1)
+        self.assertEqual(len(stats.load_factors), 2)
+
+        self.assertIs(disable_stats(dt), stats)
+        self.assertIs(type(dt), DoubleKeyTable)
+        dt["Amy", "Tim"] = 7
+        self.assertEqual(stats.rehashes, 1)
+        self.assertEqual(dt["Amy", "Tim"], 7)
+
+    @number("3.8")
+    def test_hash_functions(self):
+        self.assertEqual(FNV1aHash()("a"), 0xaf63dc4c8601ec8c)
+        self.assertEqual(KeyedHash(b"k")("May"), KeyedHash(b"k")("May"))
+        self.assertNotEqual(KeyedHash(b"k")("May"), KeyedHash(b"j")("May"))
+
+        for hash_function in [BuiltinHash(), FNV1aHash(), KeyedHash()]:
+            dt = DoubleKeyTable(sizes=[5, 13, 29], internal_sizes=[5, 13, 29], hash_function=hash_function)
+            for i in range(10):
+                dt[f"Top{i}", f"Low{i}"] = i
+                dt["May", f"Low{i}"] = -i
+            self.assertEqual(dt.hash1("May"), hash_function("May") % dt.table_size)
+            self.assertEqual(len(dt), 11)
+            self.assertEqual(sorted(dt.values("May")), list(range(-9, 1)))
+            for i in range(10):
+                self.assertEqual(dt[f"Top{i}", f"Low{i}"], i)
+
+    @number("3.9")
+    def test_reseed_when_degraded(self):
+        class Constant(HashFunction):
+            def __call__(self, key):
+                return 0
+
+        dt = DoubleKeyTable(hash_function=Constant())
+        for i in range(100):
+            dt[f"Top{i}", "Low"] = i
+            dt["May", f"Low{i}"] = -i
+        self.assertIsInstance(dt.hash_function, KeyedHash)
+        self.assertIsInstance(dt.array[dt._linear_probe("May", None, False)][1].hash_function, KeyedHash)
+        self.assertEqual(len(dt), 101)
+        for i in range(100):
+            self.assertEqual(dt[f"Top{i}", "Low"], i)
+            self.assertEqual(dt["May", f"Low{i}"], -i)
+
+        # Tables that never degrade keep their hash.
+        fnv = FNV1aHash()
+        dt = DoubleKeyTable(hash_function=fnv)
+        for i in range(100):
+            dt[f"Top{i}", "Low"] = i
+        self.assertIs(dt.hash_function, fnv)
+
+    @number("3.10")
+    def test_flat_layout(self):
+        nested, flat = DoubleKeyTable(), FlatDoubleKeyTable()
+        for dt in [nested, flat]:
+            for i in range(40):
+                dt[f"Top{i % 7}", f"Low{i}"] = i
+            dt["May", "Jim"] = 1
+            dt["May", "Jim"] = 2
+            del dt["Top0", "Low0"]
+            del dt["Top1", "Low1"]
+
+        self.assertEqual(len(flat), len(nested))
+        self.assertEqual(set(flat.keys()), set(nested.keys()))
+        self.assertEqual(set(flat.iter_keys()), set(nested.iter_keys()))
+        self.assertEqual(sorted(flat.values()), sorted(nested.values()))
+        self.assertEqual(set(flat.iter_items()), set(nested.iter_items()))
+        for key1 in nested.keys():
+            self.assertEqual(set(flat.keys(key1)), set(nested.keys(key1)))
+            self.assertEqual(set(flat.iter_keys(key1)), set(nested.iter_keys(key1)))
+            self.assertEqual(sorted(flat.values(key1)), sorted(nested.values(key1)))
+            self.assertEqual(sorted(flat.iter_values(key1)), sorted(nested.iter_values(key1)))
+        self.assertEqual(flat["May", "Jim"], 2)
+        lines = str(flat).splitlines()
+        self.assertIn("(May,Jim) -> 2", lines)
+        self.assertEqual(sorted(lines), sorted(f"({key1},{key2}) -> {value}" for (key1, key2), value in nested.iter_items()))
+        self.assertNotIn(("Top0", "Low0"), flat)
+        self.assertRaises(KeyError, lambda: flat["Top0", "Low0"])
+        self.assertRaises(KeyError, lambda: flat.keys("Amy"))
+        self.assertEqual(list(flat.iter_items("Amy")), [])
+
+        # A top-level key goes with its last entry.
+        del flat["May", "Jim"]
+        self.assertNotIn("May", flat.keys())
+        self.assertEqual(len(flat), 7)
+
+        seen = []
+        for i, (keys, value) in enumerate(flat.iter_items(snapshot=True)):
+            seen.append(keys)
+            for j in range(20):
+                flat[f"New{i}", f"K{j}"] = j
+        self.assertTrue(set(nested.iter_items()) - {(("May", "Jim"), 2)} <= set(flat.iter_items()))
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertTrue({keys for keys, _ in nested.iter_items()} - {("May", "Jim")} <= set(seen))
+
+    @number("3.11")
+    def test_referential_array_bulk(self):
+        self.assertRaises(ValueError, lambda: ArrayR.from_list([]))
+        array = ArrayR.from_list(range(10))
+        self.assertEqual(len(array), 10)
+        self.assertEqual(list(array), list(range(10)))
+
+        # Slices behave like list slices, clipped to the array.
+        self.assertEqual(array[:], list(range(10)))
+        self.assertEqual(array[2:5], [2, 3, 4])
+        self.assertEqual(array[5:2], [])
+        self.assertEqual(array[-3:], [7, 8, 9])
+        self.assertEqual(array[8:100], [8, 9])
+        self.assertEqual(array[::3], [0, 3, 6, 9])
+        self.assertEqual(array[::-4], [9, 5, 1])
+        self.assertRaises(IndexError, lambda: array[10])
+
+        array[1:4] = ["a", "b", "c"]
+        self.assertEqual(array[:5], [0, "a", "b", "c", 4])
+        with self.assertRaises(ValueError):
+            array[1:4] = ["a"]
+
+        # Iteration sees the array as it was when it started.
+        seen = []
+        for item in array:
+            array[9] = "changed"
+            seen.append(item)
+        self.assertEqual(seen[9], 9)
+
+        array.fill(None)
+        self.assertEqual(array[:], [None] * 10)
+        array.fill(7)
+        self.assertEqual(array[:], [7] * 10)
+
+        # copy_from copies the whole source, which may be shorter than the array or overlap it.
+        array = ArrayR.from_list(range(6))
+        array.copy_from([10, 11])
+        self.assertEqual(array[:], [10, 11, 2, 3, 4, 5])
+        array.copy_from(array[0:4], 2)
+        self.assertEqual(array[:], [10, 11, 10, 11, 2, 3])
+        array.copy_from(ArrayR.from_list(["x", "y"]), 4)
+        self.assertEqual(array[:], [10, 11, 10, 11, "x", "y"])
+        array.copy_from([])
+        self.assertRaises(IndexError, lambda: array.copy_from([1, 2], 5))
+        self.assertRaises(IndexError, lambda: array.copy_from([1], -1))
+        self.assertEqual(array[:], [10, 11, 10, 11, "x", "y"])
+
+        # Emptying a position, however it is done, lets go of what was there.
+        class Value:
+            pass
+
+        for empty in (lambda a: a.__setitem__(0, None), lambda a: a.__setitem__(-2, None),
+                      lambda a: a.__setitem__(slice(0, 2), [None, None]), lambda a: a.fill(None),
+                      lambda a: a.copy_from([None])):
+            value = Value()
+            held = weakref.ref(value)
+            array = ArrayR.from_list([value, None])
+            empty(array)
+            del value
+            gc.collect()
+            self.assertIsNone(held())
+
+    @number("3.12")
+    def test_typed_array(self):
+        # New arrays are zeros of their type code, which must be one of the array module's.
+        self.assertEqual(ArrayT("q", 3)[:], [0, 0, 0])
+        self.assertEqual(ArrayT("d", 2)[:], [0.0, 0.0])
+        self.assertEqual(ArrayT("b", 2).dtype, "b")
+        self.assertRaises(ValueError, lambda: ArrayT("z", 3))
+        self.assertRaises(ValueError, lambda: ArrayT("q", 0))
+        self.assertRaises(ValueError, lambda: ArrayT.from_list("q", []))
+
+        small = ArrayT("b", 2)
+        self.assertRaises(OverflowError, small.__setitem__, 0, 128)
+        self.assertRaises(TypeError, small.__setitem__, 0, 1.5)
+        self.assertRaises(OverflowError, small.fill, -129)
+        small[1] = -128
+        self.assertEqual(small[:], [0, -128])
+
+        # Bounds and slices.
+        array = ArrayT.from_list("q", range(8))
+        self.assertEqual(len(array), 8)
+        self.assertEqual(array[-1], 7)
+        self.assertRaises(IndexError, lambda: array[8])
+        self.assertRaises(IndexError, array.__setitem__, -9, 0)
+        self.assertEqual(array[2:5], [2, 3, 4])
+        self.assertEqual(array[6:100], [6, 7])
+        self.assertEqual(array[5:2], [])
+        self.assertEqual(array[::-3], [7, 4, 1])
+        array[0:3] = [10, 11, 12]
+        self.assertEqual(list(array), [10, 11, 12, 3, 4, 5, 6, 7])
+        self.assertRaises(ValueError, array.__setitem__, slice(0, 3), [1])
+        self.assertRaises(OverflowError, ArrayT("B", 2).__setitem__, slice(0, 2), [1, 256])
+
+        # Bulk operations.
+        array.fill(-1)
+        self.assertEqual(array[:], [-1] * 8)
+        array.copy_from(range(3))
+        self.assertEqual(array[:4], [0, 1, 2, -1])
+        array.copy_from(array[0:3], 1)
+        self.assertEqual(array[:5], [0, 0, 1, 2, -1])
+        array.copy_from(ArrayT.from_list("q", [5, 6]), 6)
+        self.assertEqual(array[5:], [-1, 5, 6])
+        self.assertRaises(IndexError, lambda: array.copy_from([1, 2], 7))
+        self.assertRaises(IndexError, lambda: array.copy_from([1], -1))
+        floats = ArrayT("d", 3)
+        floats.copy_from(ArrayT.from_list("q", [1, 2]))
+        self.assertEqual(floats[:], [1.0, 2.0, 0.0])
+
+        # The view shares the numbers without copying them.
+        view = array.view()
+        self.assertEqual((view.format, view.nbytes), ("q", 8 * array.array.itemsize))
+        view[0] = 42
+        self.assertEqual(array[0], 42)
+        view.release()
+
+
+    @number("3.13")
+    def test_reseed_at_largest_size(self):
+        keys = [f"Key{i}" for i in range(30)]
+        table = LinearProbeTable(sizes=[5, 13, 53], hash_function=KeyedHash())
+        nested = DoubleKeyTable(sizes=[5, 13, 53], hash_function=KeyedHash())
+        flat = FlatDoubleKeyTable(sizes=[5, 13, 53], hash_function=KeyedHash())
+        for i, key in enumerate(keys):
+            table[key] = i
+            nested[key, "Low"] = i
+            flat[key, "Low"] = i
+
+        # Past half of the last size the tables can't grow any more, but a reseed must still rebuild them.
+        for dt in [table, nested, flat]:
+            self.assertGreaterEqual(dt.size_index, 3)
+            self.assertEqual(dt.table_size, 53)
+            dt._reseed()
+            self.assertEqual(dt.table_size, 53)
+        for i, key in enumerate(keys):
+            self.assertEqual(table[key], i)
+            self.assertEqual(nested[key, "Low"], i)
+            self.assertEqual(flat[key, "Low"], i)
+        self.assertEqual((len(table), len(nested), len(flat.keys())), (30, 30, 30))
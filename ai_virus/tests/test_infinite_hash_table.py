@@ -1,7 +1,15 @@
+import gc
+import sys
 import unittest
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from itertools import product
+from threading import Thread
 from ed_utils.decorators import number
 
-from infinite_hash_table import InfiniteHashTable
+from data_structures.adaptive_array import AdaptiveArray
+from infinite_hash_table import InfiniteHashTable, ConcurrentInfiniteHashTable
+from table_stats import enable_stats, disable_stats, export_stats
 
 
 class TestInfiniteHash(unittest.TestCase):
@@ -92,3 +100,442 @@ class TestInfiniteHash(unittest.TestCase):
             "mining"
         ]
         self.assertListEqual(res, expected)
+
+    @number("4.4")
+    def test_prefix_queries(self):
+        ih = InfiniteHashTable()
+        for i, key in enumerate(["lin", "leg", "mine", "linked", "limp", "mining", "jake", "linger"]):
+            ih[key] = i
+
+        self.assertListEqual(ih.keys_with_prefix("lin"), ["lin", "linger", "linked"])
+        self.assertListEqual(ih.keys_with_prefix("mi"), ["mine", "mining"])
+        self.assertListEqual(ih.keys_with_prefix("x"), [])
+        self.assertListEqual(ih.keys_with_prefix(""), ih.sort_keys())
+        self.assertEqual(ih.count_prefix("lin"), 3)
+        self.assertEqual(ih.count_prefix("l"), 5)
+        self.assertEqual(ih.count_prefix("linke"), 1)
+        self.assertEqual(ih.count_prefix("q"), 0)
+        self.assertEqual(ih.count_prefix(""), 8)
+
+        self.assertListEqual(ih.range("li", "lio"), ["limp", "lin", "linger", "linked"])
+        self.assertListEqual(ih.range("lin", "linh"), ["lin", "linger"])
+        self.assertListEqual(ih.range("a", "z"), ih.sort_keys())
+        self.assertListEqual(ih.range("m", "j"), [])
+
+        del ih["linger"]
+        self.assertEqual(ih.count_prefix("lin"), 2)
+        ih["lin"] = 20
+        self.assertEqual(ih.count_prefix("lin"), 2)
+        self.assertEqual(ih["lin"], 20)
+
+    @number("4.5")
+    def test_prefix_shared_slot(self):
+        # "-" and "a" hash to the same slot, as do "0" and "d".
+        ih = InfiniteHashTable()
+        for i, key in enumerate(["prod-a0", "proda1", "prod-d1", "prodd2", "prod-a"]):
+            ih[key] = i
+
+        self.assertListEqual(ih.keys_with_prefix("prod-"), ["prod-a", "prod-a0", "prod-d1"])
+        self.assertEqual(ih.count_prefix("prod-"), 3)
+        self.assertEqual(ih.count_prefix("proda"), 1)
+        self.assertEqual(ih.count_prefix("prod-a"), 2)
+        self.assertEqual(ih.count_prefix("prod"), 5)
+
+    @number("4.6")
+    def test_shared_between_threads(self):
+        ih = ConcurrentInfiniteHashTable()
+        stable = ["lin", "leg", "mine", "linked", "limp", "mining", "jake", "linger"]
+        for i, key in enumerate(stable):
+            ih[key] = i
+
+        def write():
+            for i in range(300):
+                ih[f"lin{i}"] = i
+            for i in range(300):
+                del ih[f"lin{i}"]
+
+        def read(_):
+            for _ in range(50):
+                for i, key in enumerate(stable):
+                    if ih[key] != i or key not in ih:
+                        return False
+                if ih.get_location("mine") != [5, 1, 6, 23]:
+                    return False
+            return True
+
+        writer = Thread(target=write)
+        writer.start()
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(read, range(8)))
+        writer.join()
+
+        self.assertTrue(all(results))
+        self.assertEqual(len(ih), len(stable))
+        self.assertEqual(ih.get_location("linked"), [4, 1, 6, 3])
+        self.assertEqual(ih.get_location("mine"), [5, 1, 6, 23])
+
+    @number("4.7")
+    def test_compressed(self):
+        keys = ["lin", "leg", "mine", "linked", "limp", "mining", "jake", "linger",
+                "prod-cluster-eu-west-1", "prod-cluster-eu-west-2", "prod-cluster-us-east-1"]
+        ih = InfiniteHashTable()
+        ic = InfiniteHashTable(compressed=True)
+        for i, key in enumerate(keys):
+            ih[key] = i
+            ic[key] = i
+
+        for i, key in enumerate(keys):
+            self.assertEqual(ic[key], i)
+            self.assertEqual(ic.get_location(key), ih.get_location(key))
+        self.assertEqual(ic.get_location("linked"), [4, 1, 6, 3])
+        self.assertEqual(len(ic.get_location("prod-cluster-eu-west-2")), 22)
+        self.assertIsInstance(ic.array[8], InfiniteHashTable)
+        self.assertEqual(ic.array[8].level, 13)
+        self.assertNotIn("prod-cluster-eu-east-1", ic)
+        self.assertNotIn("prod", ic)
+        self.assertEqual(ic.count_prefix("prod-cluster-eu"), 2)
+        self.assertListEqual(ic.keys_with_prefix("prod-cluster-"), keys[8:])
+
+        ic["prod-cluster-eu-central-1"] = 11
+        ih["prod-cluster-eu-central-1"] = 11
+        self.assertEqual(ic.get_location("prod-cluster-eu-west-1"), ih.get_location("prod-cluster-eu-west-1"))
+        self.assertEqual(ic.get_location("prod-cluster-eu-central-1"), ih.get_location("prod-cluster-eu-central-1"))
+        self.assertEqual(ic.count_prefix("prod-cluster-eu"), 3)
+
+        del ic["prod-cluster-us-east-1"]
+        del ic["prod-cluster-eu-central-1"]
+        self.assertEqual(ic.array[8].level, 21)
+        self.assertEqual(len(ic), len(keys) - 1)
+
+    @number("4.8")
+    def test_delete_only_touches_path(self):
+        ih = InfiniteHashTable()
+        for i, key in enumerate(["lin", "leg", "mine", "linked", "limp", "mining", "jake", "linger"]):
+            ih[key] = i
+
+        lin_table = ih.array[4].array[1]
+        mine_table = ih.array[5]
+        del ih["limp"]
+        self.assertIs(ih.array[4].array[1], lin_table)
+        self.assertIs(ih.array[5], mine_table)
+        del ih["leg"]
+        self.assertIs(ih.array[4].array[1], lin_table)
+        self.assertEqual(ih.array[4].count, 3)
+        self.assertEqual(ih.get_location("linger"), [4, 1, 6, 25])
+        self.assertRaises(KeyError, lambda: ih.__delitem__("lint"))
+        self.assertRaises(KeyError, lambda: ih.__delitem__("leg"))
+        self.assertEqual(len(ih), 6)
+
+        ic = InfiniteHashTable(compressed=True)
+        for key in ["prod-eu-1", "prod-eu-2", "prod-us-1"]:
+            ic[key] = key
+        del ic["prod-us-1"]
+        self.assertEqual(ic.array[8].level, 8)
+        self.assertEqual(ic.get_location("prod-eu-2"), [8, 10, 7, 22, 19, 23, 13, 19, 24])
+
+    @number("4.9")
+    def test_len_counts(self):
+        ih = InfiniteHashTable()
+        for i, key in enumerate(["lin", "leg", "mine", "linked", "limp", "mining", "jake", "linger"]):
+            ih[key] = i
+        self.assertEqual(len(ih), 8)
+        self.assertEqual(ih.array[4].count, 5)
+        self.assertEqual(ih.array[4].array[1].count, 4)
+
+        ih["linked"] = 40
+        ih["lin"] = 10
+        self.assertEqual(len(ih), 8)
+        self.assertEqual(ih.array[4].count, 5)
+        self.assertEqual(ih["linked"], 40)
+
+        del ih["linked"]
+        self.assertEqual(len(ih), 7)
+        self.assertEqual(ih.array[4].array[1].count, 3)
+        self.assertEqual(ih.array[4].array[1].array[6].count, 2)
+
+    @number("4.10")
+    def test_compact_nodes(self):
+        ih = InfiniteHashTable()
+        ih["lin"] = 1
+        ih["leg"] = 2
+        self.assertIsNone(ih.array[4].array.array)
+        self.assertEqual(list(ih.array[4].array.items()), [(1, ("lin", 1)), (23, ("leg", 2))])
+        self.assertEqual(len(list(ih.array[4].array)), InfiniteHashTable.TABLE_SIZE)
+
+        letters = "abcdefghijklmnopqrstuvwxyz"
+        for i, char in enumerate(letters):
+            ih["l" + char + "x"] = i
+        self.assertIsNotNone(ih.array[4].array.array)
+        self.assertEqual(ih.get_location("lex"), [4, 23, 16])
+        self.assertEqual(ih["lzx"], 25)
+        self.assertEqual(len(ih), 28)
+        for char in letters:
+            del ih["l" + char + "x"]
+        self.assertEqual(ih.get_location("lin"), [4, 1])
+        self.assertEqual(len(ih), 2)
+
+    @number("4.11")
+    def test_stats(self):
+        ih = ConcurrentInfiniteHashTable()
+        ih["lin"] = 1
+        ih["leg"] = 2
+        ih["abc"] = 3
+        stats = enable_stats(ih)
+        self.assertIsInstance(ih, ConcurrentInfiniteHashTable)
+        self.assertEqual(ih["lin"], 1)
+        self.assertEqual(ih["abc"], 3)
+        self.assertRaises(KeyError, lambda: ih["low"])
+
+        exported = export_stats(ih)
+        self.assertEqual(exported["hit_probes"], {1: 1, 2: 1})
+        self.assertEqual(exported["miss_probes"], {0: 1})
+        self.assertEqual(exported["depths"], {1: 1, 2: 2})
+        self.assertEqual(exported["size"], 3)
+
+        disable_stats(ih)
+        self.assertIs(type(ih), ConcurrentInfiniteHashTable)
+        self.assertEqual(ih["leg"], 2)
+        self.assertEqual(sum(stats.hit_probes), 2)
+
+        # The depth comes from the lookup itself, skipped positions included, not from get_location.
+        ic = InfiniteHashTable(compressed=True)
+        for key in ["prod-eu-1", "prod-eu-2", "lin"]:
+            ic[key] = key
+        stats = enable_stats(ic)
+        type(ic).get_location = None
+        self.assertEqual(ic["prod-eu-2"], "prod-eu-2")
+        self.assertEqual(ic["lin"], "lin")
+        disable_stats(ic)
+        self.assertEqual(stats.as_dict()["hit_probes"], {1: 1, len(ic.get_location("prod-eu-2")): 1})
+
+    @number("4.12")
+    def test_seeded(self):
+        ih = InfiniteHashTable(seeded=True)
+        keys = ["lin", "leg", "mine", "linked"] + [f"prod-cluster-eu-west-2b-web-{i:04d}" for i in range(0, 200, 7)]
+        for i, key in enumerate(keys[:4]):
+            ih[key] = i
+        self.assertFalse(ih.compressed)
+        self.assertEqual(ih.get_location("lin"), [ih.permutation[ord(char) % 26] for char in "lin"] + [26])
+        self.assertEqual(set(ih.permutation), set(range(26)))
+
+        # Keys sharing long prefixes nest deeper than MAX_DEPTH, and the table rebuilds itself compressed.
+        for i, key in enumerate(keys[4:], 4):
+            ih[key] = i
+        self.assertTrue(ih.compressed)
+        self.assertEqual(len(ih), len(keys))
+        self.assertEqual(ih.sort_keys(), sorted(keys))
+        for i, key in enumerate(keys):
+            self.assertEqual(ih[key], i)
+        self.assertEqual(ih.count_prefix("prod-"), len(keys) - 4)
+        del ih["linked"]
+        self.assertEqual(ih["lin"], 0)
+
+    @number("4.13")
+    def test_keys_sharing_every_position(self):
+        # '-', 'G' and 'a' all hash to 19, so these keys share every position.
+        keys = ["prod-a", "prodaa", "prodGa", "prod-G"]
+        for ih in (InfiniteHashTable(), InfiniteHashTable(compressed=True), ConcurrentInfiniteHashTable()):
+            for i, key in enumerate(keys):
+                ih[key] = i
+            ih["prod-ab"] = 4
+            ih["prodaa"] = 10
+            self.assertEqual(len(ih), 5)
+            self.assertEqual([ih[key] for key in keys], [0, 10, 2, 3])
+            self.assertEqual(ih.get_location("prod-a"), [8, 10, 7, 22, 19, 19, 26])
+            self.assertEqual(ih.get_location("prodGa"), ih.get_location("prod-a"))
+            self.assertEqual(ih.sort_keys(), sorted(keys + ["prod-ab"]))
+            self.assertEqual(ih.keys_with_prefix("prod-"), ["prod-G", "prod-a", "prod-ab"])
+            self.assertEqual(ih.count_prefix("prod-a"), 2)
+            self.assertRaises(KeyError, lambda: ih["prodab"])
+
+            del ih["prod-ab"]
+            del ih["prod-a"]
+            self.assertRaises(KeyError, lambda: ih["prod-a"])
+            # The keys left have all ended, so their bucket moves up, where a fresh table keeps it.
+            self.assertEqual(ih.get_location("prodGa"), [8, 10, 7, 22, 19, 19])
+            del ih["prodaa"]
+            del ih["prod-G"]
+            self.assertEqual(ih.get_location("prodGa"), [8])
+            self.assertEqual(len(ih), 1)
+
+    @number("4.14")
+    def test_seeded_adversarial_keys(self):
+        # Keys picked to share every position whatever the permutation, and to nest past MAX_DEPTH.
+        suffixes = ["".join(chars) for chars in product("-Ga{", repeat=4)]
+        keys = [f"prod-cluster-eu-west-{suffix}" for suffix in suffixes]
+        ih = InfiniteHashTable(seeded=True)
+        ih["lin"] = -1
+        for i, key in enumerate(keys):
+            ih[key] = i
+        self.assertTrue(ih.compressed)
+        self.assertEqual(len(ih), len(keys) + 1)
+        self.assertEqual(ih.sort_keys(), sorted(keys + ["lin"]))
+        for i, key in enumerate(keys):
+            self.assertEqual(ih[key], i)
+        self.assertEqual(len({tuple(ih.get_location(key)) for key in keys}), 1)
+        self.assertEqual(ih.count_prefix("prod-cluster-eu-west-G"), 64)
+
+        for key in keys[1:]:
+            del ih[key]
+        self.assertEqual(len(ih), 2)
+        self.assertEqual(ih[keys[0]], 0)
+        self.assertEqual(ih["lin"], -1)
+
+    @number("4.15")
+    def test_adaptive_array_promotion(self):
+        class Value:
+            pass
+
+        array = AdaptiveArray(InfiniteHashTable.TABLE_SIZE)
+        values = [Value() for _ in range(AdaptiveArray.NODE_SIZES[-1] + 1)]
+        for i, value in enumerate(values[:-1]):
+            array[i] = value
+        self.assertIsNone(array.array)
+        self.assertEqual(len(array.slots[0]), AdaptiveArray.NODE_SIZES[-1])
+
+        array[AdaptiveArray.NODE_SIZES[-1]] = values[-1]
+        self.assertIsNotNone(array.array)
+        self.assertEqual(array.slots, ((), ()))
+        self.assertEqual(list(array.items()), list(enumerate(values)))
+
+        # Once deleted, a value must not be kept alive by the tuples used before the promotion.
+        first = weakref.ref(values[0])
+        array[0] = None
+        del values[0]
+        gc.collect()
+        self.assertIsNone(first())
+
+    @number("4.16")
+    def test_adaptive_array_promotion_during_read(self):
+        array = AdaptiveArray(InfiniteHashTable.TABLE_SIZE)
+        for i in range(AdaptiveArray.NODE_SIZES[-1]):
+            array[i] = i
+        reads = []
+
+        # Promote the array while a reader is inside __getitem__, just after it has taken the layout.
+        def tracer(frame, event, arg):
+            if frame.f_code is AdaptiveArray.__getitem__.__code__:
+                return local_tracer
+            return None
+
+        def local_tracer(frame, event, arg):
+            if event == "line" and "array" in frame.f_locals and not reads:
+                sys.settrace(None)
+                frame.f_trace = None
+                reads.append(True)
+                array[AdaptiveArray.NODE_SIZES[-1]] = -1
+            return local_tracer
+
+        sys.settrace(tracer)
+        try:
+            found = array[3]
+        finally:
+            sys.settrace(None)
+        self.assertEqual(reads, [True])
+        self.assertIsNotNone(array.array)
+        self.assertEqual(found, 3)
+        self.assertEqual(array[3], 3)
+
+    @number("4.17")
+    def test_compressed_tables_not_changed_once_stored(self):
+        ic = InfiniteHashTable(compressed=True)
+        for key in ["prod-eu-1", "prod-eu-2"]:
+            ic[key] = key
+        eu = ic.array[8]
+        self.assertEqual((eu.level, eu.skip, eu.edge), (8, (10, 7, 22, 19, 23, 13, 19), "prod-eu-"))
+
+        # Splitting the skip stores a new table, and leaves the one a reader may be inside as it was.
+        ic["prod-us-1"] = "prod-us-1"
+        self.assertEqual(ic.array[8].skip, (10, 7, 22, 19))
+        self.assertIsNot(ic.array[8].array[23], eu)
+        self.assertEqual((ic.array[8].array[23].skip, ic.array[8].array[23].edge), ((13, 19), "eu-"))
+        self.assertEqual((eu.skip, eu.edge), ((10, 7, 22, 19, 23, 13, 19), "prod-eu-"))
+        self.assertEqual(eu["prod-eu-2"], "prod-eu-2")
+
+        # So does merging a table into its only nested table.
+        prod, eu = ic.array[8], ic.array[8].array[23]
+        del ic["prod-us-1"]
+        self.assertEqual(ic.array[8].skip, (10, 7, 22, 19, 23, 13, 19))
+        self.assertEqual((prod.skip, eu.skip), ((10, 7, 22, 19), (13, 19)))
+        self.assertEqual(prod["prod-eu-1"], "prod-eu-1")
+        self.assertEqual(ic.get_location("prod-eu-2"), [8, 10, 7, 22, 19, 23, 13, 19, 24])
+
+    @number("4.18")
+    def test_shared_between_threads_compressed(self):
+        ic = ConcurrentInfiniteHashTable(compressed=True)
+        stable = ["prod-cluster-eu-west-1", "prod-cluster-eu-west-2", "prod-cluster-eu-west-3", "jake"]
+        for i, key in enumerate(stable):
+            ic[key] = i
+        locations = [ic.get_location(key) for key in stable]
+        # Each of these stops sharing the skip of the stable keys' table at a different position,
+        # so inserting it splits the skip and deleting it merges the tables back.
+        others = [stable[0][:n] + "X" + str(i) for i in range(40) for n in range(5, 20, 2)]
+
+        def write():
+            for _ in range(3):
+                for key in others:
+                    ic[key] = -1
+                for key in others:
+                    del ic[key]
+                for key in others:
+                    ic[key] = -1
+                    del ic[key]
+
+        def read(_):
+            for _ in range(200):
+                for i, key in enumerate(stable):
+                    if ic[key] != i or ic.get_location(key) != locations[i]:
+                        return False
+                if ic.keys_with_prefix("prod-cluster-eu-west-") != stable[:3]:
+                    return False
+            return True
+
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            writer = Thread(target=write)
+            writer.start()
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                results = list(pool.map(read, range(8)))
+            writer.join()
+        finally:
+            sys.setswitchinterval(interval)
+
+        self.assertTrue(all(results))
+        self.assertEqual(len(ic), len(stable))
+        self.assertEqual([ic.get_location(key) for key in stable], locations)
+
+    @number("4.19")
+    def test_delete_leaves_fresh_layout(self):
+        cases = [(["-", "--", "a"], "--"), (["-a", "aa", "-ab"], "-ab"), (["-", "a", "--", "---"], "---"),
+                 (["lin", "leg", "-", "a", "--"], "--")]
+        for compressed in (False, True):
+            for keys, deleted in cases:
+                ih = InfiniteHashTable(compressed=compressed)
+                fresh = InfiniteHashTable(compressed=compressed)
+                for key in keys:
+                    ih[key] = key
+                    if key != deleted:
+                        fresh[key] = key
+                del ih[deleted]
+                for key in keys:
+                    if key != deleted:
+                        self.assertEqual(ih.get_location(key), fresh.get_location(key))
+                        self.assertEqual(ih[key], key)
+                self.assertEqual(len(ih), len(fresh))
+
+    @number("4.20")
+    def test_edge_cleared_on_a_copy(self):
+        ic = ConcurrentInfiniteHashTable(compressed=True)
+        for key in ["prod-eu-1", "prod-eu-2"]:
+            ic[key] = key
+        eu = ic.array[8]
+        # 'G' hashes like '-', so this key shares the skip but not the characters.
+        ic["prodGeu-3"] = "prodGeu-3"
+        self.assertIsNot(ic.array[8], eu)
+        self.assertIsNone(ic.array[8].edge)
+        self.assertEqual(ic.array[8].skip, eu.skip)
+        self.assertEqual(eu.edge, "prod-eu-")
+        self.assertEqual(eu["prod-eu-1"], "prod-eu-1")
+        self.assertEqual(ic.keys_with_prefix("prod-"), ["prod-eu-1", "prod-eu-2"])
+        self.assertEqual(ic.count_prefix("prodG"), 1)
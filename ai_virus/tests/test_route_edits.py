@@ -1,8 +1,18 @@
+import copy
+import gc
+import io
+import pickle
 import unittest
 from ed_utils.decorators import number
 
+from branch_decision import BranchDecision
 from computer import Computer
-from route import Route, RouteSeries, RouteSplit
+from route import LazyRoute, NormalisePolicy, Route, RouteChangeKind, RouteFanOut, RouteRun, RouteSeries, RouteSplit, diff
+from route_builder import RouteBuilder, collection_paused
+from route_cursor import RouteCursor
+from route_factory import RouteFactory
+from route_format import BLOCK_SIZE, RouteFile, dump, dumps, load, loads, round_trips
+from virus import LazyVirus, TopVirus
 
 
 class TestRouteMethods(unittest.TestCase):
@@ -113,3 +123,373 @@ class TestRouteMethods(unittest.TestCase):
         self.assertIsInstance(res, RouteSeries)
         self.assertEqual(res.computer, m)
         self.assertEqual(res.following.store, None)
+
+    @number("1.5")
+    def test_fingerprint_diff(self):
+        a, b, c, d = (Computer(letter, 5, 5, 1.0) for letter in "abcd")
+        tail = Route(None)
+        for computer in [Computer(str(i), 1, 1, 0.5) for i in range(10000)]:
+            tail = tail.add_computer_before(computer)
+        old = Route(RouteSplit(Route(RouteSeries(a, Route(None))), Route(None), tail))
+        same = Route(RouteSplit(Route(RouteSeries(Computer("a", 5, 5, 1.0), Route(None))), Route(None), tail))
+
+        self.assertEqual(old, same)
+        self.assertEqual(hash(old), hash(same))
+        self.assertEqual(diff(old, same), [])
+
+        new = Route(RouteSplit(Route(RouteSeries(b, Route(None))), Route(None).add_computer_before(c), tail))
+        self.assertNotEqual(old, new)
+        changes = diff(old, new)
+        self.assertEqual([(change.kind, change.path) for change in changes], [
+            (RouteChangeKind.CHANGED, ("top",)),
+            (RouteChangeKind.INSERTED, ("bottom",)),
+        ])
+        self.assertIs(changes[0].old, old.store.top)
+
+        longer = Route(RouteSplit(old.store.top, old.store.bottom, tail.add_computer_before(d)))
+        changes = diff(old, longer)
+        self.assertEqual([(change.kind, change.path) for change in changes],
+                         [(RouteChangeKind.INSERTED, ("following",))])
+        self.assertEqual([(change.kind, change.path) for change in diff(longer, old)],
+                         [(RouteChangeKind.REMOVED, ("following",))])
+        self.assertEqual([(change.kind, change.path) for change in diff(old, Route(None))],
+                         [(RouteChangeKind.REPLACED, ())])
+
+        # Routes are equal when their computers are, whatever type their numbers have.
+        ints = Route(None).add_computer_before(Computer("a", 1, 1, 0.5)).add_computer_before(Computer("b", 0, 2, 0))
+        floats = Route(None).add_computer_before(Computer("a", 1.0, 1.0, 0.5)).add_computer_before(Computer("b", False, 2.0, -0.0))
+        self.assertEqual(ints.add_all_computers(), floats.add_all_computers())
+        self.assertEqual(ints, floats)
+        self.assertEqual(hash(ints), hash(floats))
+        self.assertEqual(diff(ints, floats), [])
+        self.assertNotEqual(ints, Route(None).add_computer_before(Computer("a", 1, 1.5, 0.5)).add_computer_before(Computer("b", 0, 2, 0)))
+
+    @number("1.6")
+    def test_cursor(self):
+        a, b, c = (Computer(letter, 5, 5, 1.0) for letter in "abc")
+        computers = [Computer(str(i), 1, 1, 0.5) for i in range(10000)]
+        tail = Route(RouteSplit(Route(RouteSeries(a, Route(None))), Route(None), Route(None)))
+        root = tail
+        for computer in reversed(computers):
+            root = root.add_computer_before(computer)
+
+        cursor = RouteCursor(root).following(5000)
+        self.assertEqual(cursor.depth, 5000)
+        new = cursor.add_computer_after(b).commit()
+        self.assertEqual(root.add_all_computers(), computers + [a])
+        self.assertEqual(new.add_all_computers(), computers[:5001] + [b] + computers[5001:] + [a])
+
+        cursor.following(5001).top().remove_computer().up().bottom().add_computer_before(c)
+        newer = cursor.commit()
+        self.assertEqual(newer.add_all_computers(), computers[:5001] + [b] + computers[5001:] + [c])
+        self.assertIs(newer.store.following.store.computer, computers[1])
+        self.assertIsNot(newer.store.following, root.store.following)
+
+        unchanged = RouteCursor(root).following(10000).top().commit()
+        self.assertIs(unchanged, root)
+
+        with self.assertRaises(ValueError):
+            RouteCursor(root).following(10002)
+        with self.assertRaises(ValueError):
+            RouteCursor(root).top()
+        with self.assertRaises(ValueError):
+            RouteCursor(root).up()
+
+    @number("1.7")
+    def test_builder(self):
+        a, b, c, d, e = (Computer(letter, 5, 5, 1.0) for letter in "abcde")
+        route = (RouteBuilder().series([a]).split().series([b]).split().end().bottom()
+                 .series([c]).top().series([d]).end().series([e]).freeze())
+        expected = (Route(None).add_computer_before(e)
+                    .add_empty_branch_before().add_computer_before(a))
+        expected.store.following.store.top = Route(None).add_empty_branch_before().add_computer_before(b)
+        expected.store.following.store.top.store.following.store.following = Route(None).add_computer_before(d)
+        expected.store.following.store.bottom = Route(None).add_computer_before(c)
+        self.assertEqual(route, expected)
+        self.assertEqual(route.add_all_computers(), [a, b, d, c, e])
+
+        computers = [Computer(str(i), 1, 1, 0.5) for i in range(100000)]
+        builder = RouteBuilder()
+        for _ in range(1000):
+            builder.split()
+        for _ in range(1000):
+            builder.end()
+        long_route = builder.series(computers).freeze()
+        self.assertEqual(long_route.add_all_computers(), computers)
+
+        with self.assertRaises(ValueError):
+            builder.series([a])
+        with self.assertRaises(ValueError):
+            RouteBuilder().split().freeze()
+        with self.assertRaises(ValueError):
+            RouteBuilder().end()
+
+        # Pausing the collector puts back the state it found, however the pauses overlap.
+        enabled = gc.isenabled()
+        try:
+            gc.disable()
+            with collection_paused():
+                pass
+            self.assertFalse(gc.isenabled())
+            gc.enable()
+            with collection_paused():
+                with collection_paused():
+                    self.assertFalse(gc.isenabled())
+                self.assertFalse(gc.isenabled())
+            self.assertTrue(gc.isenabled())
+        finally:
+            (gc.enable if enabled else gc.disable)()
+
+    @number("1.8")
+    def test_normalise(self):
+        a, b, c = (Computer(letter, 5, 5, 1.0) for letter in "abc")
+        empty = Route(None)
+        nested = empty.add_empty_branch_before().add_empty_branch_before()
+        route = Route(RouteSeries(a, Route(RouteSplit(nested, empty, Route(RouteSeries(
+            b, empty.add_empty_branch_before().add_empty_branch_before().add_computer_before(c)))))))
+
+        result, report = route.normalise()
+        self.assertEqual(result, Route(None).add_computer_before(c).add_computer_before(b).add_computer_before(a))
+        self.assertEqual(len(report.removed), 5)
+        self.assertEqual(report.emptied, 1)
+        before, after = LazyVirus(), LazyVirus()
+        route.follow_path(before)
+        result.follow_path(after)
+        self.assertEqual(before.computers, after.computers)
+
+        result, report = route.normalise(NormalisePolicy.COLLAPSE)
+        self.assertEqual(len(report.removed), 2)
+        self.assertEqual(report.emptied, 0)
+        self.assertEqual(result.add_all_computers(), [a, b, c])
+        self.assertIs(result.store.following.store.top, nested.store.following)
+
+        plain = Route(None).add_computer_before(c).add_computer_before(b)
+        result, report = plain.normalise()
+        self.assertIs(result, plain)
+        self.assertEqual(report.removed, [])
+
+    @number("1.9")
+    def test_runs(self):
+        a, b, c, d, e = (Computer(letter, ord(letter), 5, 1.0) for letter in "abcde")
+        chain = (RouteBuilder().series([a, b]).split().series([c]).bottom().series([d]).end()
+                 .series([e]).freeze())
+        runs = (RouteBuilder(runs=True).series([a, b]).split().series([c]).bottom().series([d]).end()
+                .series([e]).freeze())
+        self.assertIsInstance(runs.store, RouteRun)
+        self.assertEqual(runs.store.computers, (a, b))
+        self.assertIsInstance(runs.store.following.store.following.store, RouteSeries)
+        self.assertEqual(runs, chain)
+        self.assertEqual(runs.add_all_computers(), [a, b, c, d, e])
+        for virus_type in (TopVirus, LazyVirus):
+            on_chain, on_runs = virus_type(), virus_type()
+            chain.follow_path(on_chain)
+            runs.follow_path(on_runs)
+            self.assertEqual(on_runs.computers, on_chain.computers)
+
+        run = RouteRun((a, b, c), Route(None))
+        self.assertEqual(run.add_computer_before(d).computers, (d, a, b, c))
+        self.assertEqual(run.add_computer_after(d).computers, (a, d, b, c))
+        self.assertEqual(run.remove_computer().computers, (b, c))
+        self.assertIsInstance(RouteRun((a, b), Route(None)).remove_computer(), RouteSeries)
+        self.assertEqual(Route(run.add_empty_branch_after()).add_all_computers(), [a, b, c])
+        self.assertIsInstance(run.add_empty_branch_after().following.store, RouteSplit)
+
+        cursor = RouteCursor(Route(run)).following(2)
+        self.assertEqual(cursor.focus.store.computer, c)
+        edited = cursor.add_computer_before(d).commit()
+        self.assertEqual(edited.add_all_computers(), [a, b, d, c])
+        self.assertEqual(Route(run).add_all_computers(), [a, b, c])
+
+        factory = RouteFactory()
+        self.assertIs(factory.intern(runs), factory.intern(chain))
+
+        # diff compares a run as the series it stands for, whichever side it is on.
+        self.assertEqual(diff(runs, chain), [])
+        self.assertEqual(diff(chain, runs), [])
+        changed_chain = RouteBuilder().series([a, b, c, d, e]).freeze()
+        changed_runs = RouteBuilder(runs=True).series([a, b, c, e, e]).freeze()
+        expected = [(RouteChangeKind.CHANGED, ("following",) * 3)]
+        for old, new in [(changed_chain, changed_runs), (changed_runs, changed_chain),
+                         (RouteBuilder(runs=True).series([a, b, c, d, e]).freeze(), changed_runs)]:
+            changes = diff(old, new)
+            self.assertEqual([(change.kind, change.path) for change in changes], expected)
+            self.assertEqual(changes[0].old.add_all_computers(), old.add_all_computers()[3:])
+            self.assertEqual(changes[0].new.add_all_computers(), new.add_all_computers()[3:])
+        longer = RouteBuilder(runs=True).series([a, b, d, c]).freeze()
+        shorter = RouteBuilder().series([a, b, c]).freeze()
+        self.assertEqual([(change.kind, change.path) for change in diff(shorter, longer)],
+                         [(RouteChangeKind.INSERTED, ("following", "following"))])
+        self.assertEqual([(change.kind, change.path) for change in diff(longer, shorter)],
+                         [(RouteChangeKind.REMOVED, ("following", "following"))])
+
+    @number("1.10")
+    def test_fan_out(self):
+        a, b, c, d, e = (Computer(letter, 5, 5, 1.0) for letter in "abcde")
+        low, high = Computer("low", 1, 5, 1.0), Computer("high", 9, 5, 1.0)
+        branches = (Route(None).add_computer_before(a), Route(None).add_computer_before(low),
+                    Route(None).add_computer_before(high), Route(None))
+        fan_out = Route(RouteFanOut(branches, Route(None).add_computer_before(e)))
+        self.assertEqual(fan_out.add_all_computers(), [a, low, high, e])
+
+        for virus_type in (TopVirus, LazyVirus):
+            virus = virus_type()
+            fan_out.follow_path(virus)
+            self.assertEqual(virus.computers[-1], e)
+        top = TopVirus()
+        fan_out.follow_path(top)
+        self.assertEqual(top.computers, [a, e])
+        lazy = LazyVirus()
+        self.assertEqual(lazy.select_branch_many(branches[:3]), 1)
+        self.assertEqual(lazy.select_branch_many((branches[0], Route(None).add_computer_before(b))),
+                         BranchDecision.STOP)
+
+        factory = RouteFactory()
+        self.assertIs(factory.intern(fan_out), factory.intern(Route(RouteFanOut(branches, fan_out.store.following))))
+        self.assertEqual(factory.outcome(fan_out, TopVirus())[0], (a, e))
+
+        cursor = RouteCursor(fan_out).branch(2).add_computer_before(b)
+        edited = cursor.commit()
+        self.assertEqual(edited.add_all_computers(), [a, low, b, high, e])
+        self.assertEqual([(change.kind, change.path) for change in diff(fan_out, edited)],
+                         [(RouteChangeKind.INSERTED, (2,))])
+
+        # Negative indices count back from the last branch, as in tuple indexing.
+        edited = RouteCursor(fan_out).branch(-2).add_computer_before(b).commit()
+        self.assertEqual(len(edited.store.branches), 4)
+        self.assertEqual(edited.add_all_computers(), [a, low, b, high, e])
+        edited = RouteCursor(fan_out).branch(-4).add_computer_before(b).commit()
+        self.assertEqual(edited.store.branches[0].add_all_computers(), [b, a])
+        self.assertEqual(edited.store.branches[1:], branches[1:])
+        for index in (4, -5):
+            self.assertRaises(IndexError, RouteCursor(fan_out).branch, index)
+            self.assertRaises(IndexError, fan_out.store.remove_branch_at, index)
+        self.assertEqual(fan_out.store.remove_branch_at(-1).branches, branches[:3])
+        self.assertEqual(fan_out.store.remove_branch_at(-4).branches, branches[1:])
+        self.assertEqual(fan_out.store.remove_branch_at(1).branches, (branches[0],) + branches[2:])
+
+        empty = Route(RouteFanOut((Route(None), Route(None), Route(None)), Route(None).add_computer_before(e)))
+        result, report = empty.normalise()
+        self.assertEqual(result.add_all_computers(), [e])
+        self.assertEqual(len(report.removed), 1)
+
+    @number("1.11")
+    def test_format(self):
+        a, b, c = Computer("a", -3, 5, 0.25), Computer("b", 4, 1 << 40, 1.5), Computer("c\u00e9", 0, 0, 0.0)
+        computers = [Computer(str(i % 100), i % 7, i, 0.5) for i in range(1000)] * 50
+        builder = RouteBuilder().series([a]).split().series(computers).bottom().series([b, a]).end()
+        route = builder.split().end().series([c]).freeze()
+        route = Route(RouteFanOut((route, Route(None), RouteBuilder(runs=True).series([c, b, a]).freeze()),
+                                  Route(None).add_computer_before(c)))
+
+        file = io.BytesIO()
+        size = dump(route, file)
+        self.assertEqual(size, len(file.getvalue()))
+        file.seek(0)
+        loaded = load(file)
+        self.assertEqual(loaded, route)
+        self.assertEqual(loaded.add_all_computers(), route.add_all_computers())
+        self.assertIsInstance(loaded.store.branches[2].store, RouteRun)
+        self.assertLess(size, 6 * len(computers))
+        first = loaded.store.branches[0].store.following.store.top
+        self.assertIs(first.store.computer, first.add_all_computers()[1000])
+
+        # The large branch is written as it goes, rather than held back until its size is known.
+        class Recording(io.BytesIO):
+            largest = 0
+
+            def write(self, data):
+                self.largest = max(self.largest, len(data))
+                return super().write(data)
+
+        class Pipe(io.BytesIO):
+            def seekable(self):
+                return False
+
+        file = Recording()
+        dump(route, file)
+        self.assertLess(file.largest, BLOCK_SIZE + 16)
+        self.assertEqual(loads(file.getvalue()), route)
+        file = Pipe()
+        self.assertLess(dump(route, file), size)
+        self.assertEqual(loads(file.getvalue()), route)
+
+        self.assertEqual(loads(dumps(Route(None))), Route(None))
+        self.assertEqual(pickle.loads(pickle.dumps(route)), route)
+
+        # Copying doesn't go through the format, which would merge equal computers.
+        x, y = Computer("x", 1, 2, 0.5), Computer("x", 1, 2, 0.5)
+        small = RouteBuilder(runs=True).series([x, y]).split().series([y]).end().freeze()
+        small = small.add_computer_before(x)
+        self.assertIs(copy.copy(small).store, small.store)
+        copied = copy.deepcopy(small)
+        self.assertEqual(copied, small)
+        computers = copied.add_all_computers()
+        self.assertEqual(computers, [x, x, y, y])
+        self.assertIs(computers[0], computers[1])
+        self.assertIs(computers[2], computers[3])
+        self.assertIsNot(computers[0], computers[2])
+        self.assertFalse({id(x), id(y)} & {id(computer) for computer in computers})
+        self.assertEqual(copy.deepcopy(route), route)
+
+        # Pickling only goes through the format when that gives the same computers back.
+        self.assertTrue(round_trips(route))
+        self.assertFalse(round_trips(small))
+        unpickled = pickle.loads(pickle.dumps(small)).add_all_computers()
+        self.assertEqual(unpickled, [x, x, y, y])
+        self.assertIs(unpickled[0], unpickled[1])
+        self.assertIsNot(unpickled[0], unpickled[2])
+        floats = RouteBuilder().series([Computer("f", 1, 2.5, 0.5)] * 3).freeze()
+        self.assertFalse(round_trips(floats))
+        unpickled = pickle.loads(pickle.dumps(floats))
+        self.assertEqual(unpickled, floats)
+        self.assertEqual([computer.hacked_value for computer in unpickled.add_all_computers()], [2.5] * 3)
+        shared = Route(RouteSplit(floats, floats, Route(None)))
+        unpickled = pickle.loads(pickle.dumps(shared))
+        self.assertEqual(unpickled, shared)
+        self.assertIs(unpickled.store.top, unpickled.store.bottom)
+        with self.assertRaises(ValueError):
+            loads(b"nonsense")
+        with self.assertRaises(EOFError):
+            loads(dumps(route)[:-1])
+
+    @number("1.12")
+    def test_lazy_route(self):
+        computers = [Computer(str(i), i % 5, i, 0.5) for i in range(3000)]
+        builder = RouteBuilder()
+        for start in range(0, 3000, 100):
+            builder.split().series(computers[start:start + 2]).bottom().series(computers[start + 2:start + 60])
+            builder.end().series(computers[start + 60:start + 100])
+        route = Route(RouteFanOut((builder.freeze(), Route(None)), Route(None)))
+        file = io.BytesIO()
+        file.write(b"before")
+        dump(route, file)
+        file.seek(len(b"before"))
+
+        route_file = RouteFile(file)
+        for virus_type in (TopVirus, LazyVirus):
+            eager, lazy = virus_type(), virus_type()
+            route.follow_path(eager)
+            route_file.root().follow_path(lazy)
+            self.assertEqual(lazy.computers, eager.computers)
+
+        root = route_file.root()
+        self.assertIsInstance(root, LazyRoute)
+        self.assertFalse(root.loaded)
+        root.follow_path(TopVirus())
+        split = root.store.branches[0].store
+        self.assertTrue(split.top.loaded)
+        self.assertFalse(split.bottom.loaded)
+
+        lazy = LazyVirus()
+        root = route_file.root()
+        root.follow_path(lazy)
+        split = root.store.branches[0].store
+        self.assertTrue(split.bottom.loaded)
+        self.assertFalse(split.bottom.store.following.loaded)
+
+        self.assertEqual(route_file.root(), route)
+        calls = []
+        counted = LazyRoute(lambda: calls.append(1) or RouteSeries(computers[0], Route(None)))
+        self.assertEqual(counted.add_all_computers(), [computers[0]])
+        self.assertEqual(counted.add_all_computers(), [computers[0]])
+        self.assertEqual(len(calls), 1)
@@ -1,9 +1,15 @@
+import gc
+import random
 import unittest
+import weakref
 from ed_utils.decorators import number
 
 from computer import Computer
-from route import Route, RouteSeries, RouteSplit
-from virus import VirusType, TopVirus, BottomVirus, LazyVirus, RiskAverseVirus, FancyVirus, BranchDecision
+from data_structures.array_stack import ArrayStack
+from route import Route, RouteFanOut, RouteSeries, RouteSplit, hacked_value, least_risk
+from route_builder import RouteBuilder
+from route_factory import RouteFactory
+from virus import VirusType, TopVirus, BottomVirus, LazyVirus, RiskAverseVirus, FancyVirus, BranchDecision, OptimalVirus
 
 
 class TestRouteMethods(unittest.TestCase):
@@ -126,3 +132,237 @@ class TestRouteMethods(unittest.TestCase):
             self.top_bot, self.top_top, self.top_mid,
             self.bot_one, self.bot_two, self.final
         ])))
+
+    @number("2.6")
+    def test_collect_all_computers_deep(self):
+        computers = [Computer(str(i), 1, 1, 0.1) for i in range(100000)]
+        route = Route(None)
+        for computer in reversed(computers):
+            route = route.add_computer_before(computer)
+        route = route.add_empty_branch_before()
+
+        self.assertEqual(route.add_all_computers(), computers)
+
+    @number("2.7")
+    def test_hash_consing(self):
+        factory = RouteFactory()
+        for example in [self.load_example, self.large_example]:
+            example()
+            route = factory.intern(self.route)
+            self.assertEqual(route, self.route)
+            self.assertIs(factory.intern(self.route), route)
+            self.assertEqual(list(factory.computers_on(route)), self.route.add_all_computers())
+            for virus_type in [TopVirus, BottomVirus, LazyVirus, RiskAverseVirus]:
+                expected, memoised = virus_type(), virus_type()
+                self.route.follow_path(expected)
+                factory.follow_path(route, memoised)
+                self.assertListEqual(memoised.computers, expected.computers)
+
+        # Identical segments built separately are the same node, and their results are computed once.
+        segment = lambda: Route(RouteSeries(Computer("a", 1, 2, 0.5), Route(RouteSeries(Computer("b", 3, 4, 0.25), Route(None)))))
+        route = factory.intern(Route(RouteSplit(segment(), segment(), segment())))
+        self.assertIs(route.store.top, route.store.bottom)
+        self.assertIs(route.store.top, factory.intern(segment()))
+        self.assertEqual(factory.totals(route), (6, 18, 2.25))
+        self.assertIs(route.store.top, route.store.following)
+        self.assertEqual(factory.computers_on(route.store.top), factory.computers_on(route.store.following))
+        self.assertIs(factory.split(factory.empty, factory.empty), factory.intern(Route(None).add_empty_branch_before()))
+
+        # Every suffix of a long series is memoised, sharing the computers of the next one.
+        computers = [Computer(str(i), 1, i, 0.5) for i in range(50000)]
+        route = factory.intern(RouteBuilder().series(computers).freeze())
+        self.assertEqual(factory.computers_on(route), tuple(computers))
+        self.assertEqual(factory.outcome(route, TopVirus()), (tuple(computers), False))
+        self.assertEqual(factory.computers_on(route.store.following), tuple(computers[1:]))
+
+        # Optimal viruses with different objectives don't share outcomes.
+        self.large_example()
+        route = factory.intern(self.route)
+        for objective in [hacked_value, least_risk, hacked_value]:
+            expected, memoised = OptimalVirus(objective), OptimalVirus(objective)
+            self.route.follow_path(expected)
+            factory.follow_path(route, memoised)
+            self.assertListEqual(memoised.computers, expected.computers)
+        self.assertNotEqual(factory.outcome(route, OptimalVirus(hacked_value)),
+                            factory.outcome(route, OptimalVirus(least_risk)))
+
+        # The route after a split isn't evaluated when the branch taken stops.
+        class StopAtEmptyTop(VirusType):
+            def select_branch(self, top_branch, bottom_branch):
+                return BranchDecision.STOP if top_branch.store is None else BranchDecision.TOP
+
+        a = Computer("a", 1, 1, 0.5)
+        after = factory.intern(RouteBuilder().series(computers[:100]).freeze())
+        stops = Route(None).add_empty_branch_before().add_computer_before(a)
+        route = factory.intern(Route(RouteSplit(stops, Route(None).add_computer_before(a), after)))
+        self.assertEqual(factory.outcome(route, StopAtEmptyTop()), ((a,), True))
+        self.assertNotIn((("outcome", StopAtEmptyTop), id(after)), factory.memo)
+        through = factory.intern(Route(RouteSplit(Route(None).add_computer_before(a), Route(None), after)))
+        self.assertEqual(factory.outcome(through, StopAtEmptyTop()), ((a,) + tuple(computers[:100]), False))
+        self.assertIn((("outcome", StopAtEmptyTop), id(after)), factory.memo)
+
+    @number("2.8")
+    def test_best_path(self):
+        rng = random.Random(8)
+
+        def random_route(depth):
+            route = Route(None)
+            for _ in range(rng.randint(0, 3)):
+                kind = rng.random()
+                if depth > 0 and kind < 0.3:
+                    route = Route(RouteSplit(random_route(depth - 1), random_route(depth - 1), route))
+                elif depth > 0 and kind < 0.4:
+                    route = Route(RouteFanOut(tuple(random_route(depth - 1) for _ in range(3)), route))
+                else:
+                    computer = Computer(str(rng.random()), 1, rng.randint(0, 9), rng.choice([0.0, 0.5, 2.0]))
+                    route = route.add_computer_before(computer)
+            return route
+
+        def paths(route, score, allow_stop):
+            # Every (total score, stopped) of the paths through route, by trying every decision.
+            store = route.store
+            if store is None:
+                return [(0, False)]
+            if isinstance(store, RouteSeries):
+                return [(score(store.computer) + total, stopped)
+                        for total, stopped in paths(store.following, score, allow_stop)]
+            branches = [store.top, store.bottom] if isinstance(store, RouteSplit) else store.branches
+            result = [(0, True)] if allow_stop else []
+            for branch in branches:
+                for total, stopped in paths(branch, score, allow_stop):
+                    if stopped:
+                        result.append((total, True))
+                        continue
+                    result.extend((total + rest, rest_stopped)
+                                  for rest, rest_stopped in paths(store.following, score, allow_stop))
+            return result
+
+        for _ in range(200):
+            route = random_route(3)
+            best = route.best_path()
+            self.assertEqual(best.score, max(total for total, _ in paths(route, lambda c: c.hacked_value, False)))
+            self.assertEqual(best.score, sum(computer.hacked_value for computer in best.computers))
+            virus = OptimalVirus()
+            route.follow_path(virus)
+            self.assertEqual(virus.computers, best.computers)
+
+            safest = route.best_path(least_risk, allow_stop=True)
+            self.assertEqual(safest.score, max(total for total, _ in paths(route, least_risk, True)))
+
+        a, b, c = Computer("a", 1, 5, 0.5), Computer("b", 1, 9, 2.0), Computer("c", 1, 1, 1.0)
+        route = Route(RouteSeries(a, Route(RouteSplit(Route(RouteSeries(b, Route(None))),
+                                                      Route(RouteSeries(c, Route(None))), Route(None)))))
+        best = route.best_path()
+        self.assertEqual((best.score, best.decisions, best.computers), (14, [BranchDecision.TOP], [a, b]))
+        safest = route.best_path(least_risk)
+        self.assertEqual(safest.decisions, [BranchDecision.BOTTOM])
+        self.assertEqual(safest.computers, [a, c])
+        stopped = route.best_path(least_risk, allow_stop=True)
+        self.assertEqual((stopped.score, stopped.decisions, stopped.computers), (-0.5, [BranchDecision.STOP], [a]))
+
+        computers = [Computer(str(i), 1, i, 0.5) for i in range(100000)]
+        deep = RouteBuilder().series(computers).split().series(computers[:1]).end().freeze()
+        self.assertEqual(deep.best_path().computers, computers + computers[:1])
+
+    @number("2.10")
+    def test_follow_path_deep(self):
+        rng = random.Random(10)
+
+        def random_route(depth):
+            route = Route(None)
+            for _ in range(rng.randint(1, 2)):
+                kind = rng.random()
+                if depth > 0 and kind < 0.5:
+                    route = Route(RouteSplit(random_route(depth - 1), random_route(depth - 1), route))
+                elif depth > 0 and kind < 0.6:
+                    route = Route(RouteFanOut(tuple(random_route(depth - 1) for _ in range(3)), route))
+                else:
+                    computer = Computer(str(rng.random()), rng.randint(0, 3), rng.randint(0, 9), rng.choice([0.0, 0.5]))
+                    route = route.add_computer_before(computer)
+            return route
+
+        # Splits nested deeper than 4 are followed, and a stop deep down ends the whole path.
+        factory = RouteFactory()
+        for _ in range(50):
+            route = random_route(7)
+            virus = OptimalVirus()
+            route.follow_path(virus)
+            self.assertEqual(virus.computers, route.best_path().computers)
+            for virus_type in [TopVirus, BottomVirus, LazyVirus, RiskAverseVirus]:
+                expected, memoised = virus_type(), virus_type()
+                route.follow_path(expected)
+                factory.follow_path(route, memoised)
+                self.assertListEqual(expected.computers, memoised.computers)
+
+        # The branch taken at each of 1000 nested splits, then what follows each of them.
+        inner = [Computer("in" + str(i), 1, 1, 0.5) for i in range(1000)]
+        after = [Computer("after" + str(i), 1, 1, 0.5) for i in range(1000)]
+        route = Route(None)
+        for i in range(1000):
+            route = Route(RouteSplit(route.add_computer_before(inner[i]), Route(None),
+                                     Route(None).add_computer_before(after[i])))
+        virus = TopVirus()
+        route.follow_path(virus)
+        self.assertEqual(virus.computers, inner[::-1] + after)
+        virus = OptimalVirus()
+        route.follow_path(virus)
+        self.assertEqual(virus.computers, route.best_path().computers)
+
+        # The scores are kept by content: they hold no route, and following an equal route again adds none.
+        held = weakref.ref(route.store.top)
+        scored = len(virus.scores)
+        self.assertTrue(all(type(key) is bytes for key in virus.scores))
+        del route
+        gc.collect()
+        self.assertIsNone(held())
+        route = Route(None)
+        for i in range(1000):
+            route = Route(RouteSplit(route.add_computer_before(inner[i]), Route(None),
+                                     Route(None).add_computer_before(after[i])))
+        virus.computers = []
+        route.follow_path(virus)
+        self.assertEqual(virus.computers, route.best_path().computers)
+        self.assertEqual(len(virus.scores), scored)
+
+    @number("2.9")
+    def test_array_stack(self):
+        stack = ArrayStack()
+        self.assertTrue(stack.is_empty())
+        self.assertFalse(stack.is_full())
+        self.assertRaises(Exception, stack.peek)
+        self.assertRaises(Exception, stack.pop)
+
+        # The array doubles when full, and the elements come back in reverse order.
+        count = 5 * ArrayStack.MIN_CAPACITY + 3
+        for i in range(count):
+            stack.push(i)
+            self.assertEqual(stack.peek(), i)
+        self.assertEqual(len(stack), count)
+        self.assertEqual(len(stack.array), 8 * ArrayStack.MIN_CAPACITY)
+        self.assertFalse(stack.is_full())
+        self.assertEqual([stack.pop() for _ in range(count)], list(range(count - 1, -1, -1)))
+        self.assertTrue(stack.is_empty())
+        self.assertEqual(stack.array, [None] * len(stack.array))
+
+        # The array grows up to max_capacity and no further.
+        self.assertRaises(ValueError, lambda: ArrayStack(0))
+        stack = ArrayStack(max_capacity=20)
+        for i in range(20):
+            self.assertFalse(stack.is_full())
+            stack.push(i)
+        self.assertTrue(stack.is_full())
+        self.assertEqual(len(stack.array), 20)
+        self.assertRaises(Exception, stack.push, 20)
+        self.assertEqual(stack.peek(), 19)
+        self.assertEqual(stack.pop(), 19)
+        self.assertFalse(stack.is_full())
+        small = ArrayStack(max_capacity=3)
+        self.assertEqual(len(small.array), 3)
+
+        stack.clear()
+        self.assertTrue(stack.is_empty())
+        self.assertEqual(len(stack.array), ArrayStack.MIN_CAPACITY)
+        self.assertRaises(Exception, stack.peek)
+        stack.push("a")
+        self.assertEqual(stack.peek(), "a")
+
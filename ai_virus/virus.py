@@ -5,7 +5,8 @@ This module contains all type of virus
 from __future__ import annotations
 from abc import ABC, abstractmethod
 from computer import Computer
-from route import Route, RouteSeries, RouteSplit
+from typing import Callable, Hashable
+from route import Route, RouteRun, RouteSeries, RouteSplit, hacked_value, path_scores
 from branch_decision import BranchDecision
 
 __author__ = "Adrian Ong Zhe Yee, Teh Yee Hong"
@@ -18,10 +19,41 @@ class VirusType(ABC):
     def add_computer(self, computer: Computer) -> None:
         self.computers.append(computer)
 
+    def memo_key(self) -> Hashable:
+        """
+        Returns what the branches this virus selects depend on, besides the branches themselves,
+        for RouteFactory.outcome to memoise by: two viruses with the same key must select the same
+        branches. By default the class, for a virus without parameters.
+
+        Complexity: O(1)
+        """
+        return type(self)
+
     @abstractmethod
     def select_branch(self, top_branch: Route, bottom_branch: Route) -> BranchDecision:
         raise NotImplementedError()
 
+    def select_branch_many(self, branches: tuple[Route, ...]) -> int | BranchDecision:
+        """
+        Select one of the branches of a RouteFanOut, by comparing the branch chosen so far with each
+        of the others in turn through select_branch. A fan out of two branches is therefore decided
+        like a RouteSplit of them, and a virus can override this to decide in one step.
+
+        param arg1: the branches
+
+        Returns: the index of the branch to take, or BranchDecision.STOP
+
+        Complexity: O(k * select_branch), where k is the number of branches
+        """
+        chosen = 0
+        for i in range(1, len(branches)):
+            decision = self.select_branch(branches[chosen], branches[i])
+            if decision == BranchDecision.STOP:
+                return BranchDecision.STOP
+            if decision == BranchDecision.BOTTOM:
+                chosen = i
+        return chosen
+
 
 class TopVirus(VirusType):
     def select_branch(self, top_branch: Route, bottom_branch: Route) -> BranchDecision:
@@ -63,8 +95,8 @@ class LazyVirus(VirusType):
                     Worst case occur when both are a RouteSeries
                     Both case O(1)
         """
-        top_route = type(top_branch.store) == RouteSeries
-        bot_route = type(bottom_branch.store) == RouteSeries
+        top_route = type(top_branch.store) in (RouteSeries, RouteRun)
+        bot_route = type(bottom_branch.store) in (RouteSeries, RouteRun)
 
         if top_route and bot_route:
             top_comp = top_branch.store.computer
@@ -97,8 +129,8 @@ class RiskAverseVirus(VirusType):
                     Worst case occur when both are a RouteSeries
                     Both cases O(1)
         """
-        top_route = type(top_branch.store) == RouteSeries
-        bot_route = type(bottom_branch.store) == RouteSeries
+        top_route = type(top_branch.store) in (RouteSeries, RouteRun)
+        bot_route = type(bottom_branch.store) in (RouteSeries, RouteRun)
         if top_route and bot_route:
             top_comp = top_branch.store.computer
             bot_comp = bottom_branch.store.computer
@@ -185,8 +217,8 @@ class FancyVirus(VirusType):
                 lst.insert(0, result)
             return lst[0]
 
-        top_route = type(top_branch.store) == RouteSeries
-        bot_route = type(bottom_branch.store) == RouteSeries
+        top_route = type(top_branch.store) in (RouteSeries, RouteRun)
+        bot_route = type(bottom_branch.store) in (RouteSeries, RouteRun)
         if top_route and bot_route:
             self.CALC_STR = self.CALC_STR.split()
             result = calculator(self.CALC_STR)
@@ -206,5 +238,80 @@ class FancyVirus(VirusType):
         else:
             return BranchDecision.TOP
 
+class OptimalVirus(VirusType):
+    """
+    Takes the branch leading to the highest total of objective over the computers on it: the
+    path of Route.best_path(objective), never stopping.
+
+    The best score of every sub-route is worked out once, the first time a branch holding it is
+    compared, and kept, so following a route costs O(n) over all the decisions. The scores are kept
+    by the fingerprint of the sub-route (see Route.fingerprint), not by the sub-route itself: they
+    hold no route alive, equal sub-routes share a score, and a score can't be found again for a
+    different sub-route that happens to get the same id.
+    """
+
+    def __init__(self, objective: Callable[[Computer], float] = hacked_value) -> None:
+        """
+        param arg1: a function giving the score of each computer, hacked_value by default
+        """
+        super().__init__()
+        self.objective = objective
+        self.scores: dict[bytes, float] = {}
+
+    def _score(self, branch: Route) -> float:
+        """
+        Returns the best score going all the way through branch, scoring it and the sub-routes
+        below it with path_scores if it hasn't been yet
+
+        Complexity: O(1) once scored, otherwise O(n) where n is the number of nodes in branch
+        """
+        fingerprint = branch.fingerprint()
+        if fingerprint not in self.scores:
+            memo: dict[int, list] = {}
+            path_scores(branch, self.objective, memo)
+            for node, full, _, _, _ in memo.values():
+                self.scores[node.fingerprint()] = full
+        return self.scores[fingerprint]
+
+    def select_branch(self, top_branch: Route, bottom_branch: Route) -> BranchDecision:
+        """
+        Select the branch with the best score, the top one when they are equal
+
+        param arg1: the first route
+        param arg2: the second route
+
+        Returns: a branch decision
+
+        Complexity: O(1) for branches already scored, otherwise O(n) where n is the number of
+                    nodes in them not scored yet
+        """
+        top_score = self._score(top_branch)
+        bottom_score = self._score(bottom_branch)
+        return BranchDecision.TOP if top_score >= bottom_score else BranchDecision.BOTTOM
+
+    def select_branch_many(self, branches: tuple[Route, ...]) -> int | BranchDecision:
+        """
+        Select the branch with the best score, the first of them when several are equal
+
+        param arg1: the branches
+
+        Returns: the index of the branch to take
+
+        Complexity: O(k) for branches already scored, where k is the number of branches,
+                    plus O(n) for the n nodes in them not scored yet
+        """
+        scores = [self._score(branch) for branch in branches]
+        return scores.index(max(scores))
+
+    def memo_key(self) -> Hashable:
+        """
+        Returns the class and the objective, as viruses with different objectives select
+        different branches
+
+        Complexity: O(1)
+        """
+        return type(self), self.objective
+
+
 if __name__ == "__main__":
     pass
\ No newline at end of file